@@ -0,0 +1,75 @@
+import math
+import telemetry
+import util
+
+# Shots submitted per round for every circuit that has not converged
+ROUND_SHOTS = 256
+MAX_SHOTS = 8192
+
+# z-score of the confidence interval (95%)
+Z = 1.96
+
+
+def wilson_interval(successes, shots, z=Z):
+    """
+    :return: Wilson score interval of a binomial proportion
+    """
+    if shots == 0:
+        return 0.0, 1.0
+
+    p = successes / shots
+    denominator = 1 + z ** 2 / shots
+    center = (p + z ** 2 / (2 * shots)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / shots + z ** 2 / (4 * shots ** 2)) / denominator
+
+    return center - half_width, center + half_width
+
+
+def zero_counts(counts):
+    """
+    :return: counts of the outcome with every measured bit (ancilla) in 0
+    """
+    return sum(value for key, value in counts.items() if set(key.replace(' ', '')) == {'0'})
+
+
+def run_adaptive(circuits, execute, tolerance, round_shots=ROUND_SHOTS, max_shots=MAX_SHOTS, z=Z,
+                 backend_name=None):
+    """
+    Runs circuits in rounds and stops sampling each circuit once the
+    confidence interval of its all-zero ancilla probability is narrower than
+    tolerance (half-width) or it reached max_shots
+
+    :param execute: function(circuits, shots, round) returning a result for
+    the given circuits
+    :return: Result with the counts summed over every round and the total
+    shots of each circuit
+    """
+    counts = {circuit.name: {} for circuit in circuits}
+    shots = {circuit.name: 0 for circuit in circuits}
+
+    active = list(circuits)
+    n_round = 0
+    while active:
+        this_shots = min(round_shots, min(max_shots - shots[c.name] for c in active))
+        result = execute(active, this_shots, n_round)
+
+        still_active = []
+        for circuit in active:
+            name = circuit.name
+            for key, value in result.get_data(name)['counts'].items():
+                counts[name][key] = counts[name].get(key, 0) + value
+            shots[name] += this_shots
+
+            low, high = wilson_interval(zero_counts(counts[name]), shots[name], z)
+            if (high - low) / 2 > tolerance and shots[name] < max_shots:
+                still_active.append(circuit)
+
+        telemetry.emit('adaptive_round', round=n_round, shots=this_shots, active=len(active),
+                       converged=len(circuits) - len(still_active))
+        active = still_active
+        n_round += 1
+
+    results = [{'name': circuit.name, 'counts': counts[circuit.name], 'shots': shots[circuit.name]}
+               for circuit in circuits]
+
+    return util._to_result(results, backend_name=backend_name)
@@ -0,0 +1,370 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import incremental
+import packed
+import quantum
+import store
+import util
+
+BENCH_FOLDER = 'bench/'
+BASELINE_FILE = BENCH_FOLDER + 'baseline.json'
+
+# A run is a regression when its median is this many times the baseline median
+THRESHOLD = 1.25
+
+REPEATS = 5
+# Smallest total time of one repeat, the number of calls is raised until reached
+MIN_TIME = 0.05
+
+MEMORIES_FILE = 'configs/memories.json'
+
+# Number of stored results the persistence benchmarks are run on
+STORED_RESULTS = 3
+
+# Temporary folder the benchmarks write to, set by run
+_scratch = None
+
+
+class Skip(Exception):
+    pass
+
+
+def memories():
+    """
+    :return: classical memories of the experiments (configs/memories.json)
+    """
+    with open(MEMORIES_FILE) as file:
+        return json.load(file)
+
+
+def random_patterns(memory_size, n_patterns, seed=0):
+    rng = np.random.default_rng(seed)
+    return packed.PackedPatterns.from_bits(rng.integers(0, 2, (n_patterns, memory_size)))
+
+
+def stored_results(limit=STORED_RESULTS):
+    """
+    :return: names of the first completed hardware and simulator pickles in
+    exps/ (failed jobs hold no counts)
+    """
+    names = []
+    for path in sorted(glob.glob(util.EXPS_FOLDER + '*.p')):
+        if len(names) == limit:
+            break
+        try:
+            completed = util.load_result(os.path.basename(path)).get_status() == 'COMPLETED'
+        except Exception:
+            completed = False
+        if completed:
+            names.append(os.path.basename(path))
+    return names
+
+
+def scratch(name, folder):
+    """
+    :param folder: folder the writer prepends (util.EXPS_FOLDER, util.PLOTS_FOLDER)
+    :return: path of name in the temporary folder of the run, relative to folder
+    """
+    return os.path.relpath(os.path.join(_scratch, name), folder)
+
+
+def counts_result(rows, backend_name='quantum'):
+    """
+    :param rows: list of {'name', 'counts'} as returned by the local backends
+    :return: store.CountsResult of rows, built without qiskit
+    """
+    outcomes = sorted(set(outcome for row in rows for outcome in row['counts']))
+    counts = np.array([[row['counts'].get(outcome, 0) for outcome in outcomes] for row in rows], dtype=float)
+    return store.CountsResult([row['name'] for row in rows], outcomes, counts,
+                              {'status': 'COMPLETED', 'backend_name': backend_name})
+
+
+def _requires(module):
+    try:
+        __import__(module)
+    except ImportError:
+        raise Skip('{} is not installed'.format(module))
+
+
+# Benchmarks: function(**params) returning the function to time, and the
+# parameter grid it is run with
+
+def bench_memory_retrieval(memory_size, n_patterns, c_size):
+    patterns = random_patterns(memory_size, n_patterns).to_strings()
+    inputs = random_patterns(memory_size, 16, seed=1).to_strings()
+    return lambda: [quantum.memory_retrieval(i, patterns, c_size, 1) for i in inputs]
+
+
+def bench_memory_retrieval_batch(memory_size, n_patterns, c_size):
+    patterns = random_patterns(memory_size, n_patterns)
+    inputs = random_patterns(memory_size, 1024, seed=1)
+    return lambda: quantum.memory_retrieval_batch(inputs, patterns, c_size, 1)
+
+
+def bench_incremental(memory_size, window):
+    stream = random_patterns(memory_size, 256, seed=2).to_strings()
+    queries = random_patterns(memory_size, 1024, seed=1)
+
+    def run():
+        memory = incremental.IncrementalMemory(memory_size, queries=queries, window=window)
+        memory.extend(stream)
+        return memory.probabilities()
+
+    return run
+
+
+def bench_set_memory(memory_size, init_method, c_size):
+    _requires('qiskit')
+    import pqm_experiment
+
+    mem_init = getattr(pqm_experiment, init_method)
+    patterns = list(memories()[str(memory_size)].values())
+    input_pattern = '0' * memory_size
+
+    def run():
+        pqm_experiment._templates.clear()
+        return [pqm_experiment.set_memory(p, memory_size, c_size, input_pattern, mem_init) for p in patterns]
+
+    return run
+
+
+def bench_simulate(memory_size, shots, c_size):
+    _requires('qiskit')
+    import pqm_experiment
+
+    circuits = [pqm_experiment.set_memory(p, memory_size, c_size, '0' * memory_size, pqm_experiment.manual_init).circuit
+                for p in memories()[str(memory_size)].values()]
+    return lambda: util.execute(circuits, 'local_qasm_simulator', shots=shots)
+
+
+def bench_statevector(memory_size, shots, c_size):
+    _requires('qiskit')
+    import pqm_experiment
+    import statevector
+
+    mems = [pqm_experiment.set_memory(p, memory_size, c_size, '0' * memory_size, pqm_experiment.store_init)
+            for p in memories()[str(memory_size)].values()]
+    return lambda: statevector.run(mems, shots, sampled=True, seed=0)
+
+
+def bench_pickle(result_file):
+    _requires('qiskit')
+    result = util.load_result(result_file)
+    if result is None:
+        raise Skip('{} could not be loaded'.format(result_file))
+
+    filename = scratch('result.p', util.EXPS_FOLDER)
+
+    def run():
+        util.save_result(filename, result)
+        return util.load_result(filename)
+
+    return run
+
+
+def bench_store(result_file):
+    _requires('qiskit')
+    result = util.load_result(result_file)
+    if result is None:
+        raise Skip('{} could not be loaded'.format(result_file))
+
+    path = scratch('result', util.EXPS_FOLDER)
+
+    def run():
+        store.save(path, result)
+        return store.load(path).get_data(result.get_names()[0])
+
+    return run
+
+
+def _analytic_results(memory_size, c_size, shots):
+    import pqm_experiment
+
+    input_patterns = [format(i, '0{}b'.format(memory_size)) for i in range(2 ** memory_size)]
+    patterns = memories()[str(memory_size)].values()
+
+    jobs = [pqm_experiment.quantum_job(input_patterns, p, c_size, shots, 1) for p in patterns]
+    return {input_pattern: counts_result([job[i] for job in jobs]) for i, input_pattern in enumerate(input_patterns)}
+
+
+def bench_mse(memory_size, c_size):
+    reference = _analytic_results(memory_size, c_size, 8192)
+    target = _analytic_results(memory_size, c_size, 8000)
+    exp_results = {'quantum': reference, 'target': target}
+    return lambda: util.MSE(exp_results, list(reference), target='target', width=c_size)
+
+
+def bench_plot(memory_size, fmt):
+    _requires('matplotlib')
+    import plotting
+    import pqm_experiment
+
+    results = _analytic_results(memory_size, 1, 8192)
+    input_pattern = next(iter(results))
+    figure = pqm_experiment.plot_data('bench', {'quantum': results}, input_pattern,
+                                      list(memories()[str(memory_size)]), 'H', 8192)
+    figure['name'] = scratch('figure', util.PLOTS_FOLDER)
+    return lambda: plotting.draw(figure, fmt)
+
+
+BENCHMARKS = {
+    'memory_retrieval': (bench_memory_retrieval, {'memory_size': [4, 16], 'n_patterns': [2, 64], 'c_size': [1, 3]}),
+    'memory_retrieval_batch': (bench_memory_retrieval_batch,
+                               {'memory_size': [4, 16, 64], 'n_patterns': [2, 64, 1024], 'c_size': [1, 3]}),
+    'incremental': (bench_incremental, {'memory_size': [16, 64], 'window': [16, 128]}),
+    'set_memory': (bench_set_memory, {'memory_size': [1, 2, 3, 4], 'init_method': ['manual_init', 'store_init'],
+                                      'c_size': [1, 2]}),
+    'simulate': (bench_simulate, {'memory_size': [2, 4], 'shots': [1024, 8192], 'c_size': [1]}),
+    'statevector': (bench_statevector, {'memory_size': [2, 4], 'shots': [1024, 8192], 'c_size': [1, 2]}),
+    'pickle': (bench_pickle, {'result_file': stored_results()[:3]}),
+    'store': (bench_store, {'result_file': stored_results()[:3]}),
+    'mse': (bench_mse, {'memory_size': [2, 4], 'c_size': [1, 2]}),
+    'plot': (bench_plot, {'memory_size': [2, 4], 'fmt': ['png', 'svg', 'pdf']}),
+}
+
+
+def grid(params):
+    names = sorted(params)
+    for values in itertools.product(*(params[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def case_name(benchmark, params):
+    return '{}[{}]'.format(benchmark, ','.join('{}={}'.format(k, v) for k, v in sorted(params.items())))
+
+
+def measure(function, repeats=REPEATS, min_time=MIN_TIME):
+    """
+    :return: seconds per call of every repeat, calls per repeat raised until
+    a repeat takes at least min_time
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1000000:
+            break
+        number *= 10
+
+    times = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+
+    return times
+
+
+def run(pattern=None, repeats=REPEATS):
+    """
+    :param pattern: only run the benchmarks whose name contains pattern
+    :return: dict case name -> {'median', 'min', 'repeats'} or {'skipped': reason}
+    """
+    global _scratch
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='pqm_bench_') as _scratch:
+        for benchmark, (setup, params) in sorted(BENCHMARKS.items()):
+            if pattern is not None and pattern not in benchmark:
+                continue
+
+            for case in grid(params):
+                name = case_name(benchmark, case)
+                try:
+                    times = measure(setup(**case), repeats)
+                except Skip as e:
+                    results[name] = {'skipped': str(e)}
+                    continue
+
+                results[name] = {'median': statistics.median(times), 'min': min(times), 'repeats': len(times)}
+                print('{:<70} {:>12.6f} ms'.format(name, 1000 * results[name]['median']))
+    _scratch = None
+
+    return results
+
+
+def machine():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor()}
+
+
+def save_baseline(results, filename=BASELINE_FILE):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as file:
+        json.dump({'machine': machine(), 'results': results}, file, indent=1, sort_keys=True)
+
+
+def load_baseline(filename=BASELINE_FILE):
+    with open(filename) as file:
+        return json.load(file)
+
+
+def regressions(results, baseline, threshold=THRESHOLD):
+    """
+    :return: (case name, baseline median, new median) for every case that
+    got slower than threshold times its baseline median
+    """
+    found = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None or 'median' not in old or 'median' not in result:
+            continue
+        if result['median'] > threshold * old['median']:
+            found.append((name, old['median'], result['median']))
+
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Times the retrieval, simulation, persistence and plotting paths')
+    parser.add_argument('-k', dest='pattern', default=None, help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline (unless there are regressions)')
+    parser.add_argument('--force', action='store_true', help='with --save, save even if there are regressions')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeats)
+
+    skipped = {name: r['skipped'] for name, r in results.items() if 'skipped' in r}
+    for reason in sorted(set(skipped.values())):
+        print('Skipped {} cases: {}'.format(sum(1 for r in skipped.values() if r == reason), reason))
+
+    found = []
+    try:
+        baseline = load_baseline(args.baseline)
+    except FileNotFoundError:
+        print('No baseline in {}'.format(args.baseline))
+    else:
+        if baseline['machine'] != machine():
+            print('Baseline was recorded on another machine: {}'.format(baseline['machine']))
+        found = regressions(results, baseline['results'], args.threshold)
+        for name, old, new in found:
+            print('REGRESSION: {} {:.6f} ms -> {:.6f} ms ({:.2f}x)'.format(name, 1000 * old, 1000 * new, new / old))
+
+    if args.save:
+        if found and not args.force:
+            print('Baseline not updated because of the regressions, use --force to accept them')
+        else:
+            save_baseline(results, args.baseline)
+            print('Saved baseline {}'.format(args.baseline))
+
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import store
+import telemetry
+import util
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+CACHE_FOLDER = 'cache/'
+INDEX_FILE = 'index.json'
+
+# Results saved by job name were all run with one ancilla and, for the
+# '_init_layout' jobs, with these layouts of LEGACY_BACKEND (by memory size)
+LEGACY_BACKEND = 'ibmqx4'
+LEGACY_C_SIZE = 1
+LEGACY_LAYOUTS = {1: {('memory', 0): ('q', 0), ('ancilla', 0): ('q', 2)},
+                  2: {('memory', 0): ('q', 0), ('memory', 1): ('q', 1), ('ancilla', 0): ('q', 2)},
+                  3: {('memory', 0): ('q', 0), ('memory', 1): ('q', 1), ('memory', 2): ('q', 4),
+                      ('ancilla', 0): ('q', 2)},
+                  4: {('memory', 0): ('q', 0), ('memory', 1): ('q', 1), ('memory', 2): ('q', 4),
+                      ('memory', 3): ('q', 3), ('ancilla', 0): ('q', 2)}}
+
+_index_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive lock on path + '.lock' across threads and processes
+    (the scheduler runs local jobs in worker processes)
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with _index_lock:
+        with open(path + '.lock', 'a+') as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def layout_key(initial_layout):
+    if initial_layout is None:
+        return None
+    return sorted([list(k), list(v)] for k, v in initial_layout.items())
+
+
+def circuit_hash(circuit):
+    h = hashlib.sha256()
+    h.update(circuit.name.encode())
+    h.update(circuit.qasm().encode())
+    return h.hexdigest()
+
+
+def circuit_key(circuits, backend, shots, initial_layout=None, **options):
+    """
+    :return: hash of the circuits (names and gates), backend, shots, layout
+    and any extra run options
+    """
+    h = hashlib.sha256()
+    for circuit in circuits:
+        h.update(circuit_hash(circuit).encode())
+
+    run_config = {'backend': backend, 'shots': shots, 'initial_layout': layout_key(initial_layout)}
+    run_config.update(options)
+    h.update(json.dumps(run_config, sort_keys=True, default=str).encode())
+
+    return h.hexdigest()
+
+
+class ResultCache(object):
+
+    """
+    content-addressed result cache. Results are stored in the columnar
+    store under the hash of what produced them and an index (key -> folder,
+    size, last access) is kept so lookups never open result files.
+    Lookups don't write the index: their access times are kept in memory
+    and written with the next put, evict or flush.
+
+    :param folder: cache folder, relative to util.EXPS_FOLDER
+    :param max_bytes: evict least recently used results above this size
+    (None disables eviction)
+    """
+
+    def __init__(self, folder=CACHE_FOLDER, max_bytes=None):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.index_file = util.EXPS_FOLDER + folder + INDEX_FILE
+        self._accessed = {}
+
+    def filename(self, key):
+        return self.folder + key
+
+    def load_index(self):
+        try:
+            with open(self.index_file) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _save_index(self, index):
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        tmp_filename = '{}.{}.tmp'.format(self.index_file, os.getpid())
+        with open(tmp_filename, 'w') as file:
+            json.dump(index, file, indent=1, sort_keys=True)
+        os.replace(tmp_filename, self.index_file)
+
+    def _merge_accessed(self, index):
+        accessed, self._accessed = self._accessed, {}
+        for key, last_used in accessed.items():
+            if key in index:
+                index[key]['last_used'] = max(index[key].get('last_used', 0), last_used)
+
+    def _update_index(self, key, **fields):
+        with file_lock(self.index_file):
+            index = self.load_index()
+            self._merge_accessed(index)
+            index.setdefault(key, {}).update(fields)
+            self._save_index(index)
+
+    def flush(self):
+        """
+        Writes the access times of the lookups since the last index update
+        """
+        if not self._accessed:
+            return
+        with file_lock(self.index_file):
+            index = self.load_index()
+            self._merge_accessed(index)
+            self._save_index(index)
+
+    def get(self, key):
+        filename = self.filename(key)
+        if not store.exists(filename):
+            telemetry.count('cache_miss', key=key)
+            return None
+
+        telemetry.count('cache_hit', key=key)
+        result = store.load(filename)
+        self._accessed[key] = time.time()
+
+        return result
+
+    def put(self, key, result, circuit_hashes=None, **info):
+        filename = self.filename(key)
+        result = store.save(filename, result, circuit_hashes)
+
+        size = store.size(filename)
+        self._update_index(key, file=filename, size=size, last_used=time.time(), **info)
+
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+        return result
+
+    def evict(self, max_bytes):
+        with file_lock(self.index_file):
+            index = self.load_index()
+            self._merge_accessed(index)
+            total = sum(entry.get('size', 0) for entry in index.values())
+
+            for key in sorted(index, key=lambda k: index[k].get('last_used', 0)):
+                if total <= max_bytes:
+                    break
+                store.remove(self.filename(key))
+                total -= index.pop(key).get('size', 0)
+
+            self._save_index(index)
+
+
+def legacy_layout_matches(memory_size, initial_layout, job_name):
+    if not job_name.endswith('_init_layout'):
+        return initial_layout is None
+    legacy_layout = LEGACY_LAYOUTS.get(memory_size)
+    return legacy_layout is not None and layout_key(initial_layout) == layout_key(legacy_layout)
+
+
+def load_legacy(job_name, memories, shots, initial_layout=None):
+    """
+    :param memories: PQM instances of the job
+    :return: completed result saved under the job name before the
+    content-addressed cache (migrated to the columnar store or pickled), or
+    None if there is none or it doesn't match the circuits, shots, number of
+    ancillas and layout
+    """
+    memory_size, c_size = memories[0].memory_size, memories[0].c_size
+    if c_size != LEGACY_C_SIZE or not legacy_layout_matches(memory_size, initial_layout, job_name):
+        return None
+
+    try:
+        if store.exists(store.STORE_FOLDER + job_name):
+            result = store.load(store.STORE_FOLDER + job_name)
+        else:
+            result = util.load_result(job_name + '.p')
+
+        # failed or unfinished jobs (e.g. 'QISKit timed out') are run again
+        if result.get_status() != 'COMPLETED':
+            return None
+
+        names = [memory.circuit.name for memory in memories]
+        if sorted(result.get_names()) != sorted(names):
+            return None
+
+        counts = result.get_data(names[0])['counts']
+    except Exception:
+        return None
+
+    if round(sum(counts.values())) != shots:
+        return None
+
+    return result
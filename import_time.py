@@ -0,0 +1,60 @@
+import json
+import statistics
+import subprocess
+import sys
+
+# Modules a batch worker imports, lightest first
+MODULES = ['packed', 'quantum', 'statevector', 'metrics', 'scheduler', 'pqm_index', 'util', 'pqm',
+           'pqm_experiment']
+
+# Stacks that must not be loaded by importing the modules above
+HEAVY_MODULES = ['qiskit', 'sympy', 'matplotlib', 'IBMQuantumExperience', 'Qconfig']
+
+REPEATS = 5
+
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def cold_import(module, heavy_modules=HEAVY_MODULES):
+    """
+    Imports module in a fresh interpreter
+
+    :return: import time in seconds and the heavy modules it loaded
+    """
+    script = _SCRIPT.format(module=module, heavy=list(heavy_modules))
+    output = subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['seconds'], result['heavy']
+
+
+def benchmark(modules=MODULES, repeats=REPEATS):
+    """
+    :return: one row per module with the median cold-start import time over
+    repeats interpreters and the heavy modules it pulls in
+    """
+    rows = []
+    for module in modules:
+        times = []
+        heavy = []
+        for _ in range(repeats):
+            seconds, heavy = cold_import(module)
+            times.append(seconds)
+        rows.append({'module': module, 'median': statistics.median(times), 'min': min(times), 'heavy': heavy})
+
+    return rows
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+
+    print('{:>16} {:>12} {:>12}  {}'.format('module', 'median (ms)', 'min (ms)', 'heavy modules loaded'))
+    for row in benchmark(repeats=repeats):
+        print('{:>16} {:>12.1f} {:>12.1f}  {}'.format(row['module'], 1000 * row['median'], 1000 * row['min'],
+                                                     ', '.join(row['heavy']) or '-'))
@@ -0,0 +1,259 @@
+import collections
+import hashlib
+import numpy as np
+from scipy.special import binom
+import packed
+import quantum
+import telemetry
+
+
+class IncrementalMemory(object):
+
+    """
+    memory of a stream of patterns. For every tracked query the number of
+    stored patterns at each Hamming distance is kept up to date, so an insert
+    or delete costs one distance per query and the analytic retrieval
+    probabilities are a histogram times the cached quantum.retrieval_table.
+    The PQM circuit is only rebuilt when a backend run asks for it after the
+    memory changed.
+
+    The memory holds the distinct patterns (as qiskit_init and store_init
+    prepare them): a pattern inserted several times stays stored until its
+    last occurrence is deleted or leaves the window.
+
+    :param memory_size: number of bits in each pattern
+    :param c_size: number of ancilla qubits
+    :param nvalue: distance modifier of the analytic probabilities
+    :param queries: input patterns whose probabilities are tracked (default:
+    every input pattern of memory_size bits)
+    :param window: number of most recent insertions kept, older ones are
+    evicted (None keeps everything)
+    :param mem_init: initialization method of the circuit (default:
+    pqm_experiment.store_init)
+    :param circuit_name: name of the circuits run on the backends
+    """
+
+    def __init__(self, memory_size, c_size=1, nvalue=1, queries=None, window=None, mem_init=None,
+                 circuit_name='stream'):
+        if window is not None and window < 1:
+            raise ValueError('The window must hold at least one pattern')
+
+        self.memory_size = memory_size
+        self.c_size = c_size
+        self.nvalue = nvalue
+        self.window = window
+        self.mem_init = mem_init
+        self.circuit_name = circuit_name
+
+        self.counts = collections.OrderedDict()
+        self.history = collections.deque()
+        self.version = 0
+        self._template = None
+
+        self.queries = packed.PackedPatterns(np.zeros((0, (memory_size + packed.WORD_SIZE - 1) // packed.WORD_SIZE)),
+                                             memory_size)
+        self.query_index = {}
+        self.histogram = np.zeros((0, memory_size + 1), dtype=np.int64)
+
+        if queries is None:
+            queries = [format(i, '0{}b'.format(memory_size)) for i in range(2 ** memory_size)]
+        self.add_queries(queries)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, pattern):
+        return packed.as_string(pattern) in self.counts
+
+    @property
+    def patterns(self):
+        """
+        :return: distinct stored patterns, oldest first
+        """
+        return list(self.counts)
+
+    def digest(self):
+        """
+        :return: hash of the stored patterns, names the remote jobs so they
+        do not depend on the history of the memory. The patterns are sorted
+        as in store(), so equal contents give equal circuits and names
+        """
+        h = hashlib.sha256()
+        h.update(','.join(sorted(self.patterns)).encode())
+        return h.hexdigest()[:12]
+
+    def add_queries(self, input_patterns):
+        """
+        Tracks more input patterns, their histograms are computed against the
+        patterns already stored
+        """
+        new = [p for p in dict.fromkeys(packed.as_strings(input_patterns)) if p not in self.query_index]
+        if not new:
+            return
+
+        if any(len(p) != self.memory_size for p in new):
+            raise ValueError('Pattern size must be equal to memory size')
+
+        rows = packed.pack(new)
+        if self.counts:
+            hist = quantum.distance_histogram(rows.distances(self.patterns), self.memory_size)
+        else:
+            hist = np.zeros((len(new), self.memory_size + 1), dtype=np.int64)
+
+        for p in new:
+            self.query_index[p] = len(self.query_index)
+        self.queries = packed.PackedPatterns(np.concatenate([self.queries.words, rows.words]), self.memory_size)
+        self.histogram = np.concatenate([self.histogram, hist.astype(np.int64)])
+
+    def insert(self, pattern):
+        """
+        :return: patterns evicted from the window by this insert
+        """
+        pattern = packed.as_string(pattern)
+        if len(pattern) != self.memory_size:
+            raise ValueError('Pattern size must be equal to memory size')
+
+        self.history.append(pattern)
+        self.counts[pattern] = self.counts.get(pattern, 0) + 1
+        if self.counts[pattern] == 1:
+            self._update(pattern, 1)
+
+        evicted = []
+        while self.window is not None and len(self.history) > self.window:
+            old = self.history.popleft()
+            self._release(old)
+            evicted.append(old)
+
+        return evicted
+
+    def extend(self, patterns):
+        """
+        :return: patterns evicted from the window
+        """
+        evicted = []
+        for pattern in packed.as_strings(patterns):
+            evicted.extend(self.insert(pattern))
+        return evicted
+
+    def delete(self, pattern):
+        """
+        Deletes the oldest occurrence of pattern
+        """
+        pattern = packed.as_string(pattern)
+        if pattern not in self.counts:
+            raise KeyError('Pattern {} is not stored'.format(pattern))
+
+        self.history.remove(pattern)
+        self._release(pattern)
+
+    def _release(self, pattern):
+        self.counts[pattern] -= 1
+        if self.counts[pattern] == 0:
+            del self.counts[pattern]
+            self._update(pattern, -1)
+
+    def _update(self, pattern, sign):
+        distances = self.queries.distance(pattern)
+        self.histogram[np.arange(len(distances)), distances] += sign
+        self.version += 1
+        self._template = None
+
+    def probabilities(self, input_patterns=None, nvalue=None):
+        """
+        :param input_patterns: tracked input patterns (default: every one),
+        untracked patterns are computed from the stored patterns
+        :param nvalue: distance modifier (default: the memory's)
+        :return: matrix with one row per input pattern and one column per
+        number of control bits in state 1 (0 to b), see
+        quantum.memory_retrieval_batch
+        """
+        if not self.counts:
+            raise ValueError('The memory is empty')
+
+        nvalue = self.nvalue if nvalue is None else nvalue
+        b = self.c_size
+        table = quantum.retrieval_table(self.memory_size, b, nvalue) * binom(b, np.arange(b+1)) / len(self.counts)
+
+        if input_patterns is None:
+            return self.histogram @ table
+
+        input_patterns = packed.as_strings(input_patterns)
+        untracked = [p for p in input_patterns if p not in self.query_index]
+        if untracked:
+            return quantum.memory_retrieval_batch(input_patterns, self.patterns, b, nvalue)
+
+        return self.histogram[[self.query_index[p] for p in input_patterns]] @ table
+
+    def outcome_counts(self, input_pattern, shots=1, nvalue=None):
+        """
+        :return: dict of counts over the ancilla outcomes (qiskit bitstrings)
+        """
+        return quantum.outcome_counts(self.probabilities([input_pattern], nvalue)[0], self.c_size, shots)
+
+    def template(self):
+        """
+        :return: PQM with the stored patterns and the symbolic recovery
+        circuit, rebuilt only if the memory changed since the last call
+        """
+        if not self.counts:
+            raise ValueError('The memory is empty')
+
+        if self._template is None:
+            import pqm
+            import pqm_experiment
+
+            mem_init = pqm_experiment.store_init if self.mem_init is None else self.mem_init
+            with telemetry.timer('circuit_build', memory_size=self.memory_size, c_size=self.c_size,
+                                 init=mem_init.__name__, patterns=len(self.counts)):
+                memory = pqm.PQM(self.memory_size, c_size=self.c_size, circuit_name=self.circuit_name)
+                mem_init(memory, self.patterns)
+                memory.recover_template()
+            self._template = memory
+
+        return self._template
+
+    def memory(self, input_pattern, scale_parameter=None):
+        """
+        :return: PQM with the stored patterns, recovering input_pattern
+        """
+        scale_parameter = self.nvalue if scale_parameter is None else scale_parameter
+        with telemetry.timer('circuit_bind', memory_size=self.memory_size, c_size=self.c_size):
+            return self.template().bind(input_pattern, scale_parameter=scale_parameter)
+
+    def run(self, input_patterns, backend, shots=8192, scale_parameter=None, initial_layout=None):
+        """
+        Runs the current memory on a backend, one job per input pattern. The
+        quantum backend reads the tracked histograms, the others build the
+        circuit (see template)
+
+        :return: dict input pattern -> Result
+        """
+        import noise
+        import pqm_experiment
+        import statevector
+        import util
+
+        scale_parameter = self.nvalue if scale_parameter is None else scale_parameter
+
+        results = {}
+        for input_pattern in packed.as_strings(input_patterns):
+            if backend == quantum.__name__:
+                rows = [{'name': self.circuit_name,
+                         'counts': self.outcome_counts(input_pattern, shots, nvalue=scale_parameter)}]
+                results[input_pattern] = util._to_result(rows, backend_name=backend)
+                continue
+
+            mem = self.memory(input_pattern, scale_parameter)
+            if backend in (statevector.__name__, noise.__name__):
+                with telemetry.timer('simulate', backend=backend, memory_size=self.memory_size):
+                    if backend == statevector.__name__:
+                        rows = statevector.run([mem], shots)
+                    else:
+                        rows = noise.run([mem], shots)
+                results[input_pattern] = util._to_result(rows, backend_name=backend)
+            else:
+                name = '{}_{}_{}_{}'.format(self.circuit_name, backend, self.digest(), input_pattern)
+                result = pqm_experiment.execute_job(name, [mem.circuit], backend, shots, initial_layout)
+                results[input_pattern] = util.check_result(result)
+
+        return results
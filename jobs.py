@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import numpy as np
+import cache
+import statevector
+import telemetry
+import util
+
+# Ledger file, relative to util.EXPS_FOLDER
+LEDGER_FILE = 'ledger.json'
+
+# Seconds between status checks, doubled after every check up to the maximum
+POLL_INTERVAL = 2
+MAX_POLL_INTERVAL = 120
+
+FINAL_STATUSES = ['DONE', 'ERROR', 'CANCELLED']
+
+# Backend objects used instead of QiskitBackend for their name (e.g. a
+# FakeBackend standing in for a device)
+_backends = {}
+
+
+class Ledger(object):
+
+    """
+    job ids and statuses of submitted jobs, persisted as JSON so that an
+    interrupted sweep can resume its jobs instead of submitting them again.
+    Entries are keyed by the content hash of the job (circuits, backend,
+    shots and layout, see cache.circuit_key), so a job is only resumed for
+    the same run
+
+    :param filename: ledger file (default: LEDGER_FILE in util.EXPS_FOLDER)
+    """
+
+    def __init__(self, filename=None):
+        self.filename = util.EXPS_FOLDER + LEDGER_FILE if filename is None else filename
+
+    def load(self):
+        try:
+            with open(self.filename) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, key):
+        return self.load().get(key)
+
+    def update(self, key, **fields):
+        # several sweeps may share the ledger
+        with cache.file_lock(self.filename):
+            entries = self.load()
+            entries.setdefault(key, {}).update(fields)
+
+            tmp_filename = '{}.{}.tmp'.format(self.filename, os.getpid())
+            with open(tmp_filename, 'w') as file:
+                json.dump(entries, file, indent=1, sort_keys=True)
+            os.replace(tmp_filename, self.filename)
+
+
+def register(backend):
+    """
+    Runs the jobs for backend.name on backend (e.g. a FakeBackend)
+    """
+    _backends[backend.name] = backend
+
+
+def unregister(name):
+    _backends.pop(name, None)
+
+
+def get_backend(backend):
+    """
+    :param backend: backend name or backend object
+    """
+    if isinstance(backend, str):
+        return _backends.get(backend) or QiskitBackend(backend)
+    return backend
+
+
+class QiskitBackend(object):
+
+    """
+    qiskit backend adapter used by the submit/poll layer
+
+    :param name: backend name
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def submit(self, circuits, shots, initial_layout=None, max_credits=15):
+        return util.submit(circuits, self.name, shots, max_credits=max_credits, initial_layout=initial_layout)
+
+    def retrieve(self, job_id):
+        return _RemoteJob(job_id)
+
+
+class _RemoteJob(object):
+
+    def __init__(self, job_id):
+        self.id = job_id
+
+    def status(self):
+        return util.fetch_status(self.id)
+
+    def result(self):
+        return util.fetch_result(self.id)
+
+
+class FakeBackend(object):
+
+    """
+    local stand-in for a remote backend. Circuits run on the statevector
+    backend and every job reports QUEUED for the first `polls` status checks.
+
+    :param name: backend name
+    :param polls: number of status checks before a job is DONE
+    :param seed: random seed used to sample the counts
+    """
+
+    def __init__(self, name='fake_backend', polls=2, seed=None):
+        self.name = name
+        self.polls = polls
+        self.rng = np.random.default_rng(seed)
+        self.jobs = {}
+        self.submitted = 0
+
+    def submit(self, circuits, shots, initial_layout=None, max_credits=15):
+        self.submitted += 1
+        job = FakeJob('{}_{}'.format(self.name, len(self.jobs)), circuits, shots, self)
+        self.jobs[job.id] = job
+        return job
+
+    def retrieve(self, job_id):
+        return self.jobs[job_id]
+
+
+class FakeJob(object):
+
+    def __init__(self, job_id, circuits, shots, backend):
+        self.id = job_id
+        self.circuits = circuits
+        self.shots = shots
+        self.backend = backend
+        self.checks = 0
+
+    def status(self):
+        self.checks += 1
+        return 'DONE' if self.checks > self.backend.polls else 'QUEUED'
+
+    def result(self):
+        results = []
+        for circuit in self.circuits:
+            probs = statevector.circuit_probabilities(circuit)
+            counts = statevector.sample(probs, self.shots, self.backend.rng)
+            results.append({'name': circuit.name, 'counts': counts})
+
+        return util._to_result(results, backend_name=self.backend.name)
+
+
+def job_id(job):
+    return job.job_id() if callable(getattr(job, 'job_id', None)) else job.id
+
+
+def normalize_status(status):
+    """
+    :return: DONE, ERROR or CANCELLED for the final statuses of the IBM Q API
+    (COMPLETED, ERROR_RUNNING_JOB, ERROR_CREATING_JOB, ...), status otherwise
+    """
+    status = str(getattr(status, 'name', status)).upper()
+
+    if status in ('DONE', 'COMPLETED'):
+        return 'DONE'
+    if status.startswith('ERROR') or status == 'FAILED':
+        return 'ERROR'
+    if status in ('CANCELLED', 'CANCELED'):
+        return 'CANCELLED'
+    return status
+
+
+def job_status(job):
+    status = job.status() if callable(job.status) else job.status
+    if isinstance(status, dict):
+        status = status['status']
+
+    return normalize_status(status)
+
+
+def ledger_key(circuits, backend, shots, initial_layout=None):
+    return cache.circuit_key(circuits, backend.name, shots, initial_layout)
+
+
+async def submit(name, circuits, backend, shots, ledger, initial_layout=None, max_credits=15):
+    """
+    :return: ledger key and the job of a previous submission of the same
+    circuits, shots and layout recorded in the ledger, or of a new submission
+    """
+    loop = asyncio.get_running_loop()
+    key = ledger_key(circuits, backend, shots, initial_layout)
+
+    entry = ledger.get(key)
+    if entry is not None and entry.get('job_id') and entry.get('status') not in ['ERROR', 'CANCELLED']:
+        print('Resuming job {} ({})'.format(name, entry['job_id']))
+        return key, backend.retrieve(entry['job_id'])
+
+    print('Submitting job {} to {} backend...'.format(name, backend.name))
+    with telemetry.timer('submit', job=name, backend=backend.name, circuits=len(circuits), shots=shots):
+        job = await loop.run_in_executor(None, lambda: backend.submit(circuits, shots, initial_layout=initial_layout,
+                                                                      max_credits=max_credits))
+    ledger.update(key, name=name, job_id=await loop.run_in_executor(None, job_id, job), backend=backend.name,
+                  shots=shots, status='SUBMITTED')
+
+    return key, job
+
+
+async def wait(name, key, job, ledger, poll_interval=POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+    """
+    Polls job with exponential backoff until it reaches a final status
+    :param key: ledger key of the job
+    :return: job result
+    """
+    loop = asyncio.get_running_loop()
+
+    interval = poll_interval
+    polls = 0
+    status = None
+    with telemetry.timer('queue_wait', job=name):
+        while True:
+            previous, status = status, await loop.run_in_executor(None, job_status, job)
+            polls += 1
+            if status != previous:
+                ledger.update(key, status=status)
+            if status in FINAL_STATUSES:
+                break
+
+            await asyncio.sleep(interval)
+            interval = min(2 * interval, max_interval)
+    telemetry.count('poll', polls, job=name, status=status)
+
+    if status != 'DONE':
+        raise Exception('Job {} finished with status {}'.format(name, status))
+
+    print('Job {} is {}'.format(name, status))
+    with telemetry.timer('fetch', job=name):
+        return await loop.run_in_executor(None, job.result)
+
+
+async def run_jobs(specs, ledger=None, max_credits=15, poll_interval=POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+                   return_exceptions=False):
+    """
+    Submits every job without waiting for the previous ones and polls
+    them concurrently. A failed job does not stop the others.
+
+    :param specs: dict mapping ids to dicts with the job name, circuits,
+    backend (name or backend object), shots and initial_layout
+    :param ledger: Ledger (default: LEDGER_FILE)
+    :param return_exceptions: return the exception of each failed job in
+    place of its result instead of raising once every job finished
+    :return: dict mapping ids to results
+    """
+    ledger = Ledger() if ledger is None else ledger
+
+    async def run_job(spec):
+        backend = get_backend(spec['backend'])
+        key, job = await submit(spec['name'], spec['circuits'], backend, spec['shots'], ledger,
+                                initial_layout=spec.get('initial_layout'), max_credits=max_credits)
+        return await wait(spec['name'], key, job, ledger, poll_interval=poll_interval, max_interval=max_interval)
+
+    ids = list(specs)
+    results = dict(zip(ids, await asyncio.gather(*[run_job(specs[i]) for i in ids], return_exceptions=True)))
+
+    failed = [i for i in ids if isinstance(results[i], Exception)]
+    for i in failed:
+        print('Job {} failed: {}'.format(specs[i]['name'], results[i]))
+        telemetry.emit('job_failed', job=specs[i]['name'], error=str(results[i]))
+
+    if failed and not return_exceptions:
+        raise Exception('{} of {} jobs failed: {}'.format(len(failed), len(ids),
+                                                          ', '.join(specs[i]['name'] for i in failed)))
+
+    return results
+
+
+async def run_batches(batches, backend, shots, ledger=None, initial_layout=None, max_credits=15,
+                      poll_interval=POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL, return_exceptions=False):
+    """
+    Submits every batch to the same backend, see run_jobs
+
+    :param batches: dict mapping job names to lists of circuits
+    :param backend: backend name or backend object (e.g. FakeBackend)
+    :return: dict mapping job names to results
+    """
+    specs = {name: {'name': name, 'circuits': circuits, 'backend': backend, 'shots': shots,
+                    'initial_layout': initial_layout}
+             for name, circuits in batches.items()}
+
+    return await run_jobs(specs, ledger, max_credits=max_credits, poll_interval=poll_interval,
+                          max_interval=max_interval, return_exceptions=return_exceptions)
+
+
+def run(batches, backend, shots, **kwargs):
+    return asyncio.run(run_batches(batches, backend, shots, **kwargs))
+
+
+def run_all(specs, **kwargs):
+    return asyncio.run(run_jobs(specs, **kwargs))
+
+
+def execute(name, circuits, backend, shots, initial_layout=None, **kwargs):
+    spec = {'name': name, 'circuits': circuits, 'backend': backend, 'shots': shots, 'initial_layout': initial_layout}
+    result = run_all({name: spec}, return_exceptions=True, **kwargs)[name]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
@@ -0,0 +1,190 @@
+import collections
+import itertools
+import json
+import math
+import os
+import threading
+import cache
+import util
+
+COUPLING_MAPS_FOLDER = 'coupling_maps/'
+LAYOUTS_FILE = util.EXPS_FOLDER + 'layouts.json'
+
+# Largest number of candidate layouts searched exhaustively
+EXHAUSTIVE_LIMIT = 100000
+
+_layouts_lock = threading.Lock()
+
+
+def load_coupling_map(backend):
+    """
+    :param backend: backend name, read from coupling_maps/<backend>.json
+    :return: number of physical qubits and list of directed (control, target) edges
+    """
+    with open(COUPLING_MAPS_FOLDER + backend + '.json') as file:
+        config = json.load(file)
+
+    coupling_map = config['coupling_map']
+    if isinstance(coupling_map, dict):
+        edges = [(int(c), t) for c, targets in coupling_map.items() for t in targets]
+    else:
+        edges = [tuple(edge) for edge in coupling_map]
+
+    n_qubits = config.get('n_qubits', 1 + max(max(edge) for edge in edges))
+
+    return n_qubits, edges
+
+
+def distances(n_qubits, edges):
+    """
+    :return: shortest path length between every pair of physical qubits,
+    ignoring edge direction
+    """
+    neighbours = collections.defaultdict(set)
+    for a, b in edges:
+        neighbours[a].add(b)
+        neighbours[b].add(a)
+
+    dist = [[math.inf] * n_qubits for _ in range(n_qubits)]
+    for source in range(n_qubits):
+        dist[source][source] = 0
+        queue = collections.deque([source])
+        while queue:
+            q = queue.popleft()
+            for r in neighbours[q]:
+                if dist[source][r] == math.inf:
+                    dist[source][r] = dist[source][q] + 1
+                    queue.append(r)
+
+    return dist
+
+
+def recover_interactions(memory_size, c_size):
+    """
+    :return: (control, target) logical qubit pairs of the cu1 gates emitted
+    by PQM.recover; qubits are ('memory', k) and ('ancilla', j)
+    """
+    return [(('ancilla', j), ('memory', k)) for j in range(c_size) for k in range(memory_size)]
+
+
+def cost(placement, interactions, dist, edges):
+    """
+    :param placement: dict logical qubit -> physical qubit
+    :return: (SWAP count, estimated depth) of the two-qubit gates; every cu1
+    is two cx, a reversed cx costs 4 extra h and a SWAP is 3 cx
+    """
+    directed = set(edges)
+    swaps = 0
+    depth = 0
+    for control, target in interactions:
+        a, b = placement[control], placement[target]
+        gate_swaps = dist[a][b] - 1
+        swaps += gate_swaps
+
+        gate_depth = 2 + 2 * 3 * gate_swaps
+        if gate_swaps == 0 and (a, b) not in directed:
+            gate_depth += 2 * 2
+        depth += gate_depth
+
+    return swaps, depth
+
+
+def search(logical_qubits, interactions, n_qubits, edges, preferred=None):
+    """
+    :param preferred: placement kept unless another one costs strictly less
+    (e.g. the layout stored results were run with)
+    :return: placement (logical qubit -> physical qubit) with the lowest cost
+    """
+    if len(logical_qubits) > n_qubits:
+        raise Exception('{} qubits do not fit on {} physical qubits'.format(len(logical_qubits), n_qubits))
+
+    dist = distances(n_qubits, edges)
+
+    best, best_cost = None, None
+    if preferred is not None:
+        best = {logical: preferred[logical] for logical in logical_qubits}
+        best_cost = cost(best, interactions, dist, edges)
+
+    candidates = math.perm(n_qubits, len(logical_qubits))
+    if candidates <= EXHAUSTIVE_LIMIT:
+        for physical in itertools.permutations(range(n_qubits), len(logical_qubits)):
+            placement = dict(zip(logical_qubits, physical))
+            placement_cost = cost(placement, interactions, dist, edges)
+            if best_cost is None or placement_cost < best_cost:
+                best, best_cost = placement, placement_cost
+        return best
+
+    placement = _greedy(logical_qubits, interactions, n_qubits, edges, dist)
+    if best_cost is None or cost(placement, interactions, dist, edges) < best_cost:
+        best = placement
+    return best
+
+
+def _greedy(logical_qubits, interactions, n_qubits, edges, dist):
+    degree = collections.Counter(q for edge in edges for q in edge)
+    weight = collections.Counter(q for pair in interactions for q in pair)
+
+    placement = {}
+    free = set(range(n_qubits))
+    for logical in sorted(logical_qubits, key=lambda q: -weight[q]):
+        placed_partners = [placement[b if a == logical else a] for a, b in interactions
+                           if logical in (a, b) and (b if a == logical else a) in placement]
+
+        physical = min(free, key=lambda p: (sum(dist[p][r] for r in placed_partners), -degree[p], p))
+        placement[logical] = physical
+        free.remove(physical)
+
+    return placement
+
+
+def _load_layouts():
+    try:
+        with open(LAYOUTS_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def legacy_placement(backend, memory_size, c_size):
+    """
+    :return: placement (logical qubit -> physical qubit) the stored results
+    of backend were run with, or None
+    """
+    if backend != cache.LEGACY_BACKEND or c_size != cache.LEGACY_C_SIZE:
+        return None
+    legacy_layout = cache.LEGACY_LAYOUTS.get(memory_size)
+    if legacy_layout is None:
+        return None
+    return {logical: physical for logical, (_, physical) in legacy_layout.items()}
+
+
+def best_layout(backend, memory_size, c_size=1):
+    """
+    :return: initial_layout with the fewest SWAPs and lowest depth for the
+    recovery circuit on backend, cached in exps/layouts.json; among layouts
+    of equal cost the one of the stored results wins, so they stay cached
+    """
+    key = '{}_{}_{}'.format(backend, memory_size, c_size)
+
+    legacy = legacy_placement(backend, memory_size, c_size)
+
+    cached = _load_layouts().get(key)
+    # layouts cached before the stored ones were preferred are searched again
+    if cached is not None and legacy is not None and {tuple(l): p for l, p in cached} != legacy:
+        cached = None
+
+    if cached is None:
+        logical_qubits = [('memory', k) for k in range(memory_size)] + [('ancilla', j) for j in range(c_size)]
+        n_qubits, edges = load_coupling_map(backend)
+        placement = search(logical_qubits, recover_interactions(memory_size, c_size), n_qubits, edges,
+                           preferred=legacy)
+
+        cached = [[list(logical), physical] for logical, physical in placement.items()]
+        with _layouts_lock:
+            layouts = _load_layouts()
+            layouts[key] = cached
+            os.makedirs(os.path.dirname(LAYOUTS_FILE), exist_ok=True)
+            with open(LAYOUTS_FILE, 'w') as file:
+                json.dump(layouts, file, indent=1, sort_keys=True)
+
+    return {tuple(logical): ('q', physical) for logical, physical in cached}
@@ -0,0 +1,59 @@
+import importlib
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule(object):
+
+    """
+    stand-in for a module that is imported on first attribute access, so
+    that qiskit, matplotlib and the IBM Q API are only loaded by the code
+    paths that use them
+
+    :param name: absolute module name
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return '<lazy module {!r} ({})>'.format(self._name, state)
+
+
+def module(name):
+    """
+    :return: the module if it is already imported, otherwise a LazyModule
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def loaded(module):
+    """
+    :return: whether module has been imported
+    """
+    return not isinstance(module, LazyModule) or module.__dict__['_module'] is not None
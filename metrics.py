@@ -0,0 +1,137 @@
+import numpy as np
+
+METRICS = ['mse', 'tvd', 'kl', 'hellinger_fidelity']
+
+# Probability floor used by the KL divergence for outcomes never observed
+KL_EPSILON = 1e-12
+
+
+def _outcome_index(outcome, width, clbits=None):
+    """
+    Outcomes of width bits are the ancilla register itself. Device results
+    such as ibmqx4 report every clbit of the chip ('00000', '00100'), the
+    ancilla bits are then read from clbits
+
+    :param clbits: clbit holding each ancilla bit in outcomes wider than
+    width (clbit 0 is the last character). Without it a single ancilla is
+    0 only in the all-zero outcome, as the unmeasured clbits read 0
+    :return: ancilla state j of outcome, bit t of j is ancilla t
+    """
+    bits = outcome.replace(' ', '')
+    if len(bits) == width:
+        return int(bits, 2)
+    if clbits is not None:
+        return sum(int(bits[-1 - c]) << t for t, c in enumerate(clbits))
+    if width == 1:
+        return int('1' in bits)
+    raise ValueError('Outcome {} has {} clbits, the clbits of the {} ancilla bits are required'.format(
+        outcome, len(bits), width))
+
+
+def distributions(result, names, width=1, clbits=None):
+    """
+    :param result: qiskit Result or store.CountsResult
+    :param names: circuit (memory pattern) names
+    :param width: number of measured (ancilla) bits
+    :param clbits: clbit of each ancilla bit, see _outcome_index
+    :return: matrix of outcome probabilities (len(names) x 2**width), column
+    j is the probability of the ancilla state j
+    """
+    if hasattr(result, 'column'):
+        rows = [result.get_names().index(name) for name in names]
+        onehot = np.zeros((len(result.outcomes), 2 ** width))
+        for j, outcome in enumerate(result.outcomes):
+            onehot[j, _outcome_index(outcome, width, clbits)] = 1
+        counts = np.asarray(result.counts[rows], dtype=float) @ onehot
+    else:
+        counts = np.zeros((len(names), 2 ** width))
+        for i, name in enumerate(names):
+            for outcome, value in result.get_data(name)['counts'].items():
+                counts[i, _outcome_index(outcome, width, clbits)] += value
+
+    totals = counts.sum(axis=1, keepdims=True)
+    return counts / np.where(totals == 0, 1, totals)
+
+
+def squared_error(p, q, outcome=0):
+    return (p[..., outcome] - q[..., outcome]) ** 2
+
+
+def tvd(p, q):
+    return 0.5 * np.abs(p - q).sum(axis=-1)
+
+
+def kl(p, q):
+    q = np.maximum(q, KL_EPSILON)
+    terms = np.where(p > 0, p * np.log(np.where(p > 0, p, 1) / q), 0)
+    return terms.sum(axis=-1)
+
+
+def hellinger_fidelity(p, q):
+    return np.sqrt(p * q).sum(axis=-1) ** 2
+
+
+def evaluate(p, q, outcome=0):
+    """
+    :param p: reference distributions (... x outcomes)
+    :param q: compared distributions (... x outcomes)
+    :return: dict metric name -> array over the leading axes
+    """
+    return {'mse': squared_error(p, q, outcome),
+            'tvd': tvd(p, q),
+            'kl': kl(p, q),
+            'hellinger_fidelity': hellinger_fidelity(p, q)}
+
+
+def pairs(exp_results, reference, target, input_patterns):
+    for input_pattern in input_patterns:
+        yield input_pattern, exp_results[reference][input_pattern], exp_results[target][input_pattern]
+
+
+def stream(result_pairs, width=1, outcome=0, clbits=None):
+    """
+    :param result_pairs: iterable of (input_pattern, reference_result, target_result)
+    :param clbits: clbit of each ancilla bit in outcomes wider than width
+    :return: generator of (input_pattern, memory names, metrics) with one
+    value per memory pattern in each metric array
+    """
+    for input_pattern, reference_result, target_result in result_pairs:
+        names = target_result.get_names()
+        p = distributions(reference_result, names, width, clbits)
+        q = distributions(target_result, names, width, clbits)
+        yield input_pattern, names, evaluate(p, q, outcome)
+
+
+def compare(result_pairs, width=1, outcome=0, clbits=None):
+    """
+    Averages every metric over the input patterns without keeping the results
+
+    :return: dict metric name -> dict memory pattern -> mean value
+    """
+    names = None
+    sums = None
+    n = 0
+    for _, pair_names, values in stream(result_pairs, width, outcome, clbits):
+        if names is None:
+            names = pair_names
+            sums = {metric: np.zeros(len(names)) for metric in METRICS}
+        elif pair_names != names:
+            raise ValueError('Memory patterns differ between inputs: {} != {}'.format(pair_names, names))
+
+        for metric in METRICS:
+            sums[metric] += values[metric]
+        n += 1
+
+    if names is None:
+        return {metric: {} for metric in METRICS}
+
+    return {metric: dict(zip(names, sums[metric] / n)) for metric in METRICS}
+
+
+def compare_backends(exp_results, input_patterns, reference='quantum', width=1, outcome=0, clbits=None):
+    """
+    :return: dict backend -> metric name -> memory pattern -> mean value, for
+    every backend in exp_results other than reference
+    """
+    return {backend: compare(pairs(exp_results, reference, backend, input_patterns), width, outcome, clbits)
+            for backend in exp_results if backend != reference}
@@ -0,0 +1,346 @@
+import json
+import math
+import os
+import numpy as np
+import statevector
+import util
+
+CALIBRATIONS_FOLDER = 'calibrations/'
+
+# Calibration used by the noise backend when none is given
+CALIBRATION = 'ibmqx4'
+
+# Frame changes: implemented in software on IBM Q devices, so noiseless
+VIRTUAL_GATES = {'id', 'u1', 'rz', 'z', 's', 'sdg', 't', 'tdg'}
+
+# Number of cx in the decomposition of multi-qubit gates (other
+# multi-qubit gates count as one)
+CX_COUNT = {'cu1': 2, 'cu3': 2, 'ch': 2, 'cy': 1, 'cz': 1, 'swap': 3, 'ccx': 6}
+
+# Parameters tuned by fit, with their bounds
+FIT_PARAMETERS = {'depolarizing_1q': (1e-5, 0.5),
+                  'depolarizing_2q': (1e-5, 0.5),
+                  'readout_0': (1e-5, 0.5),
+                  'readout_1': (1e-5, 0.5),
+                  't1': (1e-7, 1e-3),
+                  't2': (1e-7, 1e-3)}
+
+# Weight of the squared log deviation from the initial calibration added to
+# the fit error: parameters the results barely constrain (T1 and T2 on a few
+# short circuits) stay near the calibration instead of drifting to a bound
+PRIOR_WEIGHT = 1e-5
+
+
+class NoiseModel(object):
+
+    """
+    gate and readout noise of a device
+
+    :param depolarizing_1q: depolarizing probability of single-qubit gates
+    :param depolarizing_2q: depolarizing probability of a cx
+    :param readout_0: probability of reading 1 from a qubit in |0>
+    :param readout_1: probability of reading 0 from a qubit in |1>
+    :param t1: relaxation time (seconds)
+    :param t2: dephasing time (seconds), at most 2 * t1
+    :param gate_time_1q: duration of single-qubit gates (seconds)
+    :param gate_time_2q: duration of a cx (seconds)
+    """
+
+    def __init__(self, depolarizing_1q=0.0, depolarizing_2q=0.0, readout_0=0.0, readout_1=0.0, t1=math.inf,
+                 t2=math.inf, gate_time_1q=0.0, gate_time_2q=0.0):
+        if t2 > 2 * t1:
+            raise ValueError('T2 ({}) must be at most 2 * T1 ({})'.format(t2, t1))
+
+        self.depolarizing_1q = depolarizing_1q
+        self.depolarizing_2q = depolarizing_2q
+        self.readout_0 = readout_0
+        self.readout_1 = readout_1
+        self.t1 = t1
+        self.t2 = t2
+        self.gate_time_1q = gate_time_1q
+        self.gate_time_2q = gate_time_2q
+
+    @classmethod
+    def load(cls, name=CALIBRATION):
+        """
+        :param name: calibration name, read from calibrations/<name>.json
+        """
+        with open(CALIBRATIONS_FOLDER + name + '.json') as file:
+            return cls(**json.load(file))
+
+    def save(self, name):
+        filename = CALIBRATIONS_FOLDER + name + '.json'
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as file:
+            json.dump(self.to_dict(), file, indent=1, sort_keys=True)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def gate_noise(self, name, n_qubits):
+        """
+        :return: depolarizing probability and duration of a gate
+        """
+        if name in VIRTUAL_GATES:
+            return 0.0, 0.0
+
+        if n_qubits == 1:
+            return self.depolarizing_1q, self.gate_time_1q
+
+        cx = CX_COUNT.get(name, 1)
+        return 1 - (1 - self.depolarizing_2q) ** cx, cx * self.gate_time_2q
+
+    def readout_matrix(self):
+        """
+        :return: matrix of P(read i | state j)
+        """
+        return np.array([[1 - self.readout_0, self.readout_1],
+                         [self.readout_0, 1 - self.readout_1]])
+
+
+def apply_unitary(rho, matrix, qubits, n):
+    rho = statevector.apply_gate(rho, matrix, qubits)
+    return statevector.apply_gate(rho, matrix.conj(), [n + q for q in qubits])
+
+
+def depolarize(rho, qubits, p, n):
+    """
+    :return: (1 - p) rho + p (I / 2^k tensor the state of the other qubits)
+    """
+    if p == 0:
+        return rho
+
+    k = len(qubits)
+    axes = list(qubits) + [n + q for q in qubits]
+    moved = np.moveaxis(rho, axes, list(range(2 * k)))
+    rest_shape = moved.shape[2 * k:]
+
+    rest = np.trace(moved.reshape((2 ** k, 2 ** k) + rest_shape), axis1=0, axis2=1)
+    mixed = np.multiply.outer(np.eye(2 ** k) / 2 ** k, rest).reshape(moved.shape)
+
+    return (1 - p) * rho + p * np.moveaxis(mixed, list(range(2 * k)), axes)
+
+
+def relax(rho, qubit, duration, t1, t2, n):
+    """
+    :return: rho after amplitude damping (T1) and dephasing (T2) of qubit
+    for duration
+    """
+    if duration == 0:
+        return rho
+
+    gamma = 1 - math.exp(-duration / t1)
+    coherence = math.exp(-duration / t2)
+
+    r = np.moveaxis(rho, [qubit, n + qubit], [0, 1]).copy()
+    r[0, 0] += gamma * r[1, 1]
+    r[1, 1] *= 1 - gamma
+    r[0, 1] *= coherence
+    r[1, 0] *= coherence
+
+    return np.moveaxis(r, [0, 1], [qubit, n + qubit])
+
+
+def initialize(rho, amplitudes, qubits, n):
+    k = len(qubits)
+    axes = list(qubits) + [n + q for q in qubits]
+    rest = np.moveaxis(rho, axes, list(range(2 * k)))[(0,) * 2 * k]
+
+    d = 2 ** (n - k)
+    if not np.isclose(np.trace(rest.reshape(d, d)).real, 1):
+        raise ValueError('initialize is only supported on qubits in state |0>')
+
+    # qiskit orders amplitudes little-endian: qubits[0] is the least significant bit
+    amplitudes = np.asarray(amplitudes, dtype=complex).reshape((2,) * k)
+    rho = np.multiply.outer(np.multiply.outer(amplitudes, amplitudes.conj()), rest)
+
+    reversed_qubits = list(reversed(qubits))
+    return np.moveaxis(rho, list(range(2 * k)), reversed_qubits + [n + q for q in reversed_qubits])
+
+
+class DensityMatrix(statevector.Statevector):
+
+    """
+    density matrix of the quantum registers of a circuit under a noise
+    model; axis q is the ket and axis n + q the bra of qubit q
+
+    :param qregs: quantum registers, see statevector.Statevector
+    :param model: NoiseModel
+    """
+
+    def __init__(self, qregs, model):
+        super(DensityMatrix, self).__init__(qregs)
+        self.n = len(self.qubits)
+        self.state = np.multiply.outer(self.state, self.state.conj())
+        self.model = model
+
+    def apply(self, instruction):
+        name = instruction.name
+
+        if name in ('barrier', 'measure'):
+            return super(DensityMatrix, self).apply(instruction)
+
+        qubits = [self.index(q) for q in instruction.arg]
+
+        if name in statevector.INITIALIZE:
+            params = [complex(p) for p in instruction.param]
+            self.state = initialize(self.state, params, qubits, self.n)
+            return
+
+        params = [float(p) for p in instruction.param]
+        matrix = statevector.gate_matrix(name, params)
+        # identities (u3(0, 0, 0) of the zero input bits) are removed by the compiler
+        if np.allclose(matrix, np.eye(len(matrix))):
+            return
+
+        self.state = apply_unitary(self.state, matrix, qubits, self.n)
+
+        p, duration = self.model.gate_noise(name, len(qubits))
+        self.state = depolarize(self.state, qubits, p, self.n)
+        for q in qubits:
+            self.state = relax(self.state, q, duration, self.model.t1, self.model.t2, self.n)
+
+    def qubit_probabilities(self):
+        d = 2 ** self.n
+        probs = np.diagonal(self.state.reshape(d, d)).real.reshape((2,) * self.n)
+
+        readout = self.model.readout_matrix()
+        for q, _ in self.measures:
+            probs = np.moveaxis(np.tensordot(readout, probs, axes=(1, q)), 0, q)
+
+        return probs
+
+
+def probabilities(memory, model):
+    """
+    :param memory: PQM instance
+    :return: probability of each ancilla outcome under model
+    """
+    dm = DensityMatrix([memory.mqr, memory.cqr], model).run(memory.circuit)
+    return dm.probabilities(memory.cr.size)
+
+
+def run(memories, shots, calibration=CALIBRATION, sampled=False, seed=None):
+    """
+    :param calibration: NoiseModel or calibration name
+    :return: results in the format accepted by util._to_result, see
+    statevector.run
+    """
+    model = NoiseModel.load(calibration) if isinstance(calibration, str) else calibration
+    rng = np.random.default_rng(seed)
+
+    results = []
+    for memory in memories:
+        probs = probabilities(memory, model)
+        if sampled:
+            counts = statevector.sample(probs, shots, rng)
+        else:
+            counts = {k: v * shots for k, v in probs.items()}
+        results.append({'name': memory.circuit_name, 'counts': counts})
+
+    return results
+
+
+# Parameters are fitted on a log scale
+def _to_vector(model):
+    return np.array([math.log(min(max(getattr(model, parameter), low), high))
+                     for parameter, (low, high) in FIT_PARAMETERS.items()])
+
+
+def _from_vector(vector, base):
+    values = base.to_dict()
+    for (parameter, (low, high)), value in zip(FIT_PARAMETERS.items(), vector):
+        values[parameter] = min(max(math.exp(value), low), high)
+    return NoiseModel(**values)
+
+
+def error(model, memories, hardware, width=1, hardware_backend='ibmqx4', clbits=None):
+    """
+    :param memories: dict input pattern -> bound PQM instances
+    :param hardware: dict input pattern -> hardware result of the same memories
+    :param clbits: clbit of each ancilla in the hardware outcomes, see util.MSE
+    :return: mean over memory patterns of util.MSE between hardware and the
+    noise model
+    """
+    simulated = {input_pattern: util._to_result(run(mems, 1, model), backend_name=__name__)
+                 for input_pattern, mems in memories.items()}
+    exp_results = {hardware_backend: hardware, __name__: simulated}
+
+    mse = util.MSE(exp_results, list(hardware), reference=hardware_backend, target=__name__, width=width,
+                   clbits=clbits)
+    return float(np.mean(list(mse.values())))
+
+
+def fit(memories, hardware, initial=CALIBRATION, width=1, hardware_backend='ibmqx4', maxiter=400, clbits=None,
+        prior_weight=PRIOR_WEIGHT):
+    """
+    Tunes the FIT_PARAMETERS of a noise model to minimize util.MSE against
+    hardware results plus prior_weight times the squared log deviation from
+    the initial model (Nelder-Mead, gate times stay fixed)
+
+    :param initial: NoiseModel or calibration name to start from
+    :return: fitted NoiseModel and its error
+    """
+    from scipy.optimize import minimize
+
+    base = NoiseModel.load(initial) if isinstance(initial, str) else initial
+    start = _to_vector(base)
+
+    def objective(vector):
+        try:
+            model = _from_vector(vector, base)
+        except ValueError:
+            return math.inf
+        prior = prior_weight * float(np.sum((vector - start) ** 2))
+        return error(model, memories, hardware, width, hardware_backend, clbits) + prior
+
+    solution = minimize(objective, start, method='Nelder-Mead', options={'maxiter': maxiter})
+    model = _from_vector(solution.x, base)
+
+    return model, error(model, memories, hardware, width, hardware_backend, clbits)
+
+
+def fit_experiment(exp_config, input_patterns, mem_patterns, c_size, num_shots, scale_parameter,
+                   hardware_backend='ibmqx4', initial=CALIBRATION, save_as=None):
+    """
+    Fits a noise model to the stored hardware results of an experiment; input
+    patterns without a stored result are skipped (nothing is submitted)
+
+    :param save_as: calibration name the fitted model is saved under
+    :return: fitted NoiseModel and its error
+    """
+    import cache
+    import pqm_experiment
+
+    mem_init = exp_config['initialization_method']
+    memory_size = exp_config['memory_size']
+    patterns = list(mem_patterns[str(memory_size)].values())
+
+    memories, hardware = {}, {}
+    for input_pattern in input_patterns:
+        mems = [pqm_experiment.set_memory(v, memory_size, c_size, input_pattern, mem_init,
+                                          scale_parameter=scale_parameter)
+                for v in patterns]
+        job_name = pqm_experiment.job_name(hardware_backend, input_pattern, mem_init, scale_parameter,
+                                           exp_config['initial_layout'])
+
+        result = cache.load_legacy(job_name, mems, num_shots, exp_config['initial_layout'])
+        if result is None:
+            print('No stored {} result for input {}, skipping'.format(hardware_backend, input_pattern))
+            continue
+
+        memories[input_pattern] = mems
+        hardware[input_pattern] = result
+
+    if not hardware:
+        raise ValueError('No stored {} results to fit'.format(hardware_backend))
+
+    clbits = pqm_experiment.ancilla_clbits(exp_config['initial_layout'], c_size)
+    model, model_error = fit(memories, hardware, initial, width=c_size, hardware_backend=hardware_backend,
+                             clbits=clbits)
+    print('Fitted noise model (MSE {}): {}'.format(model_error, model.to_dict()))
+
+    if save_as is not None:
+        model.save(save_as)
+
+    return model, model_error
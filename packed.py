@@ -0,0 +1,176 @@
+import numpy as np
+
+WORD_SIZE = 64
+
+# Number of set bits for every byte value
+_POPCOUNT = np.array([bin(x).count('1') for x in range(256)], dtype=np.uint8)
+
+
+class PackedPatterns(object):
+
+    """
+    binary patterns packed into np.uint64 words (first bit is the most
+    significant bit of the first word)
+
+    :param words: matrix of np.uint64 words with one row per pattern
+    :param n_bits: number of bits in each pattern
+    """
+
+    def __init__(self, words, n_bits):
+        words = np.atleast_2d(np.asarray(words, dtype=np.uint64))
+        if words.shape[1] * WORD_SIZE < n_bits:
+            raise ValueError('{} words cannot hold {} bits'.format(words.shape[1], n_bits))
+
+        self.words = words
+        self.n_bits = n_bits
+
+    @classmethod
+    def from_bits(cls, bits):
+        bits = np.atleast_2d(np.asarray(bits, dtype=np.uint8))
+        m, n = bits.shape
+        n_words = max(1, -(-n // WORD_SIZE))
+
+        padded = np.zeros((m, n_words * WORD_SIZE), dtype=np.uint8)
+        padded[:, :n] = bits
+        words = np.packbits(padded, axis=1).view('>u8').astype(np.uint64)
+
+        return cls(words, n)
+
+    @classmethod
+    def from_strings(cls, patterns):
+        return cls.from_bits(to_bits(patterns))
+
+    def to_bits(self):
+        bytes_ = self.words.astype('>u8').view(np.uint8)
+        return np.unpackbits(bytes_, axis=1)[:, :self.n_bits]
+
+    def to_strings(self):
+        n = self.n_bits
+        chars = (self.to_bits() + ord('0')).astype(np.uint8).tobytes().decode('ascii')
+        return [chars[k*n:(k+1)*n] for k in range(len(self))]
+
+    def distance(self, pattern):
+        """
+        :param pattern: a single pattern
+        :return: Hamming distance between pattern and every stored pattern
+        """
+        other = pack(pattern)
+        if len(other) != 1:
+            raise ValueError('expected a single pattern, got {}'.format(len(other)))
+        self._check_width(other)
+
+        return popcount(self.words ^ other.words[0]).sum(axis=1, dtype=np.int64)
+
+    def distances(self, other):
+        """
+        :param other: patterns to compare against
+        :return: matrix of Hamming distances (len(self) x len(other))
+        """
+        other = pack(other)
+        self._check_width(other)
+
+        diff = self.words[:, None, :] ^ other.words[None, :, :]
+        return popcount(diff).sum(axis=2, dtype=np.int64)
+
+    def _check_width(self, other):
+        if other.n_bits != self.n_bits:
+            raise ValueError('pattern width mismatch: {} != {}'.format(other.n_bits, self.n_bits))
+
+    def __len__(self):
+        return self.words.shape[0]
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self[[item]].to_strings()[0]
+        return PackedPatterns(self.words[item], self.n_bits)
+
+    def __iter__(self):
+        return iter(self.to_strings())
+
+    def __str__(self):
+        return str(self.to_strings())
+
+    def __repr__(self):
+        return 'PackedPatterns({})'.format(self.to_strings())
+
+
+def popcount(words):
+    """
+    :param words: array of np.uint64 words
+    :return: number of set bits in each word
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+
+    words = np.ascontiguousarray(words)
+    bytes_ = words.view(np.uint8).reshape(words.shape + (8,))
+    return _POPCOUNT[bytes_].sum(axis=-1, dtype=np.uint8)
+
+
+def pack(patterns):
+    if isinstance(patterns, PackedPatterns):
+        return patterns
+    return PackedPatterns.from_bits(to_bits(patterns))
+
+
+def unique(patterns):
+    """
+    :return: PackedPatterns with the distinct patterns, in order of first
+    appearance
+    """
+    patterns = pack(patterns)
+    _, first = np.unique(patterns.words, axis=0, return_index=True)
+    return patterns[np.sort(first)]
+
+
+def to_bits(patterns):
+    """
+    :param patterns: bit string, list of bit strings, 0/1 matrix or PackedPatterns
+    :return: 0/1 np.uint8 matrix with one row per pattern
+    """
+    if isinstance(patterns, PackedPatterns):
+        return patterns.to_bits()
+
+    if isinstance(patterns, np.ndarray):
+        bits = np.atleast_2d(patterns)
+        if bits.size and not np.isin(bits, (0, 1)).all():
+            raise ValueError('patterns must only contain 0 and 1')
+        return bits.astype(np.uint8, copy=False)
+
+    patterns = as_strings(patterns)
+    n = len(patterns[0]) if patterns else 0
+    if any(len(p) != n for p in patterns):
+        raise ValueError('patterns must have the same length')
+
+    chars = ''.join(patterns)
+    if chars.strip('01'):
+        raise ValueError('patterns must only contain the characters 0 and 1, got {!r}'.format(
+            sorted(set(chars) - set('01'))))
+
+    bits = np.frombuffer(chars.encode('ascii'), dtype=np.uint8) - ord('0')
+    return bits.reshape(len(patterns), n)
+
+
+def as_string(pattern):
+    if isinstance(pattern, str):
+        return pattern
+
+    if isinstance(pattern, PackedPatterns):
+        if len(pattern) != 1:
+            raise ValueError('expected a single pattern, got {}'.format(len(pattern)))
+        return pattern[0]
+
+    return ''.join(str(int(bit)) for bit in pattern)
+
+
+def as_strings(patterns):
+    if isinstance(patterns, str):
+        return [patterns]
+
+    if isinstance(patterns, PackedPatterns):
+        return patterns.to_strings()
+
+    if isinstance(patterns, np.ndarray):
+        return PackedPatterns.from_bits(patterns).to_strings()
+
+    return [as_string(p) for p in patterns]
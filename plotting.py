@@ -0,0 +1,136 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import lazy
+import telemetry
+import util
+
+style = lazy.module('matplotlib.style')
+
+# Resolution of the raster formats; vector formats ignore it except for
+# embedded images
+DPI = {'png': 150, 'pdf': 300, 'svg': 72}
+FORMATS = list(DPI)
+
+# Hashes of the drawn figures, relative to util.PLOTS_FOLDER
+INDEX_FILE = 'index.json'
+
+# Bump when the rendering code changes so every figure is redrawn
+PLOT_VERSION = 1
+
+
+def figure_hash(figure, fmt, dpi):
+    """
+    :return: hash of everything a figure is drawn from
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([PLOT_VERSION, fmt, dpi, figure], sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def filename(figure, fmt):
+    return '{}.{}'.format(figure['name'], fmt)
+
+
+def draw(figure, fmt='png', dpi=None):
+    """
+    Renders a bar plot figure (see pqm_experiment.plot_data) to
+    PLOTS_FOLDER on a non-interactive canvas (Agg for png), without pyplot's
+    global state
+
+    :param figure: dict with name, title, orientation, x_labels, max_shots
+    and series (label, counts, measure)
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.backends.backend_svg import FigureCanvasSVG
+    from matplotlib.backends.backend_pdf import FigureCanvasPdf
+
+    canvases = {'png': FigureCanvasAgg, 'pdf': FigureCanvasPdf, 'svg': FigureCanvasSVG}
+    dpi = DPI[fmt] if dpi is None else dpi
+
+    with telemetry.timer('plot', figure=figure['name'], format=fmt), style.context(util.PLOT_STYLE):
+        fig = Figure()
+        canvases[fmt](fig)
+        ax = fig.add_subplot(1, 1, 1)
+
+        base_width = 0.3
+        for offset, series in enumerate(figure['series'], -1):
+            util.bar_plot(series['counts'], series['label'], figure['x_labels'], series['measure'], base_width,
+                          base_width * offset, figure['max_shots'], figure['orientation'], ax=ax)
+
+        if figure['orientation'] == 'H':
+            ax.invert_yaxis()
+
+        ax.set_title(figure['title'])
+        ax.legend()
+        ax.grid()
+        fig.tight_layout()
+
+        path = util.PLOTS_FOLDER + filename(figure, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fig.savefig(path, format=fmt, dpi=dpi)
+
+    return path
+
+
+def _load_index():
+    try:
+        with open(util.PLOTS_FOLDER + INDEX_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_index(index):
+    index_file = util.PLOTS_FOLDER + INDEX_FILE
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    tmp_filename = index_file + '.tmp'
+    with open(tmp_filename, 'w') as file:
+        json.dump(index, file, indent=1, sort_keys=True)
+    os.replace(tmp_filename, index_file)
+
+
+def render(figures, fmt='png', dpi=None, workers=None, force=False):
+    """
+    Draws every figure whose data changed since it was last drawn
+
+    :param figures: list of figure dicts
+    :param workers: number of processes (None uses every cpu, 1 draws in
+    this process)
+    :param force: redraw unchanged figures
+    :return: list of paths drawn
+    """
+    dpi = DPI[fmt] if dpi is None else dpi
+    index = _load_index()
+
+    pending = {}
+    for figure in figures:
+        name = filename(figure, fmt)
+        digest = figure_hash(figure, fmt, dpi)
+        if not force and index.get(name) == digest and os.path.exists(util.PLOTS_FOLDER + name):
+            continue
+        pending[name] = (figure, digest)
+
+    drawn = []
+    if workers is not None and workers <= 1 or len(pending) <= 1:
+        for name, (figure, digest) in pending.items():
+            drawn.append(draw(figure, fmt, dpi))
+            index[name] = digest
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(draw, figure, fmt, dpi): (name, digest)
+                       for name, (figure, digest) in pending.items()}
+            for future in concurrent.futures.as_completed(futures):
+                name, digest = futures[future]
+                drawn.append(future.result())
+                index[name] = digest
+
+    if pending:
+        _save_index(index)
+
+    print('Drew {} of {} figures ({} unchanged)'.format(len(drawn), len(figures), len(figures) - len(drawn)))
+    telemetry.count('plot_skipped', len(figures) - len(drawn))
+
+    return drawn
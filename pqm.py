@@ -16,8 +16,15 @@
 # -----------------------------------------------------------------------------
 
 
-import qiskit
-import sympy as sp
+import copy
+import itertools
+import math
+import lazy
+import packed
+import sparse
+
+qiskit = lazy.module('qiskit')
+sp = lazy.module('sympy')
 
 class PQM(object):
 
@@ -39,6 +46,8 @@ class PQM(object):
         self.pattern = [0 for x in range(memory_size)]
         self.m_input = None
         self.scale_parameter = 1
+        self.input_symbols = None
+        self.scale_symbol = None
         
         mqr = qiskit.QuantumRegister(self.memory_size, 'memory')
         
@@ -52,52 +61,240 @@ class PQM(object):
         self.cr = cr
 
     def set_memory(self, amplitudes):
+        """
+        :param amplitudes: 2^n amplitudes or sparse.SparseAmplitudes
+        """
+        if isinstance(amplitudes, sparse.SparseAmplitudes):
+            if amplitudes.n_qubits != self.memory_size:
+                raise Exception('Pattern size must be equal to memory size')
+            amplitudes = amplitudes.to_dense()
+
         self.circuit.initialize(amplitudes, self.mqr)
 
-    def store(self, pattern):
-        # TODO implement storage algorithm arXiv:quant-ph/0012100
-        if len(pattern) > self.memory_size:
-            raise Exception
-        
-        self.pattern = pattern
-        for i in pattern:
-            if i == 1:
-                self.circuit.x(self.mqr[i])
-        
+    def store(self, patterns):
+        """
+        Prepares the uniform superposition of patterns in the memory register,
+        the memory state of the storage algorithm of arXiv:quant-ph/0012100,
+        without its auxiliary registers.
+
+        Qubit k is rotated once, by a rotation multiplexed on the fewest
+        earlier qubits that tell apart the pattern prefixes needing different
+        angles. Memories of p patterns therefore need about log2(p) controls
+        per qubit instead of the exponential circuit of initialize.
+
+        :param patterns: patterns to store, bit k of each pattern is
+        stored in memory qubit k (repeated patterns are stored once), or
+        sparse.SparseAmplitudes with nonnegative real amplitudes
+        """
+        weights = None
+        if isinstance(patterns, sparse.SparseAmplitudes):
+            if not patterns.is_nonnegative():
+                raise Exception('Only nonnegative real amplitudes can be stored')
+            weights = dict(zip(patterns.patterns.to_strings(), patterns.probabilities()))
+            patterns = [p for p, w in weights.items() if w > 0]
+
+        patterns = sorted(set(packed.as_strings(patterns)))
+        if any(len(p) != self.memory_size for p in patterns):
+            raise Exception('Pattern size must be equal to memory size')
+
+        self.pattern = patterns
+
+        groups = [patterns]
+        for k in range(self.memory_size):
+            prefixes = [group[0][:k] for group in groups]
+            angles = []
+            for group in groups:
+                if weights is None:
+                    ones, total = sum(1 for p in group if p[k] == '1'), len(group)
+                else:
+                    ones, total = sum(weights[p] for p in group if p[k] == '1'), sum(weights[p] for p in group)
+                angles.append(2 * math.asin(math.sqrt(min(ones / total, 1))))
+
+            controls = _distinguishing_bits(prefixes, angles)
+
+            alpha = [0] * 2 ** len(controls)
+            for prefix, angle in zip(prefixes, angles):
+                j = sum(int(prefix[c]) << t for t, c in enumerate(controls))
+                alpha[j] = angle
+
+            self._multiplexed_ry(alpha, [self.mqr[c] for c in controls], self.mqr[k])
+
+            groups = [[p for p in group if p[k] == bit] for group in groups for bit in '01']
+            groups = [group for group in groups if group]
+
+    def _multiplexed_ry(self, alpha, controls, target):
+        """
+        Rotates target (in state |0>) by ry(alpha[j]) when the controls are
+        in state j (bit t of j is controls[t])
+        """
+        if not controls:
+            if math.isclose(alpha[0], math.pi):
+                self.circuit.x(target)
+            elif math.isclose(alpha[0], math.pi / 2):
+                self.circuit.h(target)
+            elif not math.isclose(alpha[0], 0, abs_tol=1e-12):
+                self.circuit.ry(alpha[0], target)
+            return
+
+        if len(controls) == 1 and all(math.isclose(a, 0, abs_tol=1e-12) or math.isclose(a, math.pi) for a in alpha):
+            if alpha[0] != 0:
+                self.circuit.x(target)
+            self.circuit.cx(controls[0], target)
+            return
+
+        # Gray code decomposition of a uniformly controlled rotation (quant-ph/0407010)
+        size = len(alpha)
+        for i in range(size):
+            gray = i ^ (i >> 1)
+            theta = sum((-1) ** bin(j & gray).count('1') * alpha[j] for j in range(size)) / size
+            if not math.isclose(theta, 0, abs_tol=1e-12):
+                self.circuit.ry(theta, target)
+
+            next_gray = ((i + 1) % size) ^ (((i + 1) % size) >> 1)
+            control = controls[(gray ^ next_gray).bit_length() - 1]
+            self.circuit.cx(control, target)
+
+    def report(self):
+        """
+        :return: gate counts, size and depth of the circuit
+        """
+        operations = []
+        for instruction in self.circuit.data:
+            wires = [(arg[0].name, arg[1]) for arg in instruction.arg]
+            operations.append((instruction.name, wires))
+
+        return gate_report(operations)
+
     def recover(self, m_input, scale_parameter = 1):
         """
         :param m_input:  input pattern
         :param scale_parameter:  Distance modifier
         :return: 0 with high probability if the Hamming distance
-        between input and patterns is close to 0 (:param not equal to 1 changes this behaviour)
+        between input and patterns is close to 0 (:param not equal to 1 changes this behaviour).
+        With c_size ancillas every ancilla is 0 with probability cos^(2*c_size) of the scaled distance
         """
-        ms = self.memory_size
-        n = ms
-        
+        m_input = packed.as_string(m_input)
         self.m_input = m_input
         self.scale_parameter = scale_parameter
-        
-        #XORi_j, m_k
-        for k in range(ms):
-            if int(m_input[k]) == 1:
+
+        self._recover([int(bit) for bit in m_input], scale_parameter)
+
+    def recover_template(self):
+        """
+        Appends the recovery circuit with symbolic input bits and scale
+        parameter. Input bit k is applied as u3(pi*x_k, 0, pi*x_k), which is
+        X for x_k = 1 and the identity for x_k = 0.
+        Use bind to get the circuit for a given input pattern.
+        """
+        self.input_symbols = sp.symbols('x0:{}'.format(self.memory_size))
+        self.scale_symbol = sp.Symbol('scale', positive=True)
+
+        self._recover(self.input_symbols, self.scale_symbol)
+
+    def bind(self, m_input, scale_parameter=1):
+        """
+        :param m_input: input pattern
+        :param scale_parameter: Distance modifier
+        :return: copy of this memory with the template parameters replaced
+        by m_input and scale_parameter
+        """
+        if self.input_symbols is None:
+            raise Exception('recover_template must be called before bind')
+
+        m_input = packed.as_string(m_input)
+        values = {s: sp.Integer(int(bit)) for s, bit in zip(self.input_symbols, m_input)}
+        values[self.scale_symbol] = sp.sympify(scale_parameter)
+
+        memory = copy.copy(self)
+        memory.circuit = qiskit.QuantumCircuit(self.mqr, self.cqr, self.cr, name=self.circuit_name)
+        memory.m_input = m_input
+        memory.scale_parameter = scale_parameter
+
+        for instruction in self.circuit.data:
+            if any(isinstance(p, sp.Basic) and p.free_symbols for p in instruction.param):
+                instruction = copy.copy(instruction)
+                instruction.param = [p.xreplace(values) if isinstance(p, sp.Basic) else p
+                                     for p in instruction.param]
+                instruction.circuit = memory.circuit
+            memory.circuit.data.append(instruction)
+
+        return memory
+
+    def _flip(self, bits):
+        for k in range(self.memory_size):
+            if isinstance(bits[k], sp.Basic):
+                self.circuit.u3(sp.pi * bits[k], 0, sp.pi * bits[k], self.mqr[k])
+            elif bits[k] == 1:
                 self.circuit.x(self.mqr[k])
-        
-        for k in range(ms):
-            self.circuit.u1(sp.pi/(2*n * scale_parameter), self.mqr[k])
 
-        # initialize uaxiliary quantum bit |c>
-        self.circuit.h(self.cqr[0])
+    def _recover(self, bits, scale_parameter):
+        ms = self.memory_size
+        n = ms
+
+        #XORi_j, m_k
+        self._flip(bits)
         
-        for k in range(ms):
-            self.circuit.cu1(- sp.pi/(n * scale_parameter), self.cqr[0], self.mqr[k])
+        # each auxiliary quantum bit |c_j> applies the same distance filter
+        for j in range(self.c_size):
+            for k in range(ms):
+                self.circuit.u1(sp.pi/(2*n * scale_parameter), self.mqr[k])
+
+            # initialize uaxiliary quantum bit |c_j>
+            self.circuit.h(self.cqr[j])
+
+            for k in range(ms):
+                self.circuit.cu1(- sp.pi/(n * scale_parameter), self.cqr[j], self.mqr[k])
             
         #XORi_j, m_k
-        for k in range(ms):
-            if int(m_input[k]) == 1:
-                self.circuit.x(self.mqr[k])
-            
-        self.circuit.h(self.cqr[0])
+        self._flip(bits)
+
+        for j in range(self.c_size):
+            self.circuit.h(self.cqr[j])
         
         self.circuit.barrier(self.mqr)
-        
-        self.circuit.measure(self.cqr[0], self.cr[0])
\ No newline at end of file
+
+        for j in range(self.c_size):
+            self.circuit.measure(self.cqr[j], self.cr[j])
+
+
+def _distinguishing_bits(prefixes, angles):
+    """
+    :return: prefix positions that tell apart every pair of prefixes with
+    different angles, chosen greedily
+    """
+    pairs = [(a, b) for a, b in itertools.combinations(range(len(prefixes)), 2)
+             if not math.isclose(angles[a], angles[b])]
+
+    bits = []
+    while pairs:
+        size = len(prefixes[0])
+        best = max(range(size), key=lambda t: sum(prefixes[a][t] != prefixes[b][t] for a, b in pairs))
+        bits.append(best)
+        pairs = [(a, b) for a, b in pairs if prefixes[a][best] == prefixes[b][best]]
+
+    return bits
+
+
+def gate_report(operations):
+    """
+    :param operations: list of (gate name, wires) pairs
+    :return: dict with gate counts, size, depth and number of two-qubit gates
+    """
+    counts = {}
+    levels = {}
+    depth = 0
+    two_qubit = 0
+    for name, wires in operations:
+        if name == 'barrier':
+            continue
+
+        counts[name] = counts.get(name, 0) + 1
+        if name != 'measure' and len(wires) == 2:
+            two_qubit += 1
+
+        level = 1 + max(levels.get(w, 0) for w in wires)
+        for w in wires:
+            levels[w] = level
+        depth = max(depth, level)
+
+    return {'gates': counts, 'size': sum(counts.values()), 'depth': depth, 'two_qubit': two_qubit}
@@ -1,8 +1,24 @@
+import inspect
 import numpy as np
 import pqm
 import util
-import matplotlib.pyplot as plt
 import quantum
+import packed
+import sparse
+import statevector
+import noise
+import scheduler
+import jobs
+import cache
+import adaptive
+import metrics
+import plotting
+import telemetry
+
+# Size limit of the result cache in bytes (None keeps every result)
+CACHE_MAX_BYTES = None
+
+result_cache = cache.ResultCache(max_bytes=CACHE_MAX_BYTES)
 
 
 def random_input(memory_size):
@@ -16,22 +32,29 @@ def decimal_input(input_value, memory_size):
     return pattern
 
 
-def random_amplitude(memory_size, mu=0, sigma=1):
-    amplitudes = sigma * np.random.randn(memory_size ** 2) + mu
-    amplitudes = amplitudes / np.linalg.norm(amplitudes)
-    return amplitudes
+def random_amplitude(memory_size, mu=0, sigma=1, support=None):
+    """
+    :param support: number of basis states with nonzero amplitude (default: all 2^memory_size)
+    :return: normalized vector of the 2^memory_size amplitudes, normally
+    distributed (see random_sparse_amplitude)
+    """
+    return random_sparse_amplitude(memory_size, mu, sigma, support).to_dense()
 
 
-def qiskit_init(memory, patterns):
-    amplitudes = np.zeros([memory.memory_size ** 2])
-    for value in patterns:
-        amplitudes[int(value, 2)] = 1
-    amplitudes = amplitudes / np.linalg.norm(amplitudes)
+def random_sparse_amplitude(memory_size, mu=0, sigma=1, support=None):
+    """
+    :param support: number of basis states with nonzero amplitude (default: all 2^memory_size)
+    :return: sparse.SparseAmplitudes with normally distributed amplitudes
+    """
+    return sparse.SparseAmplitudes.random(memory_size, support, mu, sigma)
 
-    memory.circuit.initialize(amplitudes, memory.mqr)
+
+def qiskit_init(memory, patterns):
+    memory.set_memory(sparse.superposition(patterns, memory.memory_size))
 
 
 def manual_init(memory, patterns):
+    patterns = packed.as_strings(patterns)
     mem_size = memory.memory_size
 
     if len(patterns) == 1:
@@ -48,236 +71,478 @@ def manual_init(memory, patterns):
                     memory.circuit.x(memory.mqr[i])
 
 
-def set_memory(pattern, memory_size, c_size, input_pattern, mem_init, scale_parameter=1):
-    memory = pqm.PQM(memory_size, c_size=c_size, circuit_name=str(pattern))
+def store_init(memory, patterns):
+    memory.store(patterns)
+
+
+def storage_report(mem_patterns, backend='local_qasm_simulator'):
+    """
+    Prints gate counts and depth of the memory initialization circuits built
+    by store_init and by initialize, before and after compilation
+    """
+    print('{:>4} {:<28} {:<10} {:>8} {:>6} {:>6} {:>10} {:>8} {:>9}'.format(
+        'size', 'patterns', 'method', 'gates', 'cx', 'depth', 'comp.gates', 'comp.cx', 'comp.depth'))
+
+    for memory_size, memories in sorted(mem_patterns.items(), key=lambda item: int(item[0])):
+        memory_size = int(memory_size)
+        for patterns in memories.values():
+            stored = pqm.PQM(memory_size, circuit_name='store')
+            stored.store(patterns)
+
+            initialized = pqm.PQM(memory_size, circuit_name='initialize')
+            initialized.set_memory(sparse.superposition(patterns, memory_size))
+
+            methods = [('store', stored), ('initialize', initialized)]
+            compiled = util.compile_circuits([m.circuit for _, m in methods], backend)
+
+            for (method, memory), operations in zip(methods, compiled):
+                logical = memory.report()
+                physical = pqm.gate_report(operations)
+                print('{:>4} {:<28} {:<10} {:>8} {:>6} {:>6} {:>10} {:>8} {:>9}'.format(
+                    memory_size, ','.join(packed.as_strings(patterns)), method,
+                    logical['size'], logical['gates'].get('cx', 0), logical['depth'],
+                    physical['size'], physical['gates'].get('cx', 0), physical['depth']))
+
 
-    mem_init(memory, pattern)
+# Recovery templates per (memory, memory_size, c_size, initialization method)
+_templates = {}
 
-    memory.recover(input_pattern, scale_parameter=scale_parameter)
+
+def build_template(pattern, memory_size, c_size, mem_init):
+    """
+    :return: PQM storing pattern with the symbolic recovery circuit (not cached)
+    """
+    with telemetry.timer('circuit_build', memory_size=memory_size, c_size=c_size, init=mem_init.__name__):
+        memory = pqm.PQM(memory_size, c_size=c_size, circuit_name=str(pattern))
+        mem_init(memory, pattern)
+        memory.recover_template()
 
     return memory
 
 
-def run_job(job_name, memories, backend, shots, initial_layout):
+def memory_template(pattern, memory_size, c_size, mem_init):
+    key = (str(pattern), memory_size, c_size, mem_init.__name__)
+
+    if key not in _templates:
+        _templates[key] = build_template(pattern, memory_size, c_size, mem_init)
+
+    return _templates[key]
+
+
+def set_memory(pattern, memory_size, c_size, input_pattern, mem_init, scale_parameter=1):
+    memory = memory_template(pattern, memory_size, c_size, mem_init)
+
+    with telemetry.timer('circuit_bind', memory_size=memory_size, c_size=c_size):
+        return memory.bind(input_pattern, scale_parameter=scale_parameter)
+
+
+def execute_job(job_name, circuits, backend, shots, initial_layout):
+    if scheduler.is_remote(backend):
+        return jobs.execute(job_name, circuits, backend, shots, max_credits=15, initial_layout=initial_layout)
+
+    return util.execute(circuits, backend, shots=shots, max_credits=15, initial_layout=initial_layout)
+
+
+@telemetry.timed('job')
+def run_job(job_name, memories, backend, shots, initial_layout, tolerance=None):
+    """
+    :param shots: number of shots (maximum number of shots with tolerance)
+    :param tolerance: run in rounds and stop each circuit once the confidence
+    interval half-width of its all-zero ancilla probability is below tolerance
+    """
     print('RUN:', job_name)
-    filename = job_name + '.p'
+    circuits = [memory.circuit for memory in memories]
+    key = job_key(circuits, backend, shots, initial_layout, tolerance)
 
-    try:
-        result = util.load_result(filename)
-    except Exception:
+    result = _lookup(key, job_name, memories, backend, shots, initial_layout, tolerance)
+    if result is None:
+        if tolerance is None:
+            result = execute_job(job_name, circuits, backend, shots, initial_layout)
+        else:
+            def execute_round(active, round_shots, n_round):
+                round_name = '{}_round{}'.format(job_name, n_round)
+                return util.check_result(execute_job(round_name, active, backend, round_shots, initial_layout))
+
+            result = adaptive.run_adaptive(circuits, execute_round, tolerance, max_shots=shots, backend_name=backend)
+
+        result = _store_result(key, result, memories, job_name, backend, shots)
+
+    return result
+
+
+def _lookup(key, job_name, memories, backend, shots, initial_layout, tolerance=None, migrate=True):
+    """
+    :param migrate: add results saved under the job name to the result cache
+    :return: result of the job in the result cache or saved under its name by
+    older versions, None if it has to run
+    """
+    result = result_cache.get(key)
+    if result is None and tolerance is None:
+        result = cache.load_legacy(job_name, memories, shots, initial_layout)
+        if result is not None and migrate:
+            telemetry.count('cache_legacy_hit', job=job_name)
+            result = _store_result(key, result, memories, job_name, backend, shots)
+    return result
+
+
+def _store_result(key, result, memories, job_name, backend, shots):
+    hashes = {memory.circuit.name: cache.circuit_hash(memory.circuit) for memory in memories}
+
+    # only completed results can be stored, check_result fetches the others
+    return result_cache.put(key, util.check_result(result), circuit_hashes=hashes, name=job_name, backend=backend,
+                            shots=shots)
+
+
+def run_remote_jobs(remote_jobs):
+    """
+    Runs the qiskit_job calls of a sweep on remote backends together: cached
+    results are reused and every other job is submitted before any of them
+    is polled (jobs.run_jobs). Adaptive jobs (with a tolerance) and other
+    functions are called one by one.
+
+    :param remote_jobs: list of (key, function, args), see scheduler.run
+    :return: dict mapping each key to its result
+    """
+    results = {}
+    specs = {}
+    pending = {}
+    for key, function, args in remote_jobs:
+        job = qiskit_job_arguments(args) if function is qiskit_job else None
+        if job is None or job['tolerance'] is not None:
+            results[key] = function(*args)
+            continue
+
+        memories = job_memories(job['patterns'], job['memory_size'], job['c_size'], job['input_pattern'],
+                                job['mem_init'], job['scale_parameter'])
+        name = job_name(job['backend'], job['input_pattern'], job['mem_init'], job['scale_parameter'],
+                        job['memory_layout'])
         circuits = [memory.circuit for memory in memories]
-        result = util.execute(circuits, backend, shots=shots, max_credits=15, initial_layout=initial_layout)
-        util.save_result(filename, result)
+        cache_key = job_key(circuits, job['backend'], job['num_shots'], job['memory_layout'])
+
+        result = _lookup(cache_key, name, memories, job['backend'], job['num_shots'], job['memory_layout'])
+        if result is not None:
+            results[key] = result
+            continue
+
+        print('RUN:', name)
+        specs[key] = {'name': name, 'circuits': circuits, 'backend': job['backend'], 'shots': job['num_shots'],
+                      'initial_layout': job['memory_layout']}
+        pending[key] = (cache_key, memories, name, job['backend'], job['num_shots'])
+
+    if specs:
+        with telemetry.timer('remote_jobs', jobs=len(specs)):
+            job_results = jobs.run_all(specs, max_credits=15, return_exceptions=True)
+
+        # the completed jobs are cached before reporting the failed ones, so
+        # running the sweep again only submits those
+        failed = []
+        for key, result in job_results.items():
+            if isinstance(result, Exception):
+                failed.append(specs[key]['name'])
+                continue
+            cache_key, memories, name, backend, num_shots = pending[key]
+            results[key] = _store_result(cache_key, result, memories, name, backend, num_shots)
+
+        if failed:
+            raise Exception('{} of {} remote jobs failed: {}'.format(len(failed), len(specs), ', '.join(failed)))
+
+    return results
+
+
+def job_key(circuits, backend, shots, initial_layout, tolerance=None):
+    if tolerance is None:
+        return cache.circuit_key(circuits, backend, shots, initial_layout)
+    return cache.circuit_key(circuits, backend, shots, initial_layout, tolerance=tolerance,
+                             round_shots=adaptive.ROUND_SHOTS)
+
+
+def quantum_job(input_patterns, pattern, c_size, num_shots, scale_parameter):
+    with telemetry.timer('simulate', backend=quantum.__name__, inputs=len(input_patterns)):
+        q_result = quantum.memory_retrieval_batch(input_patterns, pattern, c_size, scale_parameter)
+
+    return [{'name': str(pattern), 'counts': quantum.outcome_counts(q, c_size, num_shots)} for q in q_result]
+
+
+def statevector_job(pattern, memory_size, c_size, input_pattern, mem_init, num_shots, scale_parameter):
+    mem = set_memory(pattern, memory_size, c_size, input_pattern, mem_init, scale_parameter=scale_parameter)
+
+    with telemetry.timer('simulate', backend=statevector.__name__, memory_size=memory_size):
+        return statevector.run([mem], num_shots)[0]
+
 
-    job_result = util.check_result(result)
+def noise_job(pattern, memory_size, c_size, input_pattern, mem_init, num_shots, scale_parameter, calibration):
+    mem = set_memory(pattern, memory_size, c_size, input_pattern, mem_init, scale_parameter=scale_parameter)
 
-    return job_result
+    with telemetry.timer('simulate', backend=noise.__name__, memory_size=memory_size):
+        return noise.run([mem], num_shots, calibration)[0]
 
 
-def run_experiment(exp_config, input_patterns, mem_patterns, c_size, num_shots, scale_parameter):
+def job_memories(patterns, memory_size, c_size, input_pattern, mem_init, scale_parameter):
+    return [set_memory(v, memory_size, c_size, input_pattern, mem_init, scale_parameter=scale_parameter)
+            for v in patterns]
+
+
+def qiskit_job(backend, patterns, memory_size, c_size, input_pattern, mem_init, num_shots, scale_parameter,
+               memory_layout, tolerance=None):
+    memories = job_memories(patterns, memory_size, c_size, input_pattern, mem_init, scale_parameter)
+
+    name = job_name(backend, input_pattern, mem_init, scale_parameter, memory_layout, tolerance)
+
+    return run_job(name, memories, backend, num_shots, initial_layout=memory_layout, tolerance=tolerance)
+
+
+def qiskit_job_cached(backend, patterns, memory_size, c_size, input_pattern, mem_init, num_shots, scale_parameter,
+                      memory_layout, tolerance=None):
+    """
+    :return: whether qiskit_job with the same arguments would find its result
+    without running
+    """
+    memories = job_memories(patterns, memory_size, c_size, input_pattern, mem_init, scale_parameter)
+    name = job_name(backend, input_pattern, mem_init, scale_parameter, memory_layout, tolerance)
+
+    key = job_key([memory.circuit for memory in memories], backend, num_shots, memory_layout, tolerance)
+
+    return _lookup(key, name, memories, backend, num_shots, memory_layout, tolerance, migrate=False) is not None
+
+
+def qiskit_job_arguments(args):
+    """
+    :param args: positional arguments of a qiskit_job call
+    :return: dict argument name -> value, defaults included
+    """
+    arguments = inspect.signature(qiskit_job).bind(*args)
+    arguments.apply_defaults()
+    return dict(arguments.arguments)
+
+
+def ancilla_clbits(memory_layout, c_size):
+    """
+    :return: clbit of each ancilla in device outcomes, which report the
+    measurement of physical qubit q in clbit q (None without a layout)
+    """
+    if memory_layout is None:
+        return None
+    return [memory_layout[('ancilla', j)][1] for j in range(c_size)]
+
+
+def job_name(backend, input_pattern, mem_init, scale_parameter, memory_layout, tolerance=None):
+    return '{}_{}_{}_param{}{}{}'.format(backend, input_pattern, mem_init.__name__, str(scale_parameter),
+                                         ('_init_layout' if (memory_layout is not None) else ''),
+                                         ('_tol{}'.format(tolerance) if (tolerance is not None) else ''))
+
+
+def run_experiment(exp_config, input_patterns, mem_patterns, c_size, num_shots, scale_parameter, workers=None,
+                   tolerance=None):
+    """
+    :param exp_config: experiment configuration; the noise backend reads the
+    optional 'calibration' name (default: noise.CALIBRATION)
+    :param num_shots: number of shots (maximum number of shots with tolerance)
+    :param workers: number of processes for local jobs
+    :param tolerance: adaptive shot allocation for the qiskit backends, see run_job
+    """
+    jobs = experiment_jobs(exp_config, input_patterns, mem_patterns, c_size, num_shots, scale_parameter, tolerance)
+    job_results = scheduler.run(jobs, workers=workers, remote_runner=run_remote_jobs)
+
+    return collect_results(exp_config, input_patterns, mem_patterns, job_results)
+
+
+def experiment_jobs(exp_config, input_patterns, mem_patterns, c_size, num_shots, scale_parameter, tolerance=None):
+    """
+    :return: jobs of the experiment for scheduler.run, see run_experiment
+    """
     backends = exp_config['backends']
     mem_init = exp_config['initialization_method']
     memory_layout = exp_config['initial_layout']
     memory_size = exp_config['memory_size']
     memory = mem_patterns[str(memory_size)]
+    input_patterns = packed.as_strings(input_patterns)
 
-    results = {}
+    jobs = []
     for backend in backends:
-        results[backend] = {}
         if backend == quantum.__name__:
-            for input_pattern in input_patterns:
-                mock_results = []
-                for v in memory.values():
-                    q_result = quantum.memory_retrieval(input_pattern, v, c_size, scale_parameter)
-                    mock_result = {'name': str(v), 'counts': {'0': q_result[0]*num_shots, '1': q_result[1]*num_shots}}
-                    mock_results.append(mock_result)
+            for mem_key, v in memory.items():
+                args = (input_patterns, v, c_size, num_shots, scale_parameter)
+                jobs.append(((backend, mem_key), False, quantum_job, args))
 
-                job_result = util._to_result(mock_results)
+        elif backend == statevector.__name__:
+            for input_pattern in input_patterns:
+                for mem_key, v in memory.items():
+                    args = (v, memory_size, c_size, input_pattern, mem_init, num_shots, scale_parameter)
+                    jobs.append(((backend, input_pattern, mem_key), False, statevector_job, args))
 
-                results[backend][str(input_pattern)] = job_result
+        elif backend == noise.__name__:
+            calibration = exp_config.get('calibration', noise.CALIBRATION)
+            for input_pattern in input_patterns:
+                for mem_key, v in memory.items():
+                    args = (v, memory_size, c_size, input_pattern, mem_init, num_shots, scale_parameter, calibration)
+                    jobs.append(((backend, input_pattern, mem_key), False, noise_job, args))
 
         else:
             for input_pattern in input_patterns:
-                memories = []
-                for v in memory.values():
-                    mem = set_memory(v, memory_size, c_size, input_pattern, mem_init, scale_parameter=scale_parameter)
-                    memories.append(mem)
+                args = (backend, list(memory.values()), memory_size, c_size, input_pattern, mem_init, num_shots,
+                        scale_parameter, memory_layout, tolerance)
+                jobs.append(((backend, input_pattern), scheduler.is_remote(backend), qiskit_job, args))
+
+    return jobs
+
 
-                job_name = '{}_{}_{}_param{}{}'.format(backend, input_pattern, mem_init.__name__, str(scale_parameter),
-                                                       ('_init_layout' if (memory_layout is not None) else ''))
+def collect_results(exp_config, input_patterns, mem_patterns, job_results):
+    """
+    :param job_results: dict job key -> value returned by the job
+    :return: dict backend -> input pattern -> Result, see run_experiment
+    """
+    backends = exp_config['backends']
+    memory = mem_patterns[str(exp_config['memory_size'])]
+    input_patterns = packed.as_strings(input_patterns)
+
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for i, input_pattern in enumerate(input_patterns):
+            if backend == quantum.__name__:
+                mock_results = [job_results[(backend, mem_key)][i] for mem_key in memory]
+                job_result = util._to_result(mock_results)
+            elif backend in (statevector.__name__, noise.__name__):
+                sv_results = [job_results[(backend, input_pattern, mem_key)] for mem_key in memory]
+                job_result = util._to_result(sv_results, backend_name=backend)
+            else:
+                job_result = job_results[(backend, input_pattern)]
 
-                job_result = run_job(job_name, memories, backend, num_shots, initial_layout=memory_layout)
-                results[backend][str(input_pattern)] = job_result
+            results[backend][str(input_pattern)] = job_result
 
     return results
 
 
-def plot_exp(name, exp_results, input_pattern, x_labels, orientation, max_shots):
-    base_width = 0.3
-    start_offset = -1
-    offset = start_offset
+def scale_sweep(exp_config, input_patterns, mem_patterns, c_size, num_shots, scale_parameters, workers=None,
+                tolerance=None):
+    """
+    Evaluates every scale parameter: the analytic backend in one broadcast
+    pass per memory, the simulators with one template per memory and the
+    qiskit backends with one (cached) job per scale parameter and input
 
-    for backend in exp_results.keys():
-        measure = '0'
+    :param scale_parameters: distance modifiers
+    :return: dict backend -> tensor (scale parameter x input x memory) of the
+    probability of measuring every ancilla in 0, memories in mem_patterns order
+    """
+    backends = exp_config['backends']
+    mem_init = exp_config['initialization_method']
+    memory_layout = exp_config['initial_layout']
+    memory_size = exp_config['memory_size']
+    memory = mem_patterns[str(memory_size)]
+    input_patterns = packed.as_strings(input_patterns)
+    scale_parameters = list(scale_parameters)
+
+    jobs = []
+    for backend in backends:
         if backend == quantum.__name__:
-            label = "Expected output probability"
-        elif backend == 'ibmqx4':
-            label = 'Tenerife backend'
-            measure = '00000'
-        elif backend == 'local_qasm_simulator':
-            label = 'QISKit simulator'
+            for mem_key, v in memory.items():
+                args = (input_patterns, v, c_size, scale_parameters)
+                jobs.append(((backend, mem_key), False, quantum_sweep_job, args))
+
+        elif backend in (statevector.__name__, noise.__name__):
+            calibration = exp_config.get('calibration', noise.CALIBRATION)
+            for mem_key, v in memory.items():
+                args = (backend, v, memory_size, c_size, input_patterns, mem_init, scale_parameters, calibration)
+                jobs.append(((backend, mem_key), False, simulated_sweep_job, args))
+
         else:
-            label = backend
+            for s, scale_parameter in enumerate(scale_parameters):
+                for input_pattern in input_patterns:
+                    args = (backend, list(memory.values()), memory_size, c_size, input_pattern, mem_init, num_shots,
+                            scale_parameter, memory_layout, tolerance)
+                    jobs.append(((backend, s, input_pattern), scheduler.is_remote(backend), qiskit_job, args))
+
+    job_results = scheduler.run(jobs, workers=workers, remote_runner=run_remote_jobs)
 
-        results = exp_results[backend]
-        print('*******')
-        print('Experiment:', name)
-        print('Backend:', backend)
+    names = [str(v) for v in memory.values()]
+    clbits = ancilla_clbits(memory_layout, c_size)
+    tensors = {}
+    for backend in backends:
+        if backend in (quantum.__name__, statevector.__name__, noise.__name__):
+            tensor = np.stack([job_results[(backend, mem_key)] for mem_key in memory], axis=-1)
+        else:
+            tensor = np.empty((len(scale_parameters), len(input_patterns), len(names)))
+            for s in range(len(scale_parameters)):
+                for i, input_pattern in enumerate(input_patterns):
+                    result = job_results[(backend, s, input_pattern)]
+                    tensor[s, i] = metrics.distributions(result, names, width=c_size, clbits=clbits)[:, 0]
+        tensors[backend] = tensor
+
+    return tensors
+
+
+def quantum_sweep_job(input_patterns, pattern, c_size, scale_parameters):
+    with telemetry.timer('simulate', backend=quantum.__name__, inputs=len(input_patterns),
+                         scales=len(scale_parameters)):
+        engine = quantum.RetrievalEngine(pattern, c_size, 1)
+        return engine.sweep(input_patterns, scale_parameters)[..., 0]
+
+
+def simulated_sweep_job(backend, pattern, memory_size, c_size, input_patterns, mem_init, scale_parameters,
+                        calibration):
+    template = memory_template(pattern, memory_size, c_size, mem_init)
+
+    simulator = None
+    if backend == noise.__name__:
+        model = noise.NoiseModel.load(calibration)
+        simulator = lambda: noise.DensityMatrix([template.mqr, template.cqr], model)
+
+    with telemetry.timer('simulate', backend=backend, inputs=len(input_patterns), scales=len(scale_parameters)):
+        probs = statevector.template_probabilities(template, input_patterns, scale_parameters, simulator)
+    zero = '0' * c_size
+
+    return np.array([[p.get(zero, 0) for p in row] for row in probs])
+
+
+def backend_label(backend):
+    """
+    :return: legend label of backend and the outcome plotted for it (None
+    for the all-zero outcome of the result)
+    """
+    if backend == quantum.__name__:
+        return 'Expected output probability', None
+    elif backend == 'ibmqx4':
+        return 'Tenerife backend', '00000'
+    elif backend == 'local_qasm_simulator':
+        return 'QISKit simulator', None
+    elif backend == statevector.__name__:
+        return 'Statevector simulator', None
+    elif backend == noise.__name__:
+        return 'Noise model simulator', None
+    return backend, None
+
+
+def plot_data(name, exp_results, input_pattern, x_labels, orientation, max_shots):
+    """
+    :return: figure dict with the counts plot_exp draws for input_pattern,
+    see plotting.draw
+    """
+    series = []
+    for backend in exp_results.keys():
+        label, measure = backend_label(backend)
 
-        counts = []
-        for mem_pattern in results[input_pattern].get_names():
-            print('-------')
-            print('Input: {} | Memory: {}'.format(input_pattern, mem_pattern))
-            data = results[input_pattern].get_data(mem_pattern)
-            print(data)
-            counts.append(data['counts'])
+        result = exp_results[backend][input_pattern]
+        counts = [dict(result.get_data(mem_pattern)['counts']) for mem_pattern in result.get_names()]
 
-        position = base_width * offset
-        util.bar_plot(counts, label, x_labels, measure, base_width, position, max_shots, orientation)
-        offset += 1
+        if measure is None:
+            measure = '0' * len(next(iter(counts[0])))
 
-    if orientation == 'H':
-        plt.gca().invert_yaxis()
+        series.append({'label': label, 'counts': counts, 'measure': measure})
 
-    plt.title('Input Pattern: {}'.format(input_pattern))
-    plt.tight_layout()
-    plt.legend()
+    return {'name': '{}_{}_{}'.format(name, input_pattern, orientation),
+            'title': 'Input Pattern: {}'.format(input_pattern),
+            'orientation': orientation,
+            'x_labels': list(x_labels),
+            'max_shots': max_shots,
+            'series': series}
 
-    #add grid
-    plt.grid()
 
-    #save and close plot
-    util.save_plot('{}_{}_{}.pdf'.format(name, input_pattern, orientation))
-    plt.close(plt.gcf())
+def plot_exp(name, exp_results, input_pattern, x_labels, orientation, max_shots, fmt='pdf'):
+    return plotting.render([plot_data(name, exp_results, input_pattern, x_labels, orientation, max_shots)], fmt,
+                           workers=1)
 
 
 if __name__ == '__main__':
-    backends = ['ibmqx4', 'local_qasm_simulator', 'quantum']
-
-    experiments = {}
-    experiments['mi_il_1q'] = {
-        'backends': backends,
-        'memory_size': 1,
-        'initialization_method': manual_init,
-        'initial_layout': {('memory', 0): ('q', 0), ('ancilla', 0): ('q', 2)}
-
-    }
-
-    experiments['mi_il_2q'] = {
-        'backends': backends,
-        'memory_size': 2,
-        'initialization_method': manual_init,
-        'initial_layout': {('memory', 0): ('q', 0), ('memory', 1): ('q', 1), ('ancilla', 0): ('q', 2)}
-
-    }
-
-    experiments['mi_il_3q'] = {
-        'backends': backends,
-        'memory_size': 3,
-        'initialization_method': manual_init,
-        'initial_layout': {('memory', 0): ('q', 0), ('memory', 1): ('q', 1), ('memory', 2): ('q', 4),
-                           ('ancilla', 0): ('q', 2)}
-
-    }
-
-    experiments['mi_il_4q'] = {
-        'backends': backends,
-        'memory_size': 4,
-        'initialization_method': manual_init,
-        'initial_layout': {('memory', 0): ('q', 0), ('memory', 1): ('q', 1), ('memory', 2): ('q', 4),
-                           ('memory', 3): ('q', 3), ('ancilla', 0): ('q', 2)}
-    }
-
-    classical_memories = {
-        '1': {
-            '0': ['0'],
-            '1': ['1'],
-            '2': ['0', '1']
-        },
-
-        '2': {
-            '0': ['00'],
-            '1': ['11'],
-            '2': ['00', '01']
-        },
-
-        '3': {
-            '0': ['000'],
-            '1': ['000', '010'],
-            '2': ['000', '100'],
-            '3': ['000', '001'],
-            '4': ['110', '111'],
-            '5': ['111']
-        },
-
-        '4': {
-            '0': ['0000'],
-            '1': ['0000', '0100'],
-            '2': ['1000'],
-            '3': ['0100', '1100'],
-            '4': ['1010'],
-            '5': ['0110', '1110'],
-            '6': ['1110'],
-            '7': ['0111', '1111'],
-            '8': ['1111']
-        }
-
-    }
-
-    tex_labels = {
-        '1': [r'$\left|{0}\right\rangle$', r'$\left|{1}\right\rangle$',
-              r'$\frac{1}{\sqrt{2}}(\left|{0}\right\rangle + \left|{1}\right\rangle)$'],
-
-        '2': [r'$\left|{00}\right\rangle$', r'$\left|{11}\right\rangle$', r'$\frac{1}{\sqrt{2}}(\left|{00}\right\rangle + \left|{01}\right\rangle)$'],
-
-        '3': [r'$\left|{000}\right\rangle$', r'$\frac{1}{\sqrt{2}}(\left|{000}\right\rangle + \left|{010}\right\rangle)$', r'$\frac{1}{\sqrt{2}}(\left|{000}\right\rangle + \left|{100}\right\rangle)$',
-              r'$\frac{1}{\sqrt{2}}(\left|{000}\right\rangle + \left|{001}\right\rangle)$', r'$\frac{1}{\sqrt{2}}(\left|{110}\right\rangle + \left|{111}\right\rangle)$', r'$\left|{111}\right\rangle$'],
-
-        '4': [r'$\left|{0000}\right\rangle$', r'$\frac{1}{\sqrt{2}}(\left|{0000}\right\rangle + \left|{0100}\right\rangle)$', r'$\left|{1000}\right\rangle$',
-              r'$\frac{1}{\sqrt{2}}(\left|{0100}\right\rangle + \left|{1100}\right\rangle)$', r'$\left|{1010}\right\rangle$', r'$\frac{1}{\sqrt{2}}(\left|{0110}\right\rangle + \left|{1110}\right\rangle)$',
-              r'$\left|{1110}\right\rangle$', r'$\frac{1}{\sqrt{2}}(\left|{0111}\right\rangle + \left|{1111}\right\rangle)$', r'$\left|{1111}\right\rangle$']
-    }
-
-    #RUN EXPERIMENT
-
-    scale_param = 1
-    c_size = 1
-    num_shots = 8192
-
-    #Select experiment configuration
-    exp_name = 'mi_il_1q'
-    #exp_name = 'mi_il_2q'
-    #exp_name = 'mi_il_3q'
-    #exp_name = 'mi_il_4q'
-
-    exp_config = experiments[exp_name]
-
-    inputs = [0, 1]
-    #inputs = [0, 1, 2, 3]
-    #inputs = [0, 1, 2, 3, 4, 5, 6, 7]
-    #inputs = [8, 9, 10, 11, 12, 13, 14, 15]
-    #inputs = None
-
-    if inputs is None:
-        input_patterns = [decimal_input(i, exp_config['memory_size']) for i in range(2 ** exp_config['memory_size'])]
-    else:
-        input_patterns = [decimal_input(i, exp_config['memory_size']) for i in inputs]
-
-    exp_results = run_experiment(exp_config, input_patterns, classical_memories, c_size, num_shots, scale_param)
-
-    for input_p in input_patterns:
-        plot_exp(exp_name, exp_results, input_p, tex_labels[str(exp_config['memory_size'])], 'H', num_shots)
-
-    mean_error = util.MSE(exp_results, input_patterns)
-    print('*******')
-    print('MSE:', mean_error)
+    # experiments are defined in configs/, see sweep.py
+    import sweep
+    sweep.main()
@@ -0,0 +1,216 @@
+import concurrent.futures
+import itertools
+import numpy as np
+import packed
+import quantum
+import statevector
+
+# Pattern words compared with each query at once: chunks hold whole memories
+# up to this size and larger memories are scored in blocks of patterns, so a
+# batch of QUERY_BATCH queries compares at most 2^22 words (32 MB of uint64)
+CHUNK_SIZE = 2 ** 14
+
+# Queries scored at once
+QUERY_BATCH = 256
+
+
+class PQMIndex(object):
+
+    """
+    associative lookup over many probabilistic quantum memories: memories are
+    ranked by the probability of measuring every ancilla in 0 for a query
+
+    :param memories: list of memories, each a list of patterns (or
+    PackedPatterns), repeated patterns are stored once
+    :param names: memory names (default: memory positions)
+    :param c_size: number of ancilla qubits
+    :param nvalue: distance modifier
+    :param backend: 'quantum' (analytic) or 'statevector'
+    :param chunk_size: number of pattern words compared with each query at once
+    """
+
+    def __init__(self, memories, names=None, c_size=1, nvalue=1, backend=quantum.__name__, chunk_size=CHUNK_SIZE):
+        self.memories = [packed.unique(memory) for memory in memories]
+        if not self.memories:
+            raise ValueError('The index needs at least one memory')
+        empty = [i for i, memory in enumerate(self.memories) if len(memory) == 0]
+        if empty:
+            raise ValueError('Memories must hold at least one pattern, memories {} are empty'.format(empty))
+
+        self.names = list(range(len(self.memories))) if names is None else list(names)
+        self.c_size = c_size
+        self.nvalue = nvalue
+        self.backend = backend
+        self.chunk_size = chunk_size
+
+        widths = set(memory.n_bits for memory in self.memories)
+        if len(widths) != 1:
+            raise ValueError('All memories must have the same pattern size, got {}'.format(sorted(widths)))
+        self.n_bits = widths.pop()
+
+        words = self.memories[0].words.shape[1]
+        self.block_size = max(1, chunk_size // words)
+
+        self.chunks = []
+        start = 0
+        while start < len(self.memories):
+            stop, total = start + 1, len(self.memories[start])
+            while stop < len(self.memories) and total + len(self.memories[stop]) <= self.block_size:
+                total += len(self.memories[stop])
+                stop += 1
+
+            chunk = self.memories[start:stop]
+            patterns = packed.PackedPatterns(np.concatenate([memory.words for memory in chunk]), self.n_bits)
+            sizes = np.array([len(memory) for memory in chunk])
+            offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+            self.chunks.append((start, patterns, offsets, sizes))
+            start = stop
+
+    def score_chunk(self, queries, chunk):
+        """
+        :param queries: PackedPatterns
+        :return: matrix of scores (queries x memories in chunk)
+        """
+        start, patterns, offsets, sizes = chunk
+
+        if self.backend == statevector.__name__:
+            return self._simulate(queries, start, len(sizes))
+
+        table = quantum.retrieval_table(self.n_bits, self.c_size, self.nvalue)[:, 0]
+        scores = np.zeros((len(queries), len(sizes)))
+        for owners, terms in self._blocks(queries, chunk, lambda distances: table[distances], np.add.reduceat):
+            scores[:, owners] += terms
+
+        return scores / sizes
+
+    def _simulate(self, queries, start, size):
+        import pqm_experiment
+
+        scores = np.empty((len(queries), size))
+        zero = '0' * self.c_size
+        for j in range(size):
+            # built per memory rather than through the template cache of
+            # pqm_experiment, which would keep every memory of the index
+            template = pqm_experiment.build_template(self.memories[start + j].to_strings(), self.n_bits,
+                                                     self.c_size, pqm_experiment.store_init)
+            for i, query in enumerate(queries):
+                mem = template.bind(query, scale_parameter=self.nvalue)
+                scores[i, j] = statevector.probabilities(mem).get(zero, 0)
+
+        return scores
+
+    def classical_score_chunk(self, queries, chunk):
+        """
+        :return: minus the Hamming distance to the nearest pattern of each memory
+        """
+        scores = np.full((len(queries), len(chunk[3])), np.iinfo(np.int64).max)
+        for owners, distances in self._blocks(queries, chunk, lambda distances: distances, np.minimum.reduceat):
+            scores[:, owners] = np.minimum(scores[:, owners], distances)
+
+        return -scores
+
+    def _blocks(self, queries, chunk, terms, reduceat):
+        """
+        Compares the queries with block_size patterns of chunk at a time
+
+        :param terms: function of the Hamming distances (queries x patterns)
+        :param reduceat: reduction of the terms of each memory
+        :return: generator of (memories in the block, their reduced terms)
+        """
+        _, patterns, offsets, _ = chunk
+        for begin in range(0, len(patterns), self.block_size):
+            end = min(begin + self.block_size, len(patterns))
+            # memory of the first pattern of the block and memories starting inside it
+            first = np.searchsorted(offsets, begin, side='right') - 1
+            inside = np.flatnonzero((offsets > begin) & (offsets < end))
+            owners = np.concatenate([[first], inside])
+            starts = np.concatenate([[begin], offsets[inside]]) - begin
+
+            yield owners, reduceat(terms(queries.distances(patterns[begin:end])), starts, axis=1)
+
+    def topk_batch(self, queries, k, classical=False):
+        """
+        :param queries: batch of queries
+        :return: list with the k best (name, score) pairs of each query
+        """
+        queries = packed.pack(queries)
+        score = self.classical_score_chunk if classical else self.score_chunk
+
+        best_scores = np.empty((len(queries), 0))
+        best_index = np.empty((len(queries), 0), dtype=np.int64)
+        for chunk in self.chunks:
+            scores = score(queries, chunk)
+            index = np.broadcast_to(chunk[0] + np.arange(scores.shape[1]), scores.shape)
+            best_scores, best_index = _merge_topk(best_scores, best_index, scores, index, k)
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_index = np.take_along_axis(best_index, order, axis=1)
+
+        return [[(self.names[i], s) for i, s in zip(row_index, row_scores)]
+                for row_index, row_scores in zip(best_index.tolist(), best_scores.tolist())]
+
+    def topk(self, queries, k, classical=False, workers=1, batch_size=QUERY_BATCH):
+        """
+        Scores a stream of queries against every memory
+
+        :param queries: iterable of query patterns
+        :param classical: rank by Hamming distance to the nearest stored
+        pattern instead of retrieval probability (baseline)
+        :param workers: number of processes
+        :return: generator with the k best (name, score) pairs of each query,
+        in query order
+        """
+        batches = _batches(queries, batch_size)
+
+        if workers <= 1:
+            for batch in batches:
+                for result in self.topk_batch(batch, k, classical):
+                    yield result
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self,)) as pool:
+            pending = []
+            for batch in batches:
+                pending.append(pool.submit(_worker_topk, batch, k, classical))
+                # keep at most two batches per worker in flight
+                if len(pending) >= 2 * workers:
+                    for result in pending.pop(0).result():
+                        yield result
+
+            for future in pending:
+                for result in future.result():
+                    yield result
+
+
+def _batches(queries, batch_size):
+    queries = iter(packed.as_strings(queries) if isinstance(queries, packed.PackedPatterns) else queries)
+    while True:
+        batch = [packed.as_string(q) for q in itertools.islice(queries, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+def _merge_topk(best_scores, best_index, scores, index, k):
+    scores = np.concatenate([best_scores, scores], axis=1)
+    index = np.concatenate([best_index, index], axis=1)
+
+    if scores.shape[1] > k:
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        index = np.take_along_axis(index, keep, axis=1)
+
+    return scores, index
+
+
+_index = None
+
+
+def _init_worker(index):
+    global _index
+    _index = index
+
+
+def _worker_topk(batch, k, classical):
+    return _index.topk_batch(batch, k, classical)
@@ -0,0 +1,167 @@
+import argparse
+import csv
+import os
+import sys
+import time
+import pqm
+import pqm_experiment
+import util
+
+BENCH_FOLDER = 'bench/'
+
+COLUMNS = ['memory_size', 'init_method', 'patterns', 'layout', 'gates', 'depth', 'two_qubit',
+           'compiled_gates', 'compiled_depth', 'compiled_two_qubit', 'compile_time']
+
+
+def profile(memories, backend='local_qasm_simulator', initial_layouts=(None,)):
+    """
+    :param memories: PQM instances
+    :param initial_layouts: layouts to compile the circuits with
+    :return: one row per (layout, memory) with logical and compiled gate
+    counts, depth, two-qubit gates and the compile time of the batch
+    """
+    rows = []
+    for layout in initial_layouts:
+        start = time.perf_counter()
+        compiled = util.compile_circuits([memory.circuit for memory in memories], backend, initial_layout=layout)
+        compile_time = time.perf_counter() - start
+
+        for memory, operations in zip(memories, compiled):
+            logical = memory.report()
+            physical = pqm.gate_report(operations)
+            rows.append({'memory_size': memory.memory_size,
+                         'patterns': memory.circuit_name,
+                         'layout': 'default' if layout is None else str(sorted(layout.items())),
+                         'gates': logical['size'],
+                         'depth': logical['depth'],
+                         'two_qubit': logical['two_qubit'],
+                         'compiled_gates': physical['size'],
+                         'compiled_depth': physical['depth'],
+                         'compiled_two_qubit': physical['two_qubit'],
+                         'compile_time': compile_time})
+
+    return rows
+
+
+def profile_sweep(exp_config, input_patterns, mem_patterns, c_size, scale_parameter, backend='local_qasm_simulator'):
+    """
+    Profiles the circuits that run_experiment would run for exp_config
+    """
+    mem_init = exp_config['initialization_method']
+    memory_size = exp_config['memory_size']
+    layouts = [exp_config['initial_layout']]
+
+    rows = []
+    for input_pattern in input_patterns:
+        memories = [pqm_experiment.set_memory(v, memory_size, c_size, input_pattern, mem_init,
+                                              scale_parameter=scale_parameter)
+                    for v in mem_patterns[str(memory_size)].values()]
+        for row in profile(memories, backend, layouts):
+            row['init_method'] = mem_init.__name__
+            row['input'] = input_pattern
+            rows.append(row)
+
+    return rows
+
+
+def benchmark_memories(memory_size):
+    zeros = '0' * memory_size
+    last = '0' * (memory_size - 1) + '1'
+    return [[zeros], [zeros, last], ['1' * memory_size]]
+
+
+def benchmark(max_memory_size, backend='local_qasm_simulator', initial_layouts=(None,),
+              init_methods=(pqm_experiment.manual_init, pqm_experiment.qiskit_init, pqm_experiment.store_init)):
+    """
+    :return: rows of the circuit size table for memory_size 1 to
+    max_memory_size and every initialization method
+    """
+    rows = []
+    for memory_size in range(1, max_memory_size + 1):
+        for mem_init in init_methods:
+            try:
+                memories = [pqm_experiment.set_memory(patterns, memory_size, 1, '0' * memory_size, mem_init)
+                            for patterns in benchmark_memories(memory_size)]
+            except Exception as e:
+                print('Skipping {} for memory_size {}: {}'.format(mem_init.__name__, memory_size, e))
+                continue
+
+            for row in profile(memories, backend, initial_layouts):
+                row['init_method'] = mem_init.__name__
+                rows.append(row)
+
+    return rows
+
+
+def save_table(filename, rows):
+    filename = BENCH_FOLDER + filename
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    with open(filename, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_table(filename):
+    with open(BENCH_FOLDER + filename, newline='') as file:
+        return list(csv.DictReader(file))
+
+
+def regressions(rows, baseline, columns=('compiled_gates', 'compiled_depth', 'compiled_two_qubit')):
+    """
+    :return: (row, column, baseline value, new value) for every circuit that
+    got larger than in the baseline table
+    """
+    key = lambda row: (str(row['memory_size']), row['init_method'], row['patterns'], row['layout'])
+    previous = {key(row): row for row in baseline}
+
+    found = []
+    for row in rows:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        for column in columns:
+            if int(row[column]) > int(old[column]):
+                found.append((row, column, int(old[column]), int(row[column])))
+
+    return found
+
+
+def print_table(rows):
+    print(' '.join('{:>18}'.format(c) for c in COLUMNS))
+    for row in rows:
+        values = [('{:.4f}' if c == 'compile_time' else '{}').format(row[c]) for c in COLUMNS]
+        print(' '.join('{:>18}'.format(v[:18]) for v in values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tabulates the circuit sizes and compares them to the last table')
+    parser.add_argument('max_size', nargs='?', type=int, default=4, help='largest memory size')
+    parser.add_argument('--force', action='store_true', help='save the table even if there are regressions')
+    args = parser.parse_args(argv)
+
+    filename = 'circuits_{}q.csv'.format(args.max_size)
+
+    try:
+        baseline = load_table(filename)
+    except FileNotFoundError:
+        baseline = []
+
+    table = benchmark(args.max_size)
+    print_table(table)
+
+    found = regressions(table, baseline)
+    for row, column, old, new in found:
+        print('REGRESSION: {} {} {}: {} -> {}'.format(row['init_method'], row['patterns'], column, old, new))
+
+    if found and not args.force:
+        print('{} not updated because of the regressions, use --force to accept them'.format(BENCH_FOLDER + filename))
+    else:
+        save_table(filename, table)
+
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,37 @@
+import functools
 import numpy as np
 from scipy.special import binom
+import packed
+import sparse
 
+# RetrievalEngine groups the terms of the equation by Hamming distance, so it
+# matches memory_retrieval up to rounding, within these tolerances
+RTOL = 1e-12
+ATOL = 1e-15
 
-# Equation
+# Number of words compared at once by RetrievalEngine (inputs x patterns x
+# words of the XOR, 32 MB of uint64)
+CHUNK_SIZE = 2 ** 22
+
+
+# Equation. A memory stores each distinct pattern once (as qiskit_init and
+# store_init prepare it), repeated patterns are counted once
 def memory_retrieval(input_pattern, patterns, control_bits_n, nvalue):
-    i = input_pattern
-    pi = np.pi
+    i = packed.as_string(input_pattern)
     b = control_bits_n
+    n = len(i)
+    if not isinstance(patterns, sparse.SparseAmplitudes):
+        patterns = packed.unique(patterns)
     p = len(patterns)
-    n = len(input_pattern)
+
+    table = retrieval_table(n, b, nvalue)
+    if isinstance(patterns, sparse.SparseAmplitudes):
+        # weighted superposition: |amplitude|^2 replaces 1/p
+        weights = patterns.probabilities()
+        distances = patterns.patterns.distance(i)
+        return [binom(b, l) * float(weights @ table[distances, l]) for l in range(b+1)]
+    else:
+        distances = patterns.distance(i).tolist()
     
     #Probabilities array
     p_array = []
@@ -17,23 +40,183 @@ def memory_retrieval(input_pattern, patterns, control_bits_n, nvalue):
     for l in range(b+1):
         amp = binom(b, l) * (1/p)
         sum_value = 0
-        for k in range(p):
-            dh = hamming_distance(i, patterns[k])
-            v = (pi/(2*n * nvalue))*dh
-            
-            sum_value += (np.cos(v)**(2*b-2*l)) * (np.sin(v)**(2*l))
+        for dh in distances:
+            sum_value += table[dh, l]
             
         p_array.append(amp * sum_value)
     
     return p_array
 
 
+# Spreads the probability of l control bits in state 1 over the 2^b outcomes
+def outcome_distribution(p_table, control_bits_n):
+    """
+    :param p_table: matrix returned by memory_retrieval_batch (... x b+1)
+    :param control_bits_n: number of control bits b
+    :return: matrix (... x 2^b), column j is the probability of measuring
+    the control register in state j
+    """
+    b = control_bits_n
+    ones = np.array([bin(j).count('1') for j in range(2 ** b)])
+    expand = np.zeros((b+1, 2 ** b))
+    expand[ones, np.arange(2 ** b)] = 1 / binom(b, ones)
+
+    return np.asarray(p_table) @ expand
+
+
+def outcome_counts(p_row, control_bits_n, shots=1):
+    """
+    :return: dict of counts over the control register outcomes (qiskit bitstrings)
+    """
+    b = control_bits_n
+    probs = outcome_distribution(p_row, b)
+    return {format(j, '0{}b'.format(b)): probs[j] * shots for j in range(2 ** b)}
+
+
+# Terms of the equation for every possible Hamming distance
+@functools.lru_cache(maxsize=None)
+def retrieval_table(n, control_bits_n, nvalue):
+    """
+    :param n: number of bits in each pattern
+    :param control_bits_n: number of control bits b
+    :param nvalue: distance modifier
+    :return: read-only (n+1) x (b+1) matrix, entry [dh, l] is
+    cos(v)^(2b-2l) * sin(v)^(2l) with v = pi*dh/(2*n*nvalue)
+    """
+    pi = np.pi
+    b = control_bits_n
+
+    # scalar evaluation keeps every entry identical to the per-pattern loop
+    table = np.empty((n+1, b+1))
+    for dh in range(n+1):
+        v = (pi/(2*n * nvalue))*dh
+        for l in range(b+1):
+            table[dh, l] = (np.cos(v)**(2*b-2*l)) * (np.sin(v)**(2*l))
+
+    table.flags.writeable = False
+    return table
+
+
+# Number (or total weight) of stored patterns at each Hamming distance, for every input
+def distance_histogram(distances, n, weights=None):
+    distances = np.atleast_2d(distances)
+    m = distances.shape[0]
+    offsets = distances + (n+1) * np.arange(m)[:, None]
+    if weights is not None:
+        weights = np.broadcast_to(weights, distances.shape).ravel()
+    return np.bincount(offsets.ravel(), weights=weights, minlength=m * (n+1)).reshape(m, n+1)
+
+
+class RetrievalEngine(object):
+
+    """
+    retrieval probabilities of a fixed memory: the Hamming distances of each
+    input are reduced to a histogram and multiplied by the cached
+    retrieval_table. The terms are summed in another order than
+    memory_retrieval, the results agree within RTOL and ATOL but not bit for bit
+
+    :param patterns: patterns stored in memory (repeated ones count once), or
+    sparse.SparseAmplitudes
+    :param control_bits_n: number of control bits b
+    :param nvalue: distance modifier
+    :param chunk_size: number of words compared at once, inputs and patterns
+    are split so the distances of a chunk stay below it
+    """
+
+    def __init__(self, patterns, control_bits_n, nvalue, chunk_size=CHUNK_SIZE):
+        self.weights = None
+        if isinstance(patterns, sparse.SparseAmplitudes):
+            self.weights = patterns.probabilities()
+            patterns = patterns.patterns
+
+        self.patterns = packed.unique(patterns)
+        self.b = control_bits_n
+        self.nvalue = nvalue
+        self.chunk_size = chunk_size
+
+        self.table = self._tables([nvalue])[0]
+
+    def _tables(self, nvalues):
+        n = self.patterns.n_bits
+        l = np.arange(self.b+1)
+        if self.weights is None:
+            factor = binom(self.b, l) * (1/len(self.patterns))
+        else:
+            factor = binom(self.b, l)
+        return np.stack([retrieval_table(n, self.b, nvalue) * factor for nvalue in nvalues])
+
+    def histograms(self, inputs):
+        """
+        :param inputs: PackedPatterns
+        :return: generator of (start, Hamming distance histograms of the
+        inputs from start), summed over chunks of the stored patterns
+        """
+        n = self.patterns.n_bits
+        words = max(1, self.patterns.words.shape[1])
+        pattern_rows = max(1, min(len(self.patterns), self.chunk_size // words))
+        input_rows = max(1, self.chunk_size // (pattern_rows * words))
+
+        for start in range(0, len(inputs), input_rows):
+            chunk = inputs[start:start + input_rows]
+            hist = np.zeros((len(chunk), n+1))
+            for p in range(0, len(self.patterns), pattern_rows):
+                weights = None if self.weights is None else self.weights[p:p + pattern_rows]
+                hist += distance_histogram(chunk.distances(self.patterns[p:p + pattern_rows]), n, weights)
+            yield start, hist
+
+    def __call__(self, input_patterns):
+        """
+        :return: matrix with one row per input pattern and one column per
+        number of control bits in state 1 (0 to b)
+        """
+        inputs = packed.pack(input_patterns)
+
+        result = np.empty((len(inputs), self.b+1))
+        for start, hist in self.histograms(inputs):
+            result[start:start + len(hist)] = hist @ self.table
+
+        return result
+
+    def sweep(self, input_patterns, nvalues):
+        """
+        Evaluates every distance modifier from the same Hamming distance
+        histograms, broadcasting the retrieval tables over the nvalue axis
+
+        :param nvalues: distance modifiers
+        :return: tensor (nvalues x input patterns x b+1), see __call__
+        """
+        inputs = packed.pack(input_patterns)
+        tables = self._tables([float(nvalue) for nvalue in nvalues])
+
+        result = np.empty((len(tables), len(inputs), self.b+1))
+        for start, hist in self.histograms(inputs):
+            result[:, start:start + len(hist)] = hist @ tables
+
+        return result
+
+
+# Equation for a batch of input patterns
+def memory_retrieval_batch(input_patterns, patterns, control_bits_n, nvalue):
+    """
+    :param input_patterns: input patterns (bit strings, 0/1 matrix or PackedPatterns)
+    :param patterns: patterns stored in memory (bit strings, 0/1 matrix,
+    PackedPatterns or sparse.SparseAmplitudes)
+    :param control_bits_n: number of control bits b
+    :param nvalue: distance modifier
+    :return: matrix with one row per input pattern and one column per
+    number of control bits in state 1 (0 to b), memory_retrieval of each
+    input within RTOL and ATOL
+    """
+    return RetrievalEngine(patterns, control_bits_n, nvalue)(input_patterns)
+
+
 # Equation 1
 def memory_retrieval_1cbit(input_pattern, patterns):
-    i = input_pattern
+    i = packed.as_string(input_pattern)
+    patterns = packed.unique(patterns).to_strings()
     pi = np.pi
     p = len(patterns)
-    n = len(input_pattern)
+    n = len(i)
     
     amp = 1/p
     
@@ -49,6 +232,9 @@ def memory_retrieval_1cbit(input_pattern, patterns):
 
 # Computes the Hamming distance
 def hamming_distance(u, v):
+    if isinstance(u, packed.PackedPatterns) or isinstance(v, packed.PackedPatterns):
+        return int(packed.pack(u).distance(v)[0])
+
     diff_n = 0
 
     for value1, value2 in zip(u, v):
@@ -56,3 +242,8 @@ def hamming_distance(u, v):
             diff_n += 1
 
     return diff_n
+
+
+# Computes the Hamming distance between every pattern of u and every pattern of v
+def hamming_distances(u, v):
+    return packed.pack(u).distances(v)
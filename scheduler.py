@@ -0,0 +1,66 @@
+import concurrent.futures
+import multiprocessing
+import os
+import quantum
+import statevector
+import noise
+
+# Concurrent submissions to remote backends
+REMOTE_WORKERS = 4
+
+# Start method of the local worker processes. A forked worker inherits the
+# locks held by the remote threads at that moment (cache index, telemetry
+# file, job ledger) and can deadlock on them
+START_METHOD = 'spawn'
+
+LOCAL_BACKENDS = [quantum.__name__, statevector.__name__, noise.__name__]
+
+
+def is_remote(backend):
+    return not (backend in LOCAL_BACKENDS or backend.startswith('local_'))
+
+
+def run(jobs, workers=None, remote_workers=REMOTE_WORKERS, remote_runner=None):
+    """
+    Runs independent jobs: local jobs on a process pool and remote jobs on
+    a bounded thread pool (remote jobs spend their time waiting on the
+    backend, not on the CPU).
+
+    :param jobs: list of (key, remote, function, args) tuples
+    :param workers: number of processes for local jobs (default: number of CPUs)
+    :param remote_workers: number of threads for remote jobs
+    :param remote_runner: function called (in a thread, while the local jobs
+    run) with the list of (key, function, args) of every remote job and
+    returning a dict key -> result, instead of calling each function
+    :return: dict mapping each job key to the value returned by its function
+    """
+    workers = os.cpu_count() if workers is None else workers
+    results = {}
+
+    with concurrent.futures.ThreadPoolExecutor(remote_workers) as threads:
+        futures = {}
+        remote_jobs = [(key, function, args) for key, remote, function, args in jobs if remote]
+        if remote_runner is not None:
+            batch = threads.submit(remote_runner, remote_jobs) if remote_jobs else None
+        else:
+            batch = None
+            for key, function, args in remote_jobs:
+                futures[threads.submit(function, *args)] = key
+
+        local_jobs = [(key, function, args) for key, remote, function, args in jobs if not remote]
+        if workers <= 1:
+            for key, function, args in local_jobs:
+                results[key] = function(*args)
+        elif local_jobs:
+            with concurrent.futures.ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context(START_METHOD)) as processes:
+                local_futures = {processes.submit(function, *args): key for key, function, args in local_jobs}
+                for future in concurrent.futures.as_completed(local_futures):
+                    results[local_futures[future]] = future.result()
+
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+        if batch is not None:
+            results.update(batch.result())
+
+    return results
@@ -0,0 +1,116 @@
+import numpy as np
+import packed
+
+
+class SparseAmplitudes(object):
+
+    """
+    state of a register given by its nonzero amplitudes. Basis states are
+    kept as PackedPatterns, so memory and setup time grow with the number of
+    stored patterns instead of 2^n; to_dense builds the full vector only for
+    the paths that need it (qiskit initialize)
+
+    :param patterns: distinct basis states (bit strings, 0/1 matrix or
+    PackedPatterns), bit k of each pattern is qubit k
+    :param amplitudes: amplitude of each basis state (default: uniform),
+    normalized
+    :param n_qubits: register size the patterns are validated against
+    """
+
+    def __init__(self, patterns, amplitudes=None, n_qubits=None):
+        patterns = packed.pack(patterns)
+        if len(patterns) == 0:
+            raise ValueError('At least one basis state is required')
+        if n_qubits is not None and patterns.n_bits != n_qubits:
+            raise ValueError('Pattern size {} does not match the {} qubit register'.format(patterns.n_bits, n_qubits))
+        if len(np.unique(patterns.words, axis=0)) != len(patterns):
+            raise ValueError('Basis states must be distinct')
+
+        amplitudes = np.ones(len(patterns)) if amplitudes is None else np.asarray(amplitudes)
+        if amplitudes.shape != (len(patterns),):
+            raise ValueError('Expected {} amplitudes, got {}'.format(len(patterns), amplitudes.shape))
+
+        norm = np.linalg.norm(amplitudes)
+        if norm == 0:
+            raise ValueError('Amplitudes must not all be zero')
+
+        self.patterns = patterns
+        self.amplitudes = amplitudes / norm
+        self.n_qubits = patterns.n_bits
+
+    @classmethod
+    def uniform(cls, patterns, n_qubits=None):
+        """
+        :return: uniform superposition of the distinct patterns, in order of
+        first appearance
+        """
+        return cls(packed.unique(patterns), n_qubits=n_qubits)
+
+    @classmethod
+    def random(cls, n_qubits, support=None, mu=0, sigma=1, rng=None):
+        """
+        :param support: number of basis states with nonzero amplitude
+        (default: every basis state)
+        :return: state with normally distributed real amplitudes
+        """
+        rng = np.random.default_rng() if rng is None else rng
+
+        if support is None or support >= 2 ** n_qubits:
+            bits = (np.arange(2 ** n_qubits)[:, None] >> np.arange(n_qubits - 1, -1, -1)) & 1
+        else:
+            bits = np.empty((0, n_qubits), dtype=np.uint8)
+            while len(bits) < support:
+                draw = rng.integers(0, 2, (support - len(bits), n_qubits), dtype=np.uint8)
+                bits = np.unique(np.concatenate([bits, draw]), axis=0)
+            bits = bits[rng.permutation(len(bits))[:support]]
+
+        amplitudes = sigma * rng.standard_normal(len(bits)) + mu
+        return cls(packed.PackedPatterns.from_bits(bits), amplitudes, n_qubits)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def is_uniform(self):
+        return np.allclose(self.amplitudes, self.amplitudes[0])
+
+    def is_nonnegative(self):
+        return not np.iscomplexobj(self.amplitudes) and bool((self.amplitudes >= 0).all())
+
+    def probabilities(self):
+        return np.abs(self.amplitudes) ** 2
+
+    def indices(self):
+        """
+        :return: index of each basis state in the dense vector; qiskit
+        initialize is little-endian, so bit k of the pattern (qubit k) is
+        bit k of the index
+        """
+        return [int(p[::-1], 2) for p in self.patterns.to_strings()]
+
+    def to_dense(self):
+        """
+        :return: vector of the 2^n amplitudes
+        """
+        vector = np.zeros(2 ** self.n_qubits, dtype=self.amplitudes.dtype)
+        vector[self.indices()] = self.amplitudes
+        return vector
+
+    def __str__(self):
+        if self.is_uniform():
+            return str(self.patterns.to_strings())
+        return str(dict(zip(self.patterns.to_strings(), self.amplitudes.tolist())))
+
+    def __repr__(self):
+        return 'SparseAmplitudes({})'.format(dict(zip(self.patterns.to_strings(), self.amplitudes.tolist())))
+
+
+def superposition(patterns, n_qubits=None):
+    """
+    :return: patterns as SparseAmplitudes, uniform unless they already are
+    """
+    if isinstance(patterns, SparseAmplitudes):
+        if n_qubits is not None and patterns.n_qubits != n_qubits:
+            raise ValueError('Pattern size {} does not match the {} qubit register'.format(patterns.n_qubits,
+                                                                                          n_qubits))
+        return patterns
+    return SparseAmplitudes.uniform(patterns, n_qubits)
@@ -0,0 +1,267 @@
+import copy
+import numpy as np
+
+
+def _u3(theta, phi, lam):
+    return np.array([[np.cos(theta/2), -np.exp(1j*lam) * np.sin(theta/2)],
+                     [np.exp(1j*phi) * np.sin(theta/2), np.exp(1j*(phi + lam)) * np.cos(theta/2)]])
+
+
+def _controlled(u):
+    matrix = np.eye(4, dtype=complex)
+    matrix[2:, 2:] = u
+    return matrix
+
+
+_GATES = {
+    'id': lambda: np.eye(2),
+    'x': lambda: np.array([[0, 1], [1, 0]]),
+    'y': lambda: np.array([[0, -1j], [1j, 0]]),
+    'z': lambda: np.diag([1, -1]),
+    'h': lambda: np.array([[1, 1], [1, -1]]) / np.sqrt(2),
+    's': lambda: np.diag([1, 1j]),
+    'sdg': lambda: np.diag([1, -1j]),
+    't': lambda: np.diag([1, np.exp(1j*np.pi/4)]),
+    'tdg': lambda: np.diag([1, np.exp(-1j*np.pi/4)]),
+    'u1': lambda lam: np.diag([1, np.exp(1j*lam)]),
+    'u2': lambda phi, lam: _u3(np.pi/2, phi, lam),
+    'u3': _u3,
+    'rx': lambda theta: _u3(theta, -np.pi/2, np.pi/2),
+    'ry': lambda theta: _u3(theta, 0, 0),
+    'rz': lambda phi: np.diag([np.exp(-1j*phi/2), np.exp(1j*phi/2)]),
+    'cx': lambda: _controlled(_GATES['x']()),
+    'cy': lambda: _controlled(_GATES['y']()),
+    'cz': lambda: _controlled(_GATES['z']()),
+    'ch': lambda: _controlled(_GATES['h']()),
+    'cu1': lambda lam: _controlled(_GATES['u1'](lam)),
+    'cu3': lambda theta, phi, lam: _controlled(_u3(theta, phi, lam)),
+    'swap': lambda: np.eye(4)[[0, 2, 1, 3]],
+}
+
+
+def gate_matrix(name, params):
+    """
+    :param name: qiskit gate name
+    :param params: numeric gate parameters
+    :return: unitary of the gate (first qubit is the most significant)
+    """
+    if name == 'ccx':
+        matrix = np.eye(8, dtype=complex)
+        matrix[6:, 6:] = _GATES['x']()
+        return matrix
+
+    try:
+        gate = _GATES[name]
+    except KeyError:
+        raise ValueError('Gate {} is not supported by the statevector backend'.format(name))
+
+    return np.asarray(gate(*params), dtype=complex)
+
+
+# Names of the initialize instruction (qiskit 0.5 InitializeGate is 'init')
+INITIALIZE = ('initialize', 'init')
+
+
+def apply_gate(state, matrix, qubits):
+    k = len(qubits)
+    op = matrix.reshape((2,) * 2 * k)
+    state = np.tensordot(op, state, axes=(list(range(k, 2 * k)), qubits))
+    return np.moveaxis(state, list(range(k)), qubits)
+
+
+def initialize(state, amplitudes, qubits):
+    k = len(qubits)
+    rest = np.moveaxis(state, qubits, list(range(k)))[(0,) * k]
+    if not np.isclose(np.linalg.norm(rest), 1):
+        raise ValueError('initialize is only supported on qubits in state |0>')
+
+    # qiskit orders amplitudes little-endian: qubits[0] is the least significant bit
+    amplitudes = np.asarray(amplitudes, dtype=complex).reshape((2,) * k)
+    state = np.multiply.outer(amplitudes, rest)
+    return np.moveaxis(state, list(range(k)), list(reversed(qubits)))
+
+
+class Statevector(object):
+
+    """
+    statevector of the quantum registers of a circuit
+
+    :param qregs: quantum registers, the first qubit of the first register
+    is qubit 0
+    """
+
+    def __init__(self, qregs):
+        self.qubits = {}
+        for qreg in qregs:
+            for i in range(qreg.size):
+                self.qubits[(qreg.name, i)] = len(self.qubits)
+
+        self.state = np.zeros((2,) * len(self.qubits), dtype=complex)
+        self.state[(0,) * len(self.qubits)] = 1
+        self.measures = []
+
+    def index(self, qubit):
+        return self.qubits[(qubit[0].name, qubit[1])]
+
+    def apply(self, instruction):
+        name = instruction.name
+        args = instruction.arg
+
+        if name == 'barrier':
+            return
+
+        if name == 'measure':
+            self.measures.append((self.index(args[0]), args[1][1]))
+            return
+
+        qubits = [self.index(q) for q in args]
+
+        if name in INITIALIZE:
+            params = [complex(p) for p in instruction.param]
+            self.state = initialize(self.state, params, qubits)
+        else:
+            params = [float(p) for p in instruction.param]
+            self.state = apply_gate(self.state, gate_matrix(name, params), qubits)
+
+    def run(self, circuit):
+        for instruction in circuit.data:
+            self.apply(instruction)
+        return self
+
+    def qubit_probabilities(self):
+        """
+        :return: probability of each computational basis state (one axis per qubit)
+        """
+        return np.abs(self.state) ** 2
+
+    def probabilities(self, n_clbits):
+        """
+        :param n_clbits: size of the classical register
+        :return: probability of each measured classical bitstring
+        """
+        probs = self.qubit_probabilities()
+
+        measured = [q for q, _ in self.measures]
+        others = tuple(q for q in range(probs.ndim) if q not in measured)
+
+        probs = probs.sum(axis=others)
+        probs = np.moveaxis(probs, np.argsort(np.argsort(measured)), list(range(len(measured))))
+
+        result = {}
+        for outcome in np.ndindex(probs.shape):
+            key = ['0'] * n_clbits
+            for bit, (_, clbit) in zip(outcome, self.measures):
+                key[n_clbits - 1 - clbit] = str(bit)
+            key = ''.join(key)
+            result[key] = result.get(key, 0) + probs[outcome]
+
+        return result
+
+
+def registers(circuit):
+    """
+    :param circuit: quantum circuit
+    :return: quantum and classical registers used by the circuit instructions
+    """
+    qregs, cregs = [], []
+    for instruction in circuit.data:
+        qubits = instruction.arg[:1] if instruction.name == 'measure' else instruction.arg
+        for qreg, _ in qubits:
+            if qreg not in qregs:
+                qregs.append(qreg)
+
+        if instruction.name == 'measure':
+            creg = instruction.arg[1][0]
+            if creg not in cregs:
+                cregs.append(creg)
+
+    return qregs, cregs
+
+
+def circuit_probabilities(circuit):
+    """
+    :param circuit: quantum circuit with a single classical register
+    :return: exact probability of each measured outcome
+    """
+    qregs, cregs = registers(circuit)
+    sv = Statevector(qregs).run(circuit)
+    return sv.probabilities(sum(creg.size for creg in cregs))
+
+
+def probabilities(memory):
+    """
+    :param memory: PQM instance
+    :return: exact probability of each ancilla outcome
+    """
+    sv = Statevector([memory.mqr, memory.cqr]).run(memory.circuit)
+    return sv.probabilities(memory.cr.size)
+
+
+def template_probabilities(template, input_patterns, scale_parameters, simulator=None):
+    """
+    Simulates the storage part of a template once and only the recovery
+    circuit of every (scale parameter, input) binding
+
+    :param template: PQM after recover_template
+    :param simulator: function returning a new simulator of the template
+    registers (default: Statevector)
+    :return: list with one list per scale parameter of the outcome
+    probabilities of each input pattern
+    """
+    if simulator is None:
+        simulator = lambda: Statevector([template.mqr, template.cqr])
+
+    data = template.circuit.data
+    start = next((i for i, instruction in enumerate(data)
+                  if any(getattr(p, 'free_symbols', None) for p in instruction.param)), len(data))
+
+    prepared = simulator()
+    for instruction in data[:start]:
+        prepared.apply(instruction)
+
+    result = []
+    for scale_parameter in scale_parameters:
+        row = []
+        for input_pattern in input_patterns:
+            bound = template.bind(input_pattern, scale_parameter=scale_parameter)
+
+            # gates replace the state array, so the prepared state is shared
+            sim = copy.copy(prepared)
+            sim.measures = list(prepared.measures)
+            for instruction in bound.circuit.data[start:]:
+                sim.apply(instruction)
+            row.append(sim.probabilities(template.cr.size))
+        result.append(row)
+
+    return result
+
+
+def sample(probs, shots, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    keys = list(probs)
+    p = np.array([probs[k] for k in keys])
+    counts = rng.multinomial(shots, p / p.sum())
+    return {k: int(c) for k, c in zip(keys, counts) if c > 0}
+
+
+def run(memories, shots, sampled=False, seed=None):
+    """
+    :param memories: PQM instances
+    :param shots: number of shots
+    :param sampled: sample counts from the exact probabilities instead of
+    scaling them by shots
+    :param seed: random seed used when sampling
+    :return: results in the format accepted by util._to_result
+    """
+    rng = np.random.default_rng(seed)
+
+    results = []
+    for memory in memories:
+        probs = probabilities(memory)
+        if sampled:
+            counts = sample(probs, shots, rng)
+        else:
+            counts = {k: v * shots for k, v in probs.items()}
+        results.append({'name': memory.circuit_name, 'counts': counts})
+
+    return results
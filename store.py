@@ -0,0 +1,197 @@
+import glob
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import telemetry
+import util
+
+STORE_FOLDER = 'store/'
+
+NAMES_FILE = 'names.npy'
+OUTCOMES_FILE = 'outcomes.npy'
+COUNTS_FILE = 'counts.npy'
+META_FILE = 'meta.json'
+
+
+class CountsResult(object):
+
+    """
+    experiment result in columnar form: one row per circuit and one column
+    per measured outcome. Implements the parts of qiskit's Result used by
+    this project (get_names, get_data, get_status).
+
+    :param names: circuit names
+    :param outcomes: measured outcomes (classical bitstrings)
+    :param counts: counts matrix (len(names) x len(outcomes))
+    :param metadata: job id, status, backend name, circuit hashes and the
+    shots of the circuits run with their own number of shots (adaptive jobs)
+    """
+
+    def __init__(self, names, outcomes, counts, metadata):
+        self.names = list(names)
+        self.outcomes = list(outcomes)
+        self.counts = counts
+        self.metadata = metadata
+        self._result = {'id': metadata.get('id'), 'status': metadata.get('status')}
+
+        self._rows = {name: i for i, name in enumerate(self.names)}
+        self._columns = {outcome: j for j, outcome in enumerate(self.outcomes)}
+
+    @classmethod
+    def from_result(cls, result, circuit_hashes=None):
+        if isinstance(result, CountsResult):
+            return result
+
+        # failed jobs hold an error message instead of circuit results
+        if result.get_status() != 'COMPLETED':
+            raise ValueError('Only completed results can be stored, got status {}'.format(result.get_status()))
+
+        names = result.get_names()
+        rows = []
+        shots = {}
+        for name in names:
+            try:
+                data = result.get_data(name)
+            except Exception:
+                data = {}
+            rows.append(data.get('counts', {}))
+            if 'shots' in data:
+                shots[name] = int(data['shots'])
+
+        outcomes = sorted(set(outcome for row in rows for outcome in row))
+        values = [v for row in rows for v in row.values()]
+        dtype = np.int64 if all(float(v).is_integer() for v in values) else np.float64
+
+        counts = np.zeros((len(names), len(outcomes)), dtype=dtype)
+        columns = {outcome: j for j, outcome in enumerate(outcomes)}
+        for i, row in enumerate(rows):
+            for outcome, value in row.items():
+                counts[i, columns[outcome]] = value
+
+        raw = getattr(result, '_result', {})
+        metadata = {'id': raw.get('id'),
+                    'status': result.get_status(),
+                    'backend_name': raw.get('backend_name'),
+                    'used_credits': raw.get('used_credits'),
+                    'circuit_hashes': circuit_hashes or {},
+                    'shots': shots}
+
+        return cls(names, outcomes, counts, metadata)
+
+    def get_names(self):
+        return list(self.names)
+
+    def get_status(self):
+        return self.metadata['status']
+
+    def get_counts(self, name):
+        row = self.counts[self._rows[name]]
+        return {outcome: row[j].item() for j, outcome in enumerate(self.outcomes) if row[j] != 0}
+
+    def get_data(self, name):
+        data = {'counts': self.get_counts(name)}
+        shots = self.metadata.get('shots', {})
+        if name in shots:
+            data['shots'] = shots[name]
+        return data
+
+    def column(self, outcome):
+        """
+        :return: counts of outcome for every circuit
+        """
+        if outcome not in self._columns:
+            return np.zeros(len(self.names), dtype=self.counts.dtype)
+        return self.counts[:, self._columns[outcome]]
+
+    def shots(self):
+        return self.counts.sum(axis=1)
+
+
+def save(path, result, circuit_hashes=None):
+    """
+    :param path: result folder, relative to util.EXPS_FOLDER
+    :param result: qiskit Result or CountsResult
+    :return: saved CountsResult
+    """
+    result = CountsResult.from_result(result, circuit_hashes)
+
+    folder = os.path.join(util.EXPS_FOLDER, path)
+    tmp_folder = folder.rstrip('/') + '.tmp'
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    os.makedirs(tmp_folder)
+
+    np.save(os.path.join(tmp_folder, NAMES_FILE), np.array(result.names, dtype=str))
+    np.save(os.path.join(tmp_folder, OUTCOMES_FILE), np.array(result.outcomes, dtype=str))
+    np.save(os.path.join(tmp_folder, COUNTS_FILE), np.asarray(result.counts))
+    with open(os.path.join(tmp_folder, META_FILE), 'w') as file:
+        json.dump(result.metadata, file, indent=1, sort_keys=True)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp_folder, folder)
+
+    return result
+
+
+def load(path, mmap_mode='r'):
+    """
+    :param path: result folder, relative to util.EXPS_FOLDER
+    :param mmap_mode: memory-map mode of the counts matrix (None loads it)
+    :return: CountsResult
+    """
+    folder = os.path.join(util.EXPS_FOLDER, path)
+
+    with telemetry.timer('deserialize', format='store', path=folder):
+        names = np.load(os.path.join(folder, NAMES_FILE))
+        outcomes = np.load(os.path.join(folder, OUTCOMES_FILE))
+        counts = np.load(os.path.join(folder, COUNTS_FILE), mmap_mode=mmap_mode)
+        with open(os.path.join(folder, META_FILE)) as file:
+            metadata = json.load(file)
+
+    return CountsResult(names.tolist(), outcomes.tolist(), counts, metadata)
+
+
+def exists(path):
+    return os.path.exists(os.path.join(util.EXPS_FOLDER, path, META_FILE))
+
+
+def size(path):
+    folder = os.path.join(util.EXPS_FOLDER, path)
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+
+def remove(path):
+    shutil.rmtree(os.path.join(util.EXPS_FOLDER, path), ignore_errors=True)
+
+
+def migrate(folder=util.EXPS_FOLDER):
+    """
+    Converts the pickled results in folder (exps/*.p) to the columnar store,
+    skipping the results of failed jobs and files that cannot be read
+
+    :return: names of the migrated and of the skipped results
+    """
+    migrated, skipped = [], []
+    for filename in sorted(glob.glob(os.path.join(folder, '*.p'))):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        if exists(STORE_FOLDER + name):
+            continue
+
+        try:
+            with open(filename, 'rb') as file:
+                result = pickle.load(file)
+            save(STORE_FOLDER + name, result)
+        except Exception as e:
+            print('Skipped {}: {}'.format(filename, e))
+            skipped.append(name)
+            continue
+
+        print('Migrated {} -> {}{}'.format(filename, STORE_FOLDER, name))
+        migrated.append(name)
+
+    return migrated, skipped
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,308 @@
+import argparse
+import itertools
+import json
+import os
+import time
+import numpy as np
+import layout
+import noise
+import plotting
+import pqm_experiment
+import quantum
+import scheduler
+import telemetry
+import util
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+CONFIG = 'configs/mi_il.json'
+
+# Scale parameter curves, relative to util.EXPS_FOLDER
+CURVES_FOLDER = 'curves/'
+
+DEFAULTS = {'backends': [quantum.__name__],
+            'inputs': None,
+            'init_methods': ['manual_init'],
+            'scale_parameters': [1],
+            'c_sizes': [1],
+            'shots': 8192,
+            'tolerance': None,
+            'layout': None,
+            'calibration': None,
+            'memories': 'configs/memories.json',
+            'labels': 'configs/tex_labels.json',
+            'plots': None,
+            'orientation': 'H'}
+
+
+def load_config(path):
+    """
+    :param path: sweep definition (.json, or .yaml/.yml with PyYAML installed)
+    :return: sweep definition with the DEFAULTS filled in
+    """
+    with open(path) as file:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ImportError('PyYAML is required to read {}'.format(path))
+            config = yaml.safe_load(file)
+        else:
+            config = json.load(file)
+
+    values = dict(DEFAULTS)
+    values['name'] = os.path.splitext(os.path.basename(path))[0]
+    values.update(config)
+    return values
+
+
+def load_json(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def scale_parameters(value):
+    """
+    :param value: number, list or {'start', 'stop', 'num'} range
+    """
+    if isinstance(value, dict):
+        return np.linspace(value['start'], value['stop'], value['num']).tolist()
+    if isinstance(value, (int, float)):
+        return [value]
+    return list(value)
+
+
+def input_patterns(inputs, memory_size):
+    """
+    :param inputs: None (every input), list of integers or bit strings, or
+    dict memory size -> one of those
+    """
+    if isinstance(inputs, dict):
+        inputs = inputs.get(str(memory_size))
+    if inputs is None:
+        inputs = range(2 ** memory_size)
+    return [pqm_experiment.decimal_input(i, memory_size) if isinstance(i, int) else i for i in inputs]
+
+
+def expand(config):
+    """
+    :return: one experiment point per combination of memory size,
+    initialization method, scale parameter and number of ancillas, each a
+    dict with name, exp_config, inputs, c_size and scale_parameter
+    """
+    scales = scale_parameters(config['scale_parameters'])
+
+    points = []
+    names = set()
+    for memory_size, init_name, scale, c_size in itertools.product(config['memory_sizes'], config['init_methods'],
+                                                                     scales, config['c_sizes']):
+        name = '{}_{}q'.format(config['name'], memory_size)
+        if len(config['init_methods']) > 1:
+            name += '_' + init_name
+        if len(scales) > 1:
+            name += '_param{}'.format(scale)
+        if len(config['c_sizes']) > 1:
+            name += '_c{}'.format(c_size)
+
+        if name in names:
+            continue
+        names.add(name)
+
+        initial_layout = None
+        if config['layout'] is not None:
+            initial_layout = layout.best_layout(config['layout'], memory_size, c_size)
+
+        exp_config = {'backends': config['backends'],
+                      'memory_size': memory_size,
+                      'initialization_method': getattr(pqm_experiment, init_name),
+                      'initial_layout': initial_layout}
+        if config['calibration'] is not None:
+            exp_config['calibration'] = config['calibration']
+
+        points.append({'name': name,
+                       'exp_config': exp_config,
+                       'inputs': input_patterns(config['inputs'], memory_size),
+                       'c_size': c_size,
+                       'scale_parameter': scale})
+
+    return points
+
+
+def job_graph(points, mem_patterns, shots, tolerance=None):
+    """
+    Merges the jobs of every point, running jobs shared by several points once
+
+    :return: jobs for scheduler.run and, for each point, a dict job key of
+    the point -> job key in the graph
+    """
+    jobs = []
+    index = {}
+    point_keys = []
+    for point in points:
+        keys = {}
+        for key, remote, function, args in pqm_experiment.experiment_jobs(point['exp_config'], point['inputs'],
+                                                                          mem_patterns, point['c_size'], shots,
+                                                                          point['scale_parameter'], tolerance):
+            identity = (function.__name__, repr(args))
+            if identity not in index:
+                index[identity] = len(jobs)
+                jobs.append((len(jobs), remote, function, args))
+            keys[key] = index[identity]
+        point_keys.append(keys)
+
+    return jobs, point_keys
+
+
+def missing(jobs):
+    """
+    :return: graph keys of the qiskit jobs without a cached result (the
+    analytic and simulation jobs are always recomputed)
+    """
+    return {key for key, _, function, args in jobs
+            if function is pqm_experiment.qiskit_job and not pqm_experiment.qiskit_job_cached(*args)}
+
+
+def print_plan(points, jobs, point_keys, missing_keys):
+    print('{:>28} {:>8} {:>8} {:>8}'.format('experiment', 'jobs', 'qiskit', 'missing'))
+    for point, keys in zip(points, point_keys):
+        graph_keys = set(keys.values())
+        qiskit_keys = {key for key in graph_keys if jobs[key][2] is pqm_experiment.qiskit_job}
+        print('{:>28} {:>8} {:>8} {:>8}'.format(point['name'], len(graph_keys), len(qiskit_keys),
+                                                len(qiskit_keys & missing_keys)))
+    print('{} jobs in the sweep, {} qiskit jobs to run'.format(len(jobs), len(missing_keys)))
+
+
+def run(config, workers=None, dry_run=False):
+    """
+    Runs every job of a sweep that has no cached result, then reports the
+    MSE of each backend against the analytic backend and draws the plots
+
+    :param config: sweep definition, see load_config
+    :return: dict experiment name -> backend -> input pattern -> Result
+    (None with dry_run)
+    """
+    mem_patterns = load_json(config['memories'])
+    points = expand(config)
+    jobs, point_keys = job_graph(points, mem_patterns, config['shots'], config['tolerance'])
+    print_plan(points, jobs, point_keys, missing(jobs))
+
+    if dry_run:
+        return None
+
+    with telemetry.timer('sweep', sweep=config['name'], jobs=len(jobs)):
+        job_results = scheduler.run(jobs, workers=workers, remote_runner=pqm_experiment.run_remote_jobs)
+    pqm_experiment.result_cache.flush()
+
+    results = {}
+    for point, keys in zip(points, point_keys):
+        point_results = {key: job_results[graph_key] for key, graph_key in keys.items()}
+        results[point['name']] = pqm_experiment.collect_results(point['exp_config'], point['inputs'], mem_patterns,
+                                                                point_results)
+
+    with telemetry.timer('report', sweep=config['name']):
+        report(config, points, results, mem_patterns)
+
+    return results
+
+
+def report(config, points, results, mem_patterns):
+    labels = load_json(config['labels']) if config['labels'] is not None else {}
+
+    figures = []
+    for point in points:
+        exp_results = results[point['name']]
+        memory_size = str(point['exp_config']['memory_size'])
+
+        if quantum.__name__ in exp_results:
+            for backend in exp_results:
+                if backend != quantum.__name__:
+                    clbits = pqm_experiment.ancilla_clbits(point['exp_config']['initial_layout'], point['c_size'])
+                    mse = util.MSE(exp_results, point['inputs'], target=backend, width=point['c_size'],
+                                   clbits=clbits)
+                    print('MSE {} {}: {}'.format(point['name'], backend, mse))
+
+        if config['plots'] is not None:
+            x_labels = labels.get(memory_size, list(mem_patterns[memory_size]))
+            for input_pattern in point['inputs']:
+                figures.append(pqm_experiment.plot_data(point['name'], exp_results, input_pattern, x_labels,
+                                                        config['orientation'], config['shots']))
+
+    if figures:
+        plotting.render(figures, config['plots'])
+
+
+def curves(config, workers=None):
+    """
+    Evaluates every scale parameter of the sweep in one pass per experiment
+    (see pqm_experiment.scale_sweep) and saves the probability tensors of
+    each backend to exps/curves/<experiment>.npz
+
+    :return: dict experiment name -> backend -> tensor (scale parameter x input x memory)
+    """
+    mem_patterns = load_json(config['memories'])
+    scales = scale_parameters(config['scale_parameters'])
+
+    results = {}
+    for point in expand(dict(config, scale_parameters=scales[:1])):
+        memory_size = str(point['exp_config']['memory_size'])
+        tensors = pqm_experiment.scale_sweep(point['exp_config'], point['inputs'], mem_patterns, point['c_size'],
+                                             config['shots'], scales, workers=workers,
+                                             tolerance=config['tolerance'])
+
+        filename = util.EXPS_FOLDER + CURVES_FOLDER + point['name'] + '.npz'
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        np.savez(filename, scale_parameters=scales, inputs=point['inputs'], memories=list(mem_patterns[memory_size]),
+                 **tensors)
+        print('Saved', filename)
+
+        results[point['name']] = tensors
+
+    return results
+
+
+def fit_noise(config, calibration):
+    """
+    Fits the noise backend to the stored ibmqx4 results of every point and
+    saves the model of the last point as calibration
+    """
+    mem_patterns = load_json(config['memories'])
+    for point in expand(config):
+        noise.fit_experiment(point['exp_config'], point['inputs'], mem_patterns, point['c_size'], config['shots'],
+                             point['scale_parameter'], save_as=calibration)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a sweep of PQM experiments')
+    parser.add_argument('config', nargs='?', default=CONFIG, help='sweep definition (.json, .yaml)')
+    parser.add_argument('--workers', type=int, default=None, help='processes for local jobs')
+    parser.add_argument('--dry-run', action='store_true', help='print the jobs and what is cached, run nothing')
+    parser.add_argument('--curves', action='store_true',
+                        help='evaluate all scale parameters in one pass and save the probability tensors')
+    parser.add_argument('--telemetry', metavar='FILE', default=None,
+                        help='append timing and cache events to FILE (JSON lines) and print a summary')
+    parser.add_argument('--fit-noise', metavar='CALIBRATION', default=None,
+                        help='fit the noise backend to the stored ibmqx4 results instead of running')
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+
+    run_id = '{}_{}'.format(config['name'], int(time.time()))
+    if args.telemetry is not None:
+        telemetry.enable(args.telemetry, run=run_id)
+
+    if args.fit_noise is not None:
+        fit_noise(config, args.fit_noise)
+    elif args.curves:
+        curves(config, workers=args.workers)
+    else:
+        run(config, workers=args.workers, dry_run=args.dry_run)
+
+    if args.telemetry is not None:
+        telemetry.disable()
+        print('Telemetry of run {}:'.format(run_id))
+        telemetry.print_summary(telemetry.summary(telemetry.load(args.telemetry, run_id)))
+
+
+if __name__ == '__main__':
+    main()
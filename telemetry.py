@@ -0,0 +1,138 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Events are appended to the JSON-lines file named by this variable; unset
+# disables telemetry. Environment variables reach the worker processes.
+ENV_FILE = 'PQM_TELEMETRY'
+ENV_RUN = 'PQM_TELEMETRY_RUN'
+
+_lock = threading.Lock()
+_file = None
+_path = None
+
+
+def enabled():
+    return ENV_FILE in os.environ
+
+
+def enable(path, run=None):
+    """
+    :param path: JSON-lines file events are appended to
+    :param run: id added to every event (e.g. the sweep), to summarize a run
+    """
+    os.environ[ENV_FILE] = path
+    if run is not None:
+        os.environ[ENV_RUN] = run
+
+
+def disable():
+    global _file, _path
+    os.environ.pop(ENV_FILE, None)
+    os.environ.pop(ENV_RUN, None)
+    with _lock:
+        if _file is not None:
+            _file.close()
+        _file, _path = None, None
+
+
+def emit(name, **fields):
+    """
+    Appends an event (name, time, pid, run and fields) when telemetry is enabled
+    """
+    path = os.environ.get(ENV_FILE)
+    if path is None:
+        return
+
+    record = {'event': name, 'time': time.time(), 'pid': os.getpid(), 'run': os.environ.get(ENV_RUN)}
+    record.update(fields)
+    line = json.dumps(record, default=str) + '\n'
+
+    global _file, _path
+    with _lock:
+        # a forked worker reopens the file instead of sharing the parent's buffer
+        if _file is None or _path != (path, os.getpid()):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            _file = open(path, 'a')
+            _path = (path, os.getpid())
+        _file.write(line)
+        _file.flush()
+
+
+def count(name, n=1, **fields):
+    emit(name, count=n, **fields)
+
+
+@contextlib.contextmanager
+def timer(name, **fields):
+    """
+    Emits name with the wall-clock seconds spent in the block
+    """
+    if not enabled():
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit(name, seconds=time.perf_counter() - start, **fields)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as event name
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name, function=function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load(path, run=None):
+    """
+    :return: events of path, only those of run if given
+    """
+    events = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if run is None or event.get('run') == run:
+                events.append(event)
+    return events
+
+
+def summary(events):
+    """
+    :return: dict event name -> number of events, total count, total and
+    maximum seconds
+    """
+    stats = collections.OrderedDict()
+    for event in events:
+        s = stats.setdefault(event['event'], {'events': 0, 'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        s['events'] += 1
+        s['count'] += event.get('count', 0)
+        if 'seconds' in event:
+            s['seconds'] += event['seconds']
+            s['max_seconds'] = max(s['max_seconds'], event['seconds'])
+
+    return stats
+
+
+def print_summary(stats):
+    print('{:<24} {:>8} {:>8} {:>12} {:>12}'.format('event', 'events', 'count', 'seconds', 'max seconds'))
+    for name, s in sorted(stats.items(), key=lambda item: -item[1]['seconds']):
+        print('{:<24} {:>8} {:>8} {:>12.3f} {:>12.3f}'.format(name, s['events'], s['count'], s['seconds'],
+                                                           s['max_seconds']))
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# the modules read exps/, configs/ and calibrations/ relative to the repository
+os.chdir(ROOT)
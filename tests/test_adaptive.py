@@ -0,0 +1,81 @@
+import pytest
+
+import adaptive
+import pqm
+import telemetry
+import util
+
+
+def circuits(names):
+    return [pqm.PQM(1, circuit_name=name).circuit for name in names]
+
+
+def fixed_execute(zero_fraction):
+    """
+    :return: execute function measuring '0' with the given fraction of shots
+    per circuit name, and the list of (names, shots) of every round
+    """
+    rounds = []
+
+    def execute(active, shots, n_round):
+        rounds.append(([c.name for c in active], shots))
+        rows = []
+        for circuit in active:
+            zeros = int(round(zero_fraction[circuit.name] * shots))
+            rows.append({'name': circuit.name, 'counts': {'0': zeros, '1': shots - zeros}})
+        return util._to_result(rows)
+
+    return execute, rounds
+
+
+def test_wilson_interval():
+    assert adaptive.wilson_interval(0, 0) == (0.0, 1.0)
+
+    low, high = adaptive.wilson_interval(50, 100)
+    assert low < 0.5 < high
+    assert (low + high) / 2 == pytest.approx(0.5)
+    assert (high - low) / 2 == pytest.approx(0.0961, abs=1e-3)
+
+
+def test_zero_counts():
+    assert adaptive.zero_counts({'00': 3, '0 0': 2, '01': 5, '10': 7}) == 5
+
+
+def test_stops_each_circuit_once_converged():
+    execute, rounds = fixed_execute({'certain': 1.0, 'coin': 0.5})
+    result = adaptive.run_adaptive(circuits(['certain', 'coin']), execute, tolerance=0.02, round_shots=100,
+                                   max_shots=1000)
+
+    # the deterministic circuit converges before the coin flip
+    assert result.get_data('certain')['shots'] < result.get_data('coin')['shots']
+    assert result.get_data('coin')['shots'] == 1000
+    assert all(shots == 100 for _, shots in rounds)
+    assert rounds[-1][0] == ['coin']
+
+    for name in ('certain', 'coin'):
+        data = result.get_data(name)
+        assert sum(data['counts'].values()) == data['shots']
+
+
+def test_last_round_capped_at_max_shots():
+    execute, rounds = fixed_execute({'coin': 0.5})
+    result = adaptive.run_adaptive(circuits(['coin']), execute, tolerance=0.0, round_shots=300, max_shots=1000)
+
+    assert [shots for _, shots in rounds] == [300, 300, 300, 100]
+    assert result.get_data('coin')['shots'] == 1000
+
+
+def test_rounds_reported_through_telemetry(tmp_path, capsys):
+    path = str(tmp_path / 'events.jsonl')
+    telemetry.enable(path)
+    try:
+        execute, rounds = fixed_execute({'certain': 1.0, 'coin': 0.5})
+        adaptive.run_adaptive(circuits(['certain', 'coin']), execute, tolerance=0.05, round_shots=100,
+                              max_shots=300)
+    finally:
+        telemetry.disable()
+
+    events = telemetry.load(path)
+    assert [event['round'] for event in events] == list(range(len(rounds)))
+    assert events[-1]['converged'] == 2
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,108 @@
+import concurrent.futures
+import json
+import multiprocessing
+import numpy as np
+import pytest
+import cache
+import pqm_experiment
+import store
+import util
+
+WORKERS = 8
+PUTS = 30
+
+
+@pytest.fixture
+def exps_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(util, 'EXPS_FOLDER', str(tmp_path) + '/')
+    return tmp_path
+
+
+def counts_result(i):
+    return store.CountsResult(['m'], ['0', '1'], np.array([[i, 100 - i]]), {'status': 'COMPLETED'})
+
+
+def put_many(worker):
+    result_cache = cache.ResultCache()
+    for i in range(PUTS):
+        result_cache.put('{}_{}'.format(worker, i), counts_result(i), name='job', backend='local', shots=100)
+    return worker
+
+
+def test_concurrent_puts_keep_the_index_valid(exps_folder):
+    context = multiprocessing.get_context('fork')
+    with concurrent.futures.ProcessPoolExecutor(WORKERS, mp_context=context) as executor:
+        assert sorted(executor.map(put_many, range(WORKERS))) == list(range(WORKERS))
+
+    result_cache = cache.ResultCache()
+    with open(result_cache.index_file) as file:
+        index = json.load(file)
+    assert len(index) == WORKERS * PUTS
+
+    assert result_cache.get('3_7').get_data('m')['counts'] == {'0': 7, '1': 93}
+
+
+def legacy_memories(input_pattern, c_size=1):
+    with open('configs/memories.json') as file:
+        patterns = json.load(file)[str(len(input_pattern))].values()
+    return [pqm_experiment.set_memory(v, len(input_pattern), c_size, input_pattern, pqm_experiment.manual_init)
+            for v in patterns]
+
+
+def test_load_legacy_matches_layout_and_c_size():
+    name = 'ibmqx4_0_manual_init_param1_init_layout'
+    layout = cache.LEGACY_LAYOUTS[1]
+
+    result = cache.load_legacy(name, legacy_memories('0'), 8192, layout)
+    assert result is not None
+    assert result.get_data("['0']")['counts'] == {'00000': 7679, '00100': 513}
+
+    assert cache.load_legacy(name, legacy_memories('0'), 4096, layout) is None
+    assert cache.load_legacy(name, legacy_memories('0', c_size=2), 8192, layout) is None
+    assert cache.load_legacy(name, legacy_memories('0'), 8192, None) is None
+    other_layout = {('memory', 0): ('q', 1), ('ancilla', 0): ('q', 2)}
+    assert cache.load_legacy(name, legacy_memories('0'), 8192, other_layout) is None
+
+
+def test_load_legacy_skips_failed_jobs():
+    # status ERROR, result 'QISKit timed out'
+    name = 'ibmqx4_0000_qiskit_init_param1_init_layout'
+    memories = [pqm_experiment.set_memory(v, 4, 1, '0000', pqm_experiment.qiskit_init)
+                for v in [['0000'], ['0000', '0100']]]
+
+    assert cache.load_legacy(name, memories, 8192, cache.LEGACY_LAYOUTS[4]) is None
+
+
+def test_get_does_not_write_the_index(exps_folder, monkeypatch):
+    result_cache = cache.ResultCache()
+    result_cache.put('a', counts_result(1))
+
+    saves = []
+    save_index = result_cache._save_index
+    monkeypatch.setattr(result_cache, '_save_index', lambda index: saves.append(index) or save_index(index))
+
+    for _ in range(10):
+        assert result_cache.get('a') is not None
+    assert saves == []
+
+    result_cache.flush()
+    assert len(saves) == 1
+    result_cache.flush()
+    assert len(saves) == 1
+
+
+def test_evict_uses_access_times_of_lookups(exps_folder, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(cache.time, 'time', lambda: next(clock))
+
+    result_cache = cache.ResultCache()
+    for key in ('a', 'b', 'c'):
+        result_cache.put(key, counts_result(1))
+    size = result_cache.load_index()['a']['size']
+
+    # 'a' is the most recently used once its lookup is written with the evict
+    result_cache.get('a')
+    result_cache.evict(2 * size)
+
+    assert sorted(result_cache.load_index()) == ['a', 'c']
+    assert result_cache.get('b') is None
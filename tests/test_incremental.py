@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+import incremental
+import quantum
+import statevector
+
+
+def test_probabilities_follow_inserts_and_deletes():
+    memory = incremental.IncrementalMemory(3, c_size=2)
+    memory.extend(['000', '011', '011', '101'])
+    assert memory.patterns == ['000', '011', '101']
+    np.testing.assert_allclose(memory.probabilities(),
+                               quantum.memory_retrieval_batch(memory.queries, ['000', '011', '101'], 2, 1))
+
+    # the pattern stays stored until its last occurrence is deleted
+    memory.delete('011')
+    assert memory.patterns == ['000', '011', '101']
+    memory.delete('011')
+    assert memory.patterns == ['000', '101']
+    np.testing.assert_allclose(memory.probabilities(['110', '001']),
+                               quantum.memory_retrieval_batch(['110', '001'], ['000', '101'], 2, 1))
+
+    with pytest.raises(KeyError):
+        memory.delete('011')
+
+
+def test_window_evicts_oldest():
+    memory = incremental.IncrementalMemory(2, window=2)
+    assert memory.extend(['00', '01', '10']) == ['00']
+    assert memory.patterns == ['01', '10']
+    np.testing.assert_allclose(memory.probabilities(), quantum.memory_retrieval_batch(memory.queries, ['01', '10'],
+                                                                                      1, 1))
+
+
+def test_untracked_queries():
+    memory = incremental.IncrementalMemory(4, queries=['0000'])
+    memory.extend(['0011', '1111'])
+    np.testing.assert_allclose(memory.probabilities(['0110']),
+                               quantum.memory_retrieval_batch(['0110'], ['0011', '1111'], 1, 1))
+
+    memory.add_queries(['0110'])
+    np.testing.assert_allclose(memory.probabilities(['0110']),
+                               quantum.memory_retrieval_batch(['0110'], ['0011', '1111'], 1, 1))
+
+
+def test_invalid_patterns():
+    memory = incremental.IncrementalMemory(2)
+    with pytest.raises(ValueError, match='empty'):
+        memory.probabilities()
+    with pytest.raises(ValueError, match='memory size'):
+        memory.insert('000')
+    with pytest.raises(ValueError, match='window'):
+        incremental.IncrementalMemory(2, window=0)
+
+
+def test_template_rebuilt_only_after_changes():
+    memory = incremental.IncrementalMemory(2)
+    memory.extend(['01', '10'])
+    template = memory.template()
+    assert memory.template() is template
+
+    memory.insert('01')
+    assert memory.template() is template
+    memory.insert('11')
+    assert memory.template() is not template
+
+
+def test_circuit_matches_histogram():
+    memory = incremental.IncrementalMemory(3)
+    memory.extend(['001', '110', '111'])
+    for input_pattern, p in zip(['000', '011', '101'], memory.probabilities(['000', '011', '101'])):
+        assert statevector.probabilities(memory.memory(input_pattern))['0'] == pytest.approx(p[0])
+
+
+def test_run_local_backends():
+    memory = incremental.IncrementalMemory(2)
+    memory.extend(['00', '11'])
+
+    for backend in (quantum.__name__, statevector.__name__):
+        results = memory.run(['01', '00'], backend, shots=1000)
+        assert sorted(results) == ['00', '01']
+        counts = results['00'].get_counts(memory.circuit_name)
+        assert sum(counts.values()) == pytest.approx(1000)
+
+
+def test_digest_depends_on_content_only():
+    memory = incremental.IncrementalMemory(2)
+    memory.extend(['01', '10'])
+    digest = memory.digest()
+
+    memory.insert('11')
+    assert memory.digest() != digest
+    memory.delete('11')
+    assert memory.digest() == digest
+
+    other = incremental.IncrementalMemory(2)
+    other.extend(['01', '10'])
+    assert other.digest() == digest
+    assert other.version != memory.version
+
+    reordered = incremental.IncrementalMemory(2)
+    reordered.extend(['10', '01'])
+    assert reordered.digest() == digest
+
+
+def test_remote_job_named_by_content(monkeypatch):
+    import pqm_experiment
+    import util
+
+    names = []
+
+    def execute_job(job_name, circuits, backend, shots, initial_layout):
+        names.append(job_name)
+        return util._to_result([{'name': circuits[0].name, 'counts': {'0': shots}}], backend_name=backend)
+
+    monkeypatch.setattr(pqm_experiment, 'execute_job', execute_job)
+
+    memory = incremental.IncrementalMemory(2)
+    memory.extend(['01', '10', '11'])
+    memory.delete('11')
+    memory.run(['00'], 'ibmqx4', shots=10)
+
+    assert names == ['stream_ibmqx4_{}_00'.format(memory.digest())]
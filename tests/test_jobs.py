@@ -0,0 +1,197 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import pytest
+import cache
+import jobs
+import pqm_experiment
+import scheduler
+import util
+
+WORKERS = 8
+UPDATES = 30
+
+
+@pytest.fixture
+def exps_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(util, 'EXPS_FOLDER', str(tmp_path) + '/')
+    monkeypatch.setattr(pqm_experiment, 'result_cache', cache.ResultCache())
+    return tmp_path
+
+
+def circuits(input_pattern='01', patterns=(['00'], ['00', '11'])):
+    return [pqm_experiment.set_memory(v, 2, 1, input_pattern, pqm_experiment.manual_init).circuit for v in patterns]
+
+
+def total_shots(result, name):
+    return sum(result.get_data(name)['counts'].values())
+
+
+class RecordingBackend(jobs.FakeBackend):
+
+    def __init__(self, events, **kwargs):
+        super(RecordingBackend, self).__init__(**kwargs)
+        self.events = events
+
+    def submit(self, circuits, shots, initial_layout=None, max_credits=15):
+        self.events.append('submit')
+        job = super(RecordingBackend, self).submit(circuits, shots, initial_layout, max_credits)
+        status = job.status
+
+        def recording_status():
+            self.events.append('poll')
+            return status()
+
+        job.status = recording_status
+        return job
+
+
+@pytest.mark.parametrize('status, expected', [('COMPLETED', 'DONE'), ('DONE', 'DONE'), ('RUNNING', 'RUNNING'),
+                                              ('ERROR_RUNNING_JOB', 'ERROR'), ('ERROR_CREATING_JOB', 'ERROR'),
+                                              ('CANCELLED', 'CANCELLED'), ({'status': 'ERROR'}, 'ERROR')])
+def test_job_status(status, expected):
+    class Job(object):
+        pass
+
+    job = Job()
+    job.status = status
+    assert jobs.job_status(job) == expected
+
+
+def test_failed_job_is_final(exps_folder):
+    backend = jobs.FakeBackend(polls=0)
+    job = backend.submit(circuits(), 100)
+    job.status = lambda: 'ERROR_RUNNING_JOB'
+
+    with pytest.raises(Exception, match='ERROR'):
+        asyncio.run(jobs.wait('failed', 'key', job, jobs.Ledger(), poll_interval=0.01))
+
+
+class FailingBackend(jobs.FakeBackend):
+
+    """
+    fails the jobs submitted in the given positions
+    """
+
+    def __init__(self, failing, **kwargs):
+        super(FailingBackend, self).__init__(**kwargs)
+        self.failing = failing
+
+    def submit(self, circuits, shots, initial_layout=None, max_credits=15):
+        job = super(FailingBackend, self).submit(circuits, shots, initial_layout, max_credits)
+        if self.submitted - 1 in self.failing:
+            job.status = lambda: 'ERROR_RUNNING_JOB'
+        return job
+
+
+def test_failed_job_does_not_stop_the_batch(exps_folder):
+    backend = FailingBackend([1], polls=1, seed=0)
+    batches = {'a': circuits('00'), 'b': circuits('01'), 'c': circuits('11')}
+
+    results = jobs.run(batches, backend, 100, poll_interval=0.01, return_exceptions=True)
+    assert isinstance(results['b'], Exception)
+    assert total_shots(results['a'], "['00']") == 100
+    assert total_shots(results['c'], "['00']") == 100
+
+    entries = jobs.Ledger().load()
+    assert sorted(entry['status'] for entry in entries.values()) == ['DONE', 'DONE', 'ERROR']
+
+
+def test_failed_job_raises_after_the_others(exps_folder):
+    backend = FailingBackend([0], polls=1, seed=0)
+    with pytest.raises(Exception, match='1 of 2 jobs failed: a'):
+        jobs.run({'a': circuits('00'), 'b': circuits('01')}, backend, 100, poll_interval=0.01)
+
+    # b was fetched and its job is resumed instead of submitted again
+    assert jobs.run({'b': circuits('01')}, backend, 100, poll_interval=0.01)['b'] is not None
+    assert backend.submitted == 2
+
+
+def test_ledger_follows_exps_folder(exps_folder):
+    assert jobs.Ledger().filename == str(exps_folder / jobs.LEDGER_FILE)
+
+
+def update_many(worker):
+    ledger = jobs.Ledger()
+    for i in range(UPDATES):
+        ledger.update('{}_{}'.format(worker, i), status='DONE')
+    return worker
+
+
+def test_concurrent_updates_keep_the_ledger(exps_folder):
+    context = multiprocessing.get_context('fork')
+    with concurrent.futures.ProcessPoolExecutor(WORKERS, mp_context=context) as executor:
+        assert sorted(executor.map(update_many, range(WORKERS))) == list(range(WORKERS))
+
+    assert len(jobs.Ledger().load()) == WORKERS * UPDATES
+
+
+def test_run_batches_submits_before_polling(exps_folder):
+    events = []
+    backend = RecordingBackend(events, polls=2, seed=0)
+    batches = {'a': circuits('00'), 'b': circuits('01'), 'c': circuits('11')}
+
+    results = jobs.run(batches, backend, 100, poll_interval=0.01)
+
+    assert backend.submitted == 3
+    assert events[:3] == ['submit'] * 3
+    for name in batches:
+        assert total_shots(results[name], "['00']") == 100
+
+
+def test_ledger_resumes_only_the_same_job(exps_folder):
+    backend = jobs.FakeBackend(polls=1, seed=0)
+    batches = {'job': circuits()}
+
+    jobs.run(batches, backend, 100, poll_interval=0.01)
+    resumed = jobs.run(batches, backend, 100, poll_interval=0.01)
+    assert backend.submitted == 1
+    assert total_shots(resumed['job'], "['00']") == 100
+
+    # same job name, more shots: a new job
+    result = jobs.run(batches, backend, 5000, poll_interval=0.01)['job']
+    assert backend.submitted == 2
+    assert total_shots(result, "['00']") == 5000
+
+
+def test_sweep_submits_remote_jobs_together(exps_folder):
+    backend = jobs.FakeBackend(name='fake_device', polls=0, seed=0)
+    jobs.register(backend)
+    try:
+        exp_config = {'backends': ['fake_device'], 'memory_size': 2,
+                      'initialization_method': pqm_experiment.manual_init, 'initial_layout': None}
+        mem_patterns = {'2': {'0': ['00'], '1': ['00', '11']}}
+        experiment = pqm_experiment.experiment_jobs(exp_config, ['00', '01', '11'], mem_patterns, 1, 200, 1)
+        assert all(remote for _, remote, _, _ in experiment)
+
+        results = scheduler.run(experiment, workers=1, remote_runner=pqm_experiment.run_remote_jobs)
+        assert backend.submitted == 3
+        assert total_shots(results[('fake_device', '01')], "['00', '11']") == 200
+
+        # cached by content: nothing is submitted again
+        again = scheduler.run(experiment, workers=1, remote_runner=pqm_experiment.run_remote_jobs)
+        assert backend.submitted == 3
+        assert again[('fake_device', '01')].get_data("['00']") == results[('fake_device', '01')].get_data("['00']")
+    finally:
+        jobs.unregister('fake_device')
+
+
+def test_sweep_caches_completed_jobs_when_one_fails(exps_folder):
+    backend = FailingBackend([1], name='fake_device', polls=0, seed=0)
+    jobs.register(backend)
+    try:
+        exp_config = {'backends': ['fake_device'], 'memory_size': 2,
+                      'initialization_method': pqm_experiment.manual_init, 'initial_layout': None}
+        mem_patterns = {'2': {'0': ['00'], '1': ['00', '11']}}
+        experiment = pqm_experiment.experiment_jobs(exp_config, ['00', '01', '11'], mem_patterns, 1, 200, 1)
+
+        with pytest.raises(Exception, match='1 of 3 remote jobs failed'):
+            scheduler.run(experiment, workers=1, remote_runner=pqm_experiment.run_remote_jobs)
+        assert backend.submitted == 3
+
+        # only the failed job is submitted again
+        results = scheduler.run(experiment, workers=1, remote_runner=pqm_experiment.run_remote_jobs)
+        assert backend.submitted == 4
+        assert len(results) == 3
+    finally:
+        jobs.unregister('fake_device')
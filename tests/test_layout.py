@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import cache
+import layout
+
+
+@pytest.fixture(autouse=True)
+def layouts_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'layouts.json')
+    monkeypatch.setattr(layout, 'LAYOUTS_FILE', path)
+    return path
+
+
+@pytest.mark.parametrize('memory_size', sorted(cache.LEGACY_LAYOUTS))
+def test_ibmqx4_matches_stored_layouts(memory_size):
+    assert layout.best_layout('ibmqx4', memory_size) == cache.LEGACY_LAYOUTS[memory_size]
+    # read back from the layouts file
+    assert layout.best_layout('ibmqx4', memory_size) == cache.LEGACY_LAYOUTS[memory_size]
+
+
+def test_stale_cached_layout_searched_again(layouts_file):
+    stale = {('memory', 0): 0, ('ancilla', 0): 1}
+    with open(layouts_file, 'w') as file:
+        json.dump({'ibmqx4_1_1': [[list(logical), physical] for logical, physical in stale.items()]}, file)
+
+    assert layout.best_layout('ibmqx4', 1) == cache.LEGACY_LAYOUTS[1]
+
+
+def test_search_finds_cheapest_placement():
+    n_qubits, edges = layout.load_coupling_map('ibmqx4')
+    dist = layout.distances(n_qubits, edges)
+    interactions = layout.recover_interactions(2, 2)
+    logical_qubits = [('memory', 0), ('memory', 1), ('ancilla', 0), ('ancilla', 1)]
+
+    best = layout.search(logical_qubits, interactions, n_qubits, edges)
+    assert sorted(best) == sorted(logical_qubits)
+    assert len(set(best.values())) == len(logical_qubits)
+
+    # a costlier preferred placement does not win
+    worst = dict(zip(logical_qubits, [1, 3, 0, 4]))
+    assert layout.cost(worst, interactions, dist, edges) > layout.cost(best, interactions, dist, edges)
+    assert layout.search(logical_qubits, interactions, n_qubits, edges, preferred=worst) == best
+
+
+def test_too_many_qubits():
+    n_qubits, edges = layout.load_coupling_map('ibmqx4')
+    with pytest.raises(Exception, match='do not fit'):
+        layout.search([('memory', k) for k in range(6)], [], n_qubits, edges)
@@ -0,0 +1,57 @@
+import json
+import pytest
+import metrics
+import pqm_experiment
+import util
+
+# util.MSE of the stored ibmqx4 results against the analytic backend, as
+# computed by the original MSE ('00000' counts / 8192)
+BASELINE_MSE = {'1': {"['0']": 0.005823142826557159,
+                      "['1']": 0.005972146987915039,
+                      "['0', '1']": 0.0006849542260169983},
+                '2': {"['00']": 0.007279925048351288,
+                      "['11']": 0.006605591624975203,
+                      "['00', '01']": 0.002793829888105391}}
+
+INPUTS = {'1': ['0', '1'], '2': ['00', '01', '10', '11']}
+
+
+def legacy_results(memory_size):
+    with open('configs/memories.json') as file:
+        memory = json.load(file)[memory_size]
+
+    exp_results = {'quantum': {}, 'ibmqx4': {}}
+    for input_pattern in INPUTS[memory_size]:
+        rows = [row for v in memory.values()
+                for row in pqm_experiment.quantum_job([input_pattern], v, 1, 8192, 1)]
+        exp_results['quantum'][input_pattern] = util._to_result(rows)
+        exp_results['ibmqx4'][input_pattern] = util.load_result(
+            'ibmqx4_{}_manual_init_param1_init_layout.p'.format(input_pattern))
+    return exp_results
+
+
+@pytest.mark.parametrize('memory_size', ['1', '2'])
+def test_mse_reproduces_baseline(memory_size):
+    exp_results = legacy_results(memory_size)
+
+    assert util.MSE(exp_results, INPUTS[memory_size]) == pytest.approx(BASELINE_MSE[memory_size])
+    # the ancilla was placed on physical qubit 2
+    assert util.MSE(exp_results, INPUTS[memory_size], clbits=[2]) == pytest.approx(BASELINE_MSE[memory_size])
+
+
+def test_outcome_index():
+    assert metrics._outcome_index('1', 1) == 1
+    assert metrics._outcome_index('10', 2) == 2
+    assert metrics._outcome_index('00100', 1) == 1
+    assert metrics._outcome_index('00000', 1) == 0
+    assert metrics._outcome_index('00100', 2, clbits=[2, 0]) == 1
+    assert metrics._outcome_index('00101', 2, clbits=[2, 0]) == 3
+
+    with pytest.raises(ValueError):
+        metrics._outcome_index('00100', 2)
+
+
+def test_ancilla_clbits():
+    layout = {('memory', 0): ('q', 0), ('ancilla', 0): ('q', 2)}
+    assert pqm_experiment.ancilla_clbits(layout, 1) == [2]
+    assert pqm_experiment.ancilla_clbits(None, 1) is None
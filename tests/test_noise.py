@@ -0,0 +1,43 @@
+import json
+import pytest
+import noise
+import pqm
+import pqm_experiment
+import statevector
+
+
+def test_noiseless_model_matches_statevector():
+    for mem_init in (pqm_experiment.qiskit_init, pqm_experiment.store_init, pqm_experiment.manual_init):
+        memory = pqm_experiment.set_memory(['00', '11'], 2, 1, '01', mem_init)
+        probs = noise.probabilities(memory, noise.NoiseModel())
+        expected = statevector.probabilities(memory)
+        assert probs == pytest.approx(expected)
+
+
+def test_identity_gates_are_noiseless():
+    model = noise.NoiseModel(depolarizing_1q=0.1, t1=1e-6, t2=1e-6, gate_time_1q=1e-7)
+
+    memory = pqm.PQM(1, circuit_name='identity')
+    memory.circuit.u3(0, 0, 0, memory.mqr[0])
+    memory.circuit.u3(0, 0, 0, memory.cqr[0])
+    memory.circuit.measure(memory.cqr[0], memory.cr[0])
+
+    assert noise.probabilities(memory, model)['0'] == pytest.approx(1)
+
+
+def test_fit_is_physical():
+    with open('configs/memories.json') as file:
+        mem_patterns = json.load(file)
+
+    exp_config = {'memory_size': 1,
+                  'initialization_method': pqm_experiment.manual_init,
+                  'initial_layout': {('memory', 0): ('q', 0), ('ancilla', 0): ('q', 2)}}
+    model, model_error = noise.fit_experiment(exp_config, ['0', '1'], mem_patterns, 1, 8192, 1)
+
+    assert model_error < 2e-4
+    for parameter, (low, high) in noise.FIT_PARAMETERS.items():
+        value = getattr(model, parameter)
+        assert low < value < high, parameter
+    assert model.t2 <= 2 * model.t1
+    assert 0.01 < model.readout_0 < 0.1
+    assert 0.01 < model.readout_1 < 0.1
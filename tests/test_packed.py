@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+import packed
+
+
+def test_round_trip():
+    patterns = ['0' * 70, '1' * 70, '01' * 35]
+    assert packed.pack(patterns).to_strings() == patterns
+
+
+@pytest.mark.parametrize('patterns', ['0120', ['0101', '01a1'], ['01 1'], [[0, 2, 1]], np.array([[0, 1, -1]])])
+def test_invalid_bits_rejected(patterns):
+    with pytest.raises(ValueError, match='0 and 1'):
+        packed.to_bits(patterns)
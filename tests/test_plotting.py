@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import plotting
+import util
+
+
+@pytest.fixture
+def plots_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(util, 'PLOTS_FOLDER', str(tmp_path) + '/')
+    return tmp_path
+
+
+def figure(counts=7000):
+    return {'name': 'fig', 'title': 'Input Pattern: 0', 'orientation': 'H', 'x_labels': ['a', 'b'],
+            'max_shots': 8192, 'series': [{'label': 'backend', 'counts': [{'0': counts, '1': 8192 - counts},
+                                                                           {'0': 4096, '1': 4096}],
+                                           'measure': '0'}]}
+
+
+def test_render_skips_unchanged_figures(plots_folder):
+    path = str(plots_folder / 'fig.png')
+
+    assert plotting.render([figure()], 'png', workers=1) == [path]
+    drawn_at = os.path.getmtime(path)
+
+    # identical data: skipped
+    assert plotting.render([figure()], 'png', workers=1) == []
+    assert os.path.getmtime(path) == drawn_at
+
+    # changed data, another format or force: drawn again
+    assert plotting.render([figure(counts=6000)], 'png', workers=1) == [path]
+    assert plotting.render([figure(counts=6000)], 'svg', workers=1) == [str(plots_folder / 'fig.svg')]
+    assert plotting.render([figure(counts=6000)], 'png', workers=1, force=True) == [path]
+
+
+def test_render_redraws_missing_files(plots_folder):
+    path = plotting.render([figure()], 'png', workers=1)[0]
+    os.remove(path)
+
+    assert plotting.render([figure()], 'png', workers=1) == [path]
+
+
+def test_figure_hash():
+    assert plotting.figure_hash(figure(), 'png', 150) == plotting.figure_hash(figure(), 'png', 150)
+    assert plotting.figure_hash(figure(), 'png', 150) != plotting.figure_hash(figure(6000), 'png', 150)
+    assert plotting.figure_hash(figure(), 'png', 150) != plotting.figure_hash(figure(), 'png', 300)
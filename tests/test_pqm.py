@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import pqm
+import pqm_experiment
+import statevector
+
+
+def final_state(memory):
+    return statevector.Statevector([memory.mqr, memory.cqr]).run(memory.circuit).state.ravel()
+
+
+@pytest.mark.parametrize('mem_init', [pqm_experiment.manual_init, pqm_experiment.store_init],
+                         ids=lambda f: f.__name__)
+@pytest.mark.parametrize('c_size', [1, 2])
+def test_bind_matches_recover(mem_init, c_size):
+    patterns = ['001', '110']
+    template = pqm.PQM(3, c_size=c_size, circuit_name='template')
+    mem_init(template, patterns)
+    template.recover_template()
+
+    for input_pattern in ['000', '010', '111']:
+        for scale in [0.5, 1, 2.5]:
+            bound = template.bind(input_pattern, scale_parameter=scale)
+
+            fresh = pqm.PQM(3, c_size=c_size, circuit_name='fresh')
+            mem_init(fresh, patterns)
+            fresh.recover(input_pattern, scale_parameter=scale)
+
+            # bound input bits are u3(pi, 0, pi) = X and u3(0, 0, 0) = I
+            # where recover emits x or nothing, so compare final states
+            np.testing.assert_allclose(final_state(bound), final_state(fresh), atol=1e-12)
+
+
+def test_bind_leaves_template_symbolic():
+    template = pqm.PQM(2, circuit_name='template')
+    pqm_experiment.store_init(template, ['01', '10'])
+    template.recover_template()
+    before = template.circuit.qasm()
+
+    template.bind('11', scale_parameter=2)
+    assert template.circuit.qasm() == before
+
+
+def test_bind_requires_template():
+    memory = pqm.PQM(1)
+    with pytest.raises(Exception, match='recover_template'):
+        memory.bind('0')
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import pqm_experiment
+import quantum
+import statevector
+
+MEMORIES = {'3': {'0': ['001'], '1': ['001', '110', '011']}}
+INPUTS = ['000', '011', '101']
+SCALES = [0.5, 1, 2.5]
+
+
+def exp_config(backends):
+    return {'backends': backends, 'memory_size': 3, 'initialization_method': pqm_experiment.store_init,
+            'initial_layout': None}
+
+
+def test_analytic_scale_sweep():
+    tensors = pqm_experiment.scale_sweep(exp_config([quantum.__name__]), INPUTS, MEMORIES, 1, 1024, SCALES,
+                                         workers=1)
+    tensor = tensors[quantum.__name__]
+    assert tensor.shape == (len(SCALES), len(INPUTS), len(MEMORIES['3']))
+
+    for s, scale in enumerate(SCALES):
+        for i, input_pattern in enumerate(INPUTS):
+            for m, patterns in enumerate(MEMORIES['3'].values()):
+                expected = quantum.memory_retrieval(input_pattern, patterns, 1, scale)[0]
+                assert tensor[s, i, m] == pytest.approx(expected, rel=quantum.RTOL, abs=quantum.ATOL)
+
+
+@pytest.mark.parametrize('c_size', [1, 2])
+def test_simulated_sweep_matches_analytic(c_size):
+    patterns = MEMORIES['3']['1']
+    analytic = pqm_experiment.quantum_sweep_job(INPUTS, patterns, c_size, SCALES)
+    simulated = pqm_experiment.simulated_sweep_job(statevector.__name__, patterns, 3, c_size, INPUTS,
+                                                   pqm_experiment.store_init, SCALES, None)
+
+    assert analytic.shape == simulated.shape == (len(SCALES), len(INPUTS))
+    np.testing.assert_allclose(simulated, analytic, atol=1e-9)
+
+
+def test_qiskit_job_arguments():
+    args = ('ibmqx4', [['0']], 1, 1, '0', pqm_experiment.manual_init, 8192, 1, None)
+    arguments = pqm_experiment.qiskit_job_arguments(args)
+
+    assert arguments['backend'] == 'ibmqx4'
+    assert arguments['num_shots'] == 8192
+    assert arguments['tolerance'] is None
+    assert pqm_experiment.qiskit_job_arguments(args + (0.01,))['tolerance'] == 0.01
+
+
+def test_import_is_lazy():
+    # the test session has already imported qiskit, so check a fresh interpreter
+    code = ('import sys, pqm_experiment; '
+            'print(sorted({m.split(".")[0] for m in sys.modules} & {"qiskit", "matplotlib"}))')
+    out = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True,
+                         universal_newlines=True).stdout
+    assert out.strip() == '[]'
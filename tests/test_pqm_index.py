@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import pqm_experiment
+import pqm_index
+import statevector
+
+MEMORIES = [['0000', '0011'], ['1111'], ['0101', '1010', '1100']]
+QUERIES = ['0000', '1110', '0110']
+
+
+def test_statevector_matches_analytic():
+    analytic = pqm_index.PQMIndex(MEMORIES)
+    simulated = pqm_index.PQMIndex(MEMORIES, backend=statevector.__name__)
+
+    for a, s in zip(analytic.topk(QUERIES, 3), simulated.topk(QUERIES, 3)):
+        a, s = dict(a), dict(s)
+        assert sorted(a) == sorted(s)
+        np.testing.assert_allclose([a[name] for name in sorted(a)], [s[name] for name in sorted(a)], atol=1e-9)
+
+
+def test_statevector_does_not_fill_template_cache():
+    before = len(pqm_experiment._templates)
+    list(pqm_index.PQMIndex(MEMORIES, backend=statevector.__name__).topk(QUERIES, 1))
+    assert len(pqm_experiment._templates) == before
+
+
+@pytest.mark.parametrize('memories', [[], [['01'], []]])
+def test_empty_memories_rejected(memories):
+    with pytest.raises(ValueError, match='memor'):
+        pqm_index.PQMIndex(memories)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 100])
+def test_chunks_bounded_by_patterns(chunk_size):
+    memories = [['0000', '0011', '0101', '1001', '1110'], ['1111'], ['0101', '1010'], ['0110', '0111', '1000']]
+    queries = ['0000', '1110', '0110', '1011']
+    expected = pqm_index.PQMIndex(memories)
+    index = pqm_index.PQMIndex(memories, chunk_size=chunk_size)
+
+    assert all(len(patterns) <= max(index.block_size, max(sizes)) for _, patterns, _, sizes in index.chunks)
+    for classical in (False, True):
+        for a, b in zip(expected.topk(queries, 4, classical), index.topk(queries, 4, classical)):
+            assert dict(b) == pytest.approx(dict(a))
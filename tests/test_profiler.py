@@ -0,0 +1,38 @@
+import profiler
+
+
+def row(patterns, compiled_gates, compiled_depth=10, layout='default'):
+    return {'memory_size': 2, 'init_method': 'store_init', 'patterns': patterns, 'layout': layout,
+            'compiled_gates': compiled_gates, 'compiled_depth': compiled_depth, 'compiled_two_qubit': 4}
+
+
+def test_regressions_report_larger_circuits_only():
+    baseline = [row("['00']", 20), row("['11']", 20)]
+    rows = [row("['00']", 25, compiled_depth=12), row("['11']", 18), row("['01']", 99)]
+
+    assert [(r['patterns'], column, old, new) for r, column, old, new in profiler.regressions(rows, baseline)] == [
+        ("['00']", 'compiled_gates', 20, 25), ("['00']", 'compiled_depth', 10, 12)]
+
+
+def test_regressions_against_saved_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, 'BENCH_FOLDER', str(tmp_path) + '/')
+    profiler.save_table('table.csv', [row("['00']", 20)])
+
+    # the values read back are strings, and the layout is part of the key
+    baseline = profiler.load_table('table.csv')
+    assert profiler.regressions([row("['00']", 20)], baseline) == []
+    assert len(profiler.regressions([row("['00']", 21)], baseline)) == 1
+    assert profiler.regressions([row("['00']", 21, layout='other')], baseline) == []
+
+
+def test_main_keeps_the_table_on_regressions(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, 'BENCH_FOLDER', str(tmp_path) + '/')
+    profiler.save_table('circuits_2q.csv', [row("['00']", 20)])
+    table = [dict(row("['00']", 30), gates=12, depth=8, two_qubit=4, compile_time=0.1)]
+    monkeypatch.setattr(profiler, 'benchmark', lambda max_size: table)
+
+    assert profiler.main(['2']) == 1
+    assert profiler.load_table('circuits_2q.csv')[0]['compiled_gates'] == '20'
+
+    assert profiler.main(['2', '--force']) == 1
+    assert profiler.load_table('circuits_2q.csv')[0]['compiled_gates'] == '30'
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import packed
+import quantum
+import sparse
+
+PATTERNS = [format(i, '070b') for i in range(0, 2 ** 12, 37)]
+INPUTS = [format(i, '070b') for i in range(0, 2 ** 12, 53)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 100])
+def test_chunked_engine_matches_unchunked(chunk_size):
+    full = quantum.RetrievalEngine(PATTERNS, 2, 1)
+    chunked = quantum.RetrievalEngine(PATTERNS, 2, 1, chunk_size=chunk_size)
+
+    np.testing.assert_allclose(chunked(INPUTS), full(INPUTS), rtol=quantum.RTOL, atol=quantum.ATOL)
+    np.testing.assert_allclose(chunked.sweep(INPUTS, [1, 2]), full.sweep(INPUTS, [1, 2]), rtol=quantum.RTOL,
+                               atol=quantum.ATOL)
+
+
+def test_chunked_engine_sparse_weights():
+    memory = sparse.superposition(PATTERNS[:5])
+    full = quantum.RetrievalEngine(memory, 1, 1)
+    chunked = quantum.RetrievalEngine(memory, 1, 1, chunk_size=3)
+
+    np.testing.assert_allclose(chunked(INPUTS), full(INPUTS), rtol=quantum.RTOL, atol=quantum.ATOL)
+
+
+def test_engine_matches_equation():
+    engine = quantum.RetrievalEngine(PATTERNS[:4], 2, 1, chunk_size=5)
+    for row, input_pattern in zip(engine(INPUTS[:3]), INPUTS[:3]):
+        np.testing.assert_allclose(row, quantum.memory_retrieval(input_pattern, PATTERNS[:4], 2, 1),
+                                   rtol=quantum.RTOL, atol=quantum.ATOL)
+
+
+@pytest.mark.parametrize('n', [3, 20, 70])
+@pytest.mark.parametrize('b, nvalue', [(1, 1), (3, 2.7)])
+def test_batch_within_tolerance_of_equation(n, b, nvalue):
+    rng = np.random.default_rng(n)
+    patterns = [''.join(row) for row in rng.choice(['0', '1'], (200, n))]
+    inputs = [''.join(row) for row in rng.choice(['0', '1'], (20, n))]
+
+    expected = [quantum.memory_retrieval(input_pattern, patterns, b, nvalue) for input_pattern in inputs]
+    np.testing.assert_allclose(quantum.memory_retrieval_batch(inputs, patterns, b, nvalue), expected,
+                               rtol=quantum.RTOL, atol=quantum.ATOL)
+
+
+def test_1cbit_packed_input():
+    patterns = ['0011', '1100', '1111']
+    expected = quantum.memory_retrieval_1cbit('0110', patterns)
+
+    assert quantum.memory_retrieval_1cbit(packed.pack('0110'), patterns) == pytest.approx(expected)
+    assert quantum.memory_retrieval_1cbit(packed.pack('0110'), packed.pack(patterns)) == pytest.approx(expected)
+    assert expected == pytest.approx(quantum.memory_retrieval('0110', patterns, 1, 1)[0])
@@ -0,0 +1,73 @@
+import threading
+
+import cache
+import scheduler
+
+
+def test_is_remote():
+    assert not scheduler.is_remote('quantum')
+    assert not scheduler.is_remote('statevector')
+    assert not scheduler.is_remote('local_qasm_simulator')
+    assert scheduler.is_remote('ibmqx4')
+
+
+def test_run_local_and_remote():
+    jobs = [(('local', i), False, pow, (i, 2)) for i in range(5)]
+    jobs += [(('remote', i), True, max, (i, 3)) for i in range(5)]
+
+    for workers in (1, 2):
+        results = scheduler.run(jobs, workers=workers)
+        assert results == {**{('local', i): i ** 2 for i in range(5)}, **{('remote', i): max(i, 3) for i in range(5)}}
+
+
+def test_remote_runner_gets_every_remote_job():
+    calls = []
+
+    def runner(remote_jobs):
+        calls.append((threading.current_thread() is threading.main_thread(), remote_jobs))
+        return {key: function(*args) for key, function, args in remote_jobs}
+
+    jobs = [('a', False, abs, (-1,)), ('b', True, abs, (-2,)), ('c', True, abs, (-3,))]
+    assert scheduler.run(jobs, workers=1, remote_runner=runner) == {'a': 1, 'b': 2, 'c': 3}
+
+    assert len(calls) == 1
+    in_main_thread, remote_jobs = calls[0]
+    assert not in_main_thread
+    assert [key for key, _, _ in remote_jobs] == ['b', 'c']
+
+
+def test_remote_runner_not_called_without_remote_jobs():
+    def runner(remote_jobs):
+        raise AssertionError('called without remote jobs')
+
+    assert scheduler.run([('a', False, abs, (-1,))], workers=1, remote_runner=runner) == {'a': 1}
+
+
+def locked_square(x):
+    with cache._index_lock:
+        return x * x
+
+
+def test_workers_do_not_inherit_held_locks():
+    # a remote thread holding the cache lock while the workers start
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with cache._index_lock:
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    try:
+        results = {}
+        runner = threading.Thread(target=lambda: results.update(
+            scheduler.run([(i, False, locked_square, (i,)) for i in range(3)], workers=2)))
+        runner.daemon = True
+        runner.start()
+        runner.join(60)
+        assert results == {0: 0, 1: 1, 2: 4}
+    finally:
+        release.set()
+        holder.join()
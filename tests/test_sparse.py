@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import pqm_experiment
+import quantum
+import sparse
+import statevector
+
+MEMORIES = [['001', '011'], ['100'], ['001'], ['0001', '0111', '1100'], ['01', '11']]
+
+
+def inputs(memory_size):
+    return [format(i, '0{}b'.format(memory_size)) for i in range(2 ** memory_size)]
+
+
+def all_zero_probability(patterns, input_pattern, mem_init):
+    memory_size = len(input_pattern)
+    memory = pqm_experiment.set_memory(patterns, memory_size, 1, input_pattern, mem_init)
+    return statevector.probabilities(memory)['0']
+
+
+@pytest.mark.parametrize('patterns', MEMORIES, ids=str)
+def test_initialization_methods_match_analytic(patterns):
+    for input_pattern in inputs(len(patterns[0])):
+        expected = quantum.memory_retrieval(input_pattern, patterns, 1, 1)[0]
+        assert all_zero_probability(patterns, input_pattern, pqm_experiment.qiskit_init) == pytest.approx(expected)
+        assert all_zero_probability(patterns, input_pattern, pqm_experiment.store_init) == pytest.approx(expected)
+
+
+def test_weighted_memory_matches_analytic():
+    amplitudes = sparse.SparseAmplitudes(['001', '011', '110'], [0.2, 0.5, 0.8])
+    for input_pattern in inputs(3):
+        expected = quantum.memory_retrieval(input_pattern, amplitudes, 1, 1)[0]
+        assert all_zero_probability(amplitudes, input_pattern, pqm_experiment.qiskit_init) == pytest.approx(expected)
+        assert all_zero_probability(amplitudes, input_pattern, pqm_experiment.store_init) == pytest.approx(expected)
+
+
+def test_bit_k_is_qubit_k():
+    state = sparse.SparseAmplitudes(['100'])
+    assert state.indices() == [1]
+    assert np.flatnonzero(state.to_dense()).tolist() == [1]
+
+
+def test_reported_case():
+    assert all_zero_probability(['001', '011'], '001', pqm_experiment.qiskit_init) == pytest.approx(0.875)
+
+
+def test_random_amplitude_is_dense():
+    vector = pqm_experiment.random_amplitude(3)
+    assert isinstance(vector, np.ndarray)
+    assert vector.shape == (8,)
+    assert np.linalg.norm(vector) == pytest.approx(1)
+
+    assert np.count_nonzero(pqm_experiment.random_amplitude(3, support=2)) == 2
+
+
+def test_random_sparse_amplitude():
+    state = pqm_experiment.random_sparse_amplitude(4, support=3)
+    assert isinstance(state, sparse.SparseAmplitudes)
+    assert len(state.patterns) == 3
+    assert np.linalg.norm(state.to_dense()) == pytest.approx(1)
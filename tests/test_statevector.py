@@ -0,0 +1,84 @@
+import pytest
+import pqm_experiment
+import pqm_index
+import quantum
+import statevector
+
+# Memories whose bit order does not matter
+MEMORIES = [['0'], ['1'], ['0', '1'], ['00'], ['11'], ['01', '10'], ['000', '111']]
+
+
+def inputs(memory_size):
+    return [format(i, '0{}b'.format(memory_size)) for i in range(2 ** memory_size)]
+
+
+@pytest.mark.parametrize('patterns', MEMORIES, ids=str)
+def test_qiskit_init_matches_analytic(patterns):
+    memory_size = len(patterns[0])
+    for input_pattern in inputs(memory_size):
+        memory = pqm_experiment.set_memory(patterns, memory_size, 1, input_pattern, pqm_experiment.qiskit_init)
+        assert 'init' in [instruction.name for instruction in memory.circuit.data]
+
+        probs = statevector.probabilities(memory)
+        assert probs['0'] == pytest.approx(quantum.memory_retrieval_1cbit(input_pattern, patterns))
+
+
+@pytest.mark.parametrize('patterns', MEMORIES, ids=str)
+def test_store_init_matches_analytic(patterns):
+    memory_size = len(patterns[0])
+    for input_pattern in inputs(memory_size):
+        memory = pqm_experiment.set_memory(patterns, memory_size, 1, input_pattern, pqm_experiment.store_init)
+        probs = statevector.probabilities(memory)
+        assert probs['0'] == pytest.approx(quantum.memory_retrieval_1cbit(input_pattern, patterns))
+
+
+# Memories of 3 or more patterns that change under a bit reversal
+ASYMMETRIC = [['001', '011', '110'], ['0001', '0110', '1011', '1100'], ['001', '100', '101', '111', '010']]
+
+
+@pytest.mark.parametrize('mem_init', [pqm_experiment.store_init, pqm_experiment.qiskit_init],
+                         ids=lambda f: f.__name__)
+@pytest.mark.parametrize('patterns', ASYMMETRIC, ids=str)
+def test_asymmetric_memories_match_analytic(patterns, mem_init):
+    memory_size = len(patterns[0])
+    for scale in (1, 2.5):
+        for input_pattern in inputs(memory_size):
+            memory = pqm_experiment.set_memory(patterns, memory_size, 1, input_pattern, mem_init,
+                                               scale_parameter=scale)
+            expected = quantum.memory_retrieval(input_pattern, patterns, 1, scale)[0]
+            assert statevector.probabilities(memory)['0'] == pytest.approx(expected)
+
+
+def test_repeated_patterns_count_once():
+    patterns = ['001', '110', '001']
+    distinct = ['001', '110']
+    for input_pattern in inputs(3):
+        memory = pqm_experiment.set_memory(patterns, 3, 1, input_pattern, pqm_experiment.store_init)
+        expected = quantum.memory_retrieval(input_pattern, distinct, 1, 1)[0]
+
+        assert statevector.probabilities(memory)['0'] == pytest.approx(expected)
+        assert quantum.memory_retrieval(input_pattern, patterns, 1, 1)[0] == pytest.approx(expected)
+        assert quantum.memory_retrieval_batch([input_pattern], patterns, 1, 1)[0, 0] == pytest.approx(expected)
+        assert quantum.memory_retrieval_1cbit(input_pattern, patterns) == pytest.approx(expected)
+        assert pqm_index.PQMIndex([patterns]).topk_batch([input_pattern], 1)[0][0][1] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('c_size', [2, 3])
+@pytest.mark.parametrize('patterns', [['01'], ['001', '011', '110']], ids=str)
+def test_control_register_matches_outcome_distribution(patterns, c_size):
+    memory_size = len(patterns[0])
+    outcomes = [format(j, '0{}b'.format(c_size)) for j in range(2 ** c_size)]
+    for scale in (1, 2.5):
+        for input_pattern in inputs(memory_size):
+            memory = pqm_experiment.set_memory(patterns, memory_size, c_size, input_pattern,
+                                               pqm_experiment.store_init, scale_parameter=scale)
+            probs = statevector.probabilities(memory)
+            expected = quantum.outcome_distribution(quantum.memory_retrieval(input_pattern, patterns, c_size, scale),
+                                                    c_size)
+
+            assert [probs.get(outcome, 0) for outcome in outcomes] == pytest.approx(expected.tolist())
+
+
+def test_unsupported_gate():
+    with pytest.raises(ValueError):
+        statevector.gate_matrix('foo', [])
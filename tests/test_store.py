@@ -0,0 +1,53 @@
+import shutil
+import pytest
+import adaptive
+import cache
+import jobs
+import pqm_experiment
+import store
+import util
+
+GOOD = 'ibmqx4_0_manual_init_param1_init_layout'
+FAILED = 'ibmqx4_0000_qiskit_init_param1_init_layout'
+
+
+def test_migrate_skips_failed_results(tmp_path, monkeypatch):
+    for name in (GOOD, FAILED):
+        shutil.copy('exps/{}.p'.format(name), str(tmp_path))
+    monkeypatch.setattr(util, 'EXPS_FOLDER', str(tmp_path) + '/')
+
+    migrated, skipped = store.migrate(str(tmp_path))
+
+    assert migrated == [GOOD]
+    assert skipped == [FAILED]
+    assert store.load(store.STORE_FOLDER + GOOD).get_data("['0']")['counts'] == {'00000': 7679, '00100': 513}
+    assert not store.exists(store.STORE_FOLDER + FAILED)
+
+
+def test_from_result_rejects_failed_results():
+    with pytest.raises(ValueError):
+        store.CountsResult.from_result(util.load_result(FAILED + '.p'))
+
+
+def test_adaptive_shots_survive_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(util, 'EXPS_FOLDER', str(tmp_path) + '/')
+    monkeypatch.setattr(pqm_experiment, 'result_cache', cache.ResultCache())
+    backend = jobs.FakeBackend(name='fake_adaptive', polls=0, seed=0)
+    jobs.register(backend)
+    try:
+        memories = pqm_experiment.job_memories([['00'], ['00', '11']], 2, 1, '00', pqm_experiment.manual_init, 1)
+        result = pqm_experiment.run_job('adaptive', memories, 'fake_adaptive', 2048, None, tolerance=0.05)
+        shots = {name: result.get_data(name)['shots'] for name in result.get_names()}
+
+        # the certain circuit stops after the first round, the other one later
+        assert shots["['00']"] == adaptive.ROUND_SHOTS
+        assert adaptive.ROUND_SHOTS < shots["['00', '11']"] <= 2048
+
+        submitted = backend.submitted
+        cached = pqm_experiment.run_job('adaptive', memories, 'fake_adaptive', 2048, None, tolerance=0.05)
+        assert backend.submitted == submitted
+        for name in result.get_names():
+            assert cached.get_data(name) == result.get_data(name)
+            assert sum(cached.get_data(name)['counts'].values()) == shots[name]
+    finally:
+        jobs.unregister('fake_adaptive')
@@ -0,0 +1,57 @@
+import pytest
+
+import cache
+import layout
+import pqm_experiment
+import quantum
+import sweep
+
+
+@pytest.fixture(autouse=True)
+def layouts_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(layout, 'LAYOUTS_FILE', str(tmp_path / 'layouts.json'))
+
+
+def test_load_config_fills_defaults(tmp_path):
+    path = tmp_path / 'small.json'
+    path.write_text('{"memory_sizes": [2], "scale_parameters": {"start": 1, "stop": 2, "num": 3}}')
+    config = sweep.load_config(str(path))
+
+    assert config['name'] == 'small'
+    assert config['backends'] == [quantum.__name__]
+    assert config['c_sizes'] == [1]
+    assert sweep.scale_parameters(config['scale_parameters']) == [1.0, 1.5, 2.0]
+
+
+def test_expand_names_every_point():
+    config = dict(sweep.DEFAULTS, name='s', memory_sizes=[1, 2], init_methods=['manual_init', 'store_init'],
+                  inputs={'2': ['01']})
+    points = sweep.expand(config)
+
+    assert [p['name'] for p in points] == ['s_1q_manual_init', 's_1q_store_init', 's_2q_manual_init',
+                                           's_2q_store_init']
+    assert points[0]['inputs'] == ['0', '1']
+    assert points[2]['inputs'] == ['01']
+    assert points[3]['exp_config']['initialization_method'] is pqm_experiment.store_init
+
+
+def test_job_graph_shares_jobs():
+    config = dict(sweep.DEFAULTS, name='s', memory_sizes=[1], c_sizes=[1], inputs=[0])
+    points = sweep.expand(config) * 2
+    jobs, point_keys = sweep.job_graph(points, sweep.load_json(config['memories']), config['shots'])
+
+    assert point_keys[0] == point_keys[1]
+    assert len(jobs) == len(point_keys[0])
+
+
+def test_shipped_config_resolves_to_stored_results():
+    config = sweep.load_config(sweep.CONFIG)
+    points = sweep.expand(config)
+    assert [p['exp_config']['initial_layout'] for p in points] == [cache.LEGACY_LAYOUTS[1]]
+
+    jobs, point_keys = sweep.job_graph(points, sweep.load_json(config['memories']), config['shots'])
+    qiskit_keys = {key for key, _, function, _ in jobs if function is pqm_experiment.qiskit_job}
+
+    # ibmqx4 and local_qasm_simulator for both inputs, all stored in exps/
+    assert len(qiskit_keys) == 4
+    assert sweep.missing(jobs) == set()
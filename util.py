@@ -1,17 +1,23 @@
-import qiskit
-import Qconfig
-from IBMQuantumExperience import IBMQuantumExperience
-import matplotlib.pyplot as plt
 import pickle
-from qiskit._result import Result
 import numpy as np
 import os
+import lazy
+import metrics
+import telemetry
+
+# Loaded on first use: the analytic and simulation backends need none of them
+qiskit = lazy.module('qiskit')
+Qconfig = lazy.module('Qconfig')
+ibmqe = lazy.module('IBMQuantumExperience')
+plt = lazy.module('matplotlib.pyplot')
+qiskit_result = lazy.module('qiskit._result')
 
 EXPS_FOLDER = 'exps/'
 PLOTS_FOLDER = 'plots/'
+PLOT_STYLE = 'tableau-colorblind10'
 
 
-def execute(circuits, backend, shots, max_credits=15, initial_layout=None):
+def get_backend(backend):
     try:
         backend_instance = qiskit.get_backend(backend)
     except Exception:
@@ -21,21 +27,49 @@ def execute(circuits, backend, shots, max_credits=15, initial_layout=None):
             backend_instance = qiskit.get_backend(backend)
         except ConnectionError as e:
             raise e
+
+    return backend_instance
+
+
+def submit(circuits, backend, shots, max_credits=15, initial_layout=None):
+    backend_instance = get_backend(backend)
+
+    return qiskit.execute(circuits, backend=backend_instance, shots=shots, max_credits=max_credits, initial_layout=initial_layout)
+
+
+def compile_circuits(circuits, backend, initial_layout=None):
+    """
+    :return: list of compiled operations, as (gate name, wires) pairs, for each circuit
+    """
+    backend_instance = get_backend(backend)
+    with telemetry.timer('transpile', backend=backend, circuits=len(circuits)):
+        qobj = qiskit.compile(circuits, backend=backend_instance, initial_layout=initial_layout)
+
+    compiled = []
+    for circuit in qobj['circuits']:
+        operations = []
+        for operation in circuit['compiled_circuit']['operations']:
+            wires = [('q', q) for q in operation.get('qubits', [])] + [('c', c) for c in operation.get('clbits', [])]
+            operations.append((operation['name'], wires))
+        compiled.append(operations)
+
+    return compiled
+
+
+def execute(circuits, backend, shots, max_credits=15, initial_layout=None):
+    backend_instance = get_backend(backend)
     
-    job = qiskit.execute(circuits, backend=backend_instance, shots=shots, max_credits=max_credits, initial_layout=initial_layout)
+    with telemetry.timer('submit', backend=backend, circuits=len(circuits), shots=shots):
+        job = qiskit.execute(circuits, backend=backend_instance, shots=shots, max_credits=max_credits, initial_layout=initial_layout)
 
     if not backend_instance.configuration['local']:
-        print('Submitting job to {} backend...'.format(backend))
-        print(job.status)
-        print('Waiting for job_id...')
-        job.id
-        print(job.status)
-        result = job.result(timeout=0)
+        telemetry.emit('job_status', backend=backend, job_id=job.id, status=job.status)
+        with telemetry.timer('queue_wait', backend=backend):
+            result = job.result(timeout=0)
 
     else:
-        print('Initializing job on {}...'.format(backend))
-        print(job.status)
-        result = job.result()
+        with telemetry.timer('simulate', backend=backend, circuits=len(circuits), shots=shots):
+            result = job.result()
 
     return result
 
@@ -48,7 +82,7 @@ def save_plot(filename):
 
 def save_result(filename, result):
     filename = EXPS_FOLDER + filename
-    os.makedirs(os.path.dirname(EXPS_FOLDER), exist_ok=True)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
     with open(filename, 'wb') as file:
         pickle.dump(result, file)
 
@@ -56,8 +90,9 @@ def save_result(filename, result):
 def load_result(filename):
     filename = EXPS_FOLDER + filename
     try:
-        with open(filename, 'rb') as file:
-            return pickle.load(file)
+        with telemetry.timer('deserialize', format='pickle', path=filename):
+            with open(filename, 'rb') as file:
+                return pickle.load(file)
     except Exception as e:
         raise e
 
@@ -70,19 +105,26 @@ def check_result(result):
 
         return fetch_result(job_id)
 
-    print(result_status)
+    telemetry.emit('job_status', status=result_status)
     return result
 
 
+def fetch_status(job_id):
+    api = ibmqe.IBMQuantumExperience(Qconfig.APItoken, Qconfig.config, verify=True)
+
+    return api.get_job(job_id)['status']
+
+
 def fetch_result(job_id):
-    api = IBMQuantumExperience(Qconfig.APItoken, Qconfig.config, verify=True)
+    api = ibmqe.IBMQuantumExperience(Qconfig.APItoken, Qconfig.config, verify=True)
     user = _get_user(api)
     print('Requesting job {} result as user: {}'.format(job_id, user))
 
-    job_result = api.get_job(job_id)
+    with telemetry.timer('fetch', job_id=job_id):
+        job_result = api.get_job(job_id)
     job_status = job_result['status']
     print('Job {} is {}'.format(job_id, job_status))
-    #print(job_result)
+    telemetry.emit('job_status', job_id=job_id, status=job_status)
 
     job_result_list = []
     for circuit_result in job_result['qasms']:
@@ -101,11 +143,17 @@ def fetch_result(job_id):
                   'result': job_result_list,
                   'backend_name': job_result['backend']}
 
-    return Result(job_result)
+    return qiskit_result.Result(job_result)
+
 
+def bar_plot(counts, label, x_labels, measure, width, position, max_shots=None, orientation='H', ax=None):
+    """
+    :param ax: matplotlib Axes to draw on (default: pyplot's current axes)
+    """
+    if ax is None:
+        plt.style.use(PLOT_STYLE)
+        ax = plt.gca()
 
-def bar_plot(counts, label, x_labels, measure, width, position, max_shots=None, orientation='H'):
-    plt.style.use('tableau-colorblind10')
     xlabel = 'Memory pattern'
     ylabel = r'Probability of $\left|{c}\right\rangle = \left|{0}\right\rangle$'
     x = np.arange(len(counts))
@@ -119,38 +167,34 @@ def bar_plot(counts, label, x_labels, measure, width, position, max_shots=None,
     if orientation == 'H':
         y = x
         x = counts_0
-        plt.barh(y + position, x, width, label=label)
-        plt.xlabel(ylabel)
-        plt.ylabel(xlabel)
-        plt.yticks(y, x_labels, fontsize=12)
-        plt.xlim(xmax=1)
+        ax.barh(y + position, x, width, label=label)
+        ax.set_xlabel(ylabel)
+        ax.set_ylabel(xlabel)
+        ax.set_yticks(y)
+        ax.set_yticklabels(x_labels, fontsize=12)
+        ax.set_xlim(right=1)
     else:
         y = counts_0
-        plt.bar(x + position, y, width=width, label=label)
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
-        plt.xticks(x, x_labels, fontsize=12)
-
+        ax.bar(x + position, y, width=width, label=label)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.set_xticks(x)
+        ax.set_xticklabels(x_labels, fontsize=12)
 
-def MSE(exp_results, input_patterns):
-    mem_patterns = exp_results['ibmqx4'][input_patterns[0]].get_names()
 
-    result = {}
-    for mem_pattern in mem_patterns:
-        error_sum_per_mem_pattern = 0
-        for input_pattern in input_patterns:
-            observed = exp_results['quantum'][input_pattern].get_data(mem_pattern)['counts']['0'] / 8192
-            estimated = exp_results['ibmqx4'][input_pattern].get_data(mem_pattern)['counts']['00000']/8192
+def MSE(exp_results, input_patterns, reference='quantum', target='ibmqx4', width=1, clbits=None):
+    """
+    :param reference: backend with the expected probabilities
+    :param target: backend compared against reference
+    :param width: number of measured ancilla bits
+    :param clbits: clbit of each ancilla bit in device outcomes (e.g. the
+    physical qubits of the ancillas on ibmqx4), see metrics._outcome_index
+    :return: mean squared error of the probability of the all-zero ancilla
+    outcome per memory pattern (averaged over input_patterns)
+    """
+    pairs = metrics.pairs(exp_results, reference, target, input_patterns)
 
-            error = (observed - estimated) ** 2
-
-            error_sum_per_mem_pattern += error
-
-        mean_error = error_sum_per_mem_pattern/len(input_patterns)
-        result[mem_pattern] = mean_error
-        #print('Pattern: {} | MSE: {}'.format(mem_pattern, error_sum_per_mem_pattern/len(input_patterns)))
-
-    return result
+    return metrics.compare(pairs, width=width, clbits=clbits)['mse']
 
 
 def _get_user(api):
@@ -159,7 +203,7 @@ def _get_user(api):
     return api.req.get(user_data_url)['username']
 
 
-def _to_result(quantum_result):
+def _to_result(quantum_result, backend_name='quantum'):
     job_result_list = []
 
     for circuit_result in quantum_result:
@@ -168,12 +212,15 @@ def _to_result(quantum_result):
                        'compiled_circuit_qasm': None,
                        'status': 'COMPLETED'}
 
+        if 'shots' in circuit_result:
+            this_result['data']['shots'] = circuit_result['shots']
+
         job_result_list.append(this_result)
 
     job_result = {'id': None,
                   'status': 'COMPLETED',
                   'used_credits': None,
                   'result': job_result_list,
-                  'backend_name': 'quantum'}
+                  'backend_name': backend_name}
 
-    return Result(job_result)
+    return qiskit_result.Result(job_result)